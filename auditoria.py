@@ -0,0 +1,369 @@
+# Registro de auditoria das triagens: texto de entrada, saída do NLU, resultado
+# completo do motor (nível de risco, scores, red flags, regras disparadas) e versão
+# da base, para a revisão clínica posterior.
+#
+# Quem faz a triagem só monta o registro e o põe numa fila limitada em memória; uma
+# thread grava os registros em lotes (uma transação por lote) num SQLite em modo WAL.
+# Cada processo tem a sua fila e a sua thread; vários processos gravam no mesmo banco.
+# Com a fila cheia, registrar() espera a gravação liberar espaço (contrapressão) ou,
+# com prazo, devolve False para o chamador recusar a triagem; a memória não cresce
+# sem limite e nenhum registro aceito é descartado em silêncio. Os registros não podem
+# ser alterados nem apagados (gatilhos no banco).
+#
+# Consultas por data, nível de risco e condição (índices próprios):
+#   python auditoria.py auditoria.db --desde 2026-10-01 --nivel Alto --condicao depressao
+#
+# Ativação: TRIAGEM_AUDITORIA=<arquivo .db> no ambiente (interface), --auditoria nos
+# CLIs ou PipelineTriagem(auditoria=AuditoriaTriagem(...)).
+
+import argparse
+import atexit
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS triagens (
+    id INTEGER PRIMARY KEY,
+    instante REAL NOT NULL,
+    origem TEXT NOT NULL,
+    ident TEXT,
+    versao_base TEXT,
+    nivel_risco TEXT NOT NULL,
+    risco_global REAL NOT NULL,
+    condicao_principal TEXT,
+    red_flags TEXT NOT NULL,
+    texto TEXT NOT NULL,
+    nlu TEXT NOT NULL,
+    inferencia TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS triagens_instante ON triagens (instante);
+CREATE INDEX IF NOT EXISTS triagens_nivel ON triagens (nivel_risco, instante);
+CREATE TABLE IF NOT EXISTS triagem_condicoes (
+    condicao TEXT NOT NULL,
+    triagem INTEGER NOT NULL REFERENCES triagens (id),
+    posicao INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (condicao, triagem)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS triagens_sem_alteracao BEFORE UPDATE ON triagens
+BEGIN SELECT RAISE(ABORT, 'auditoria: registros não podem ser alterados'); END;
+CREATE TRIGGER IF NOT EXISTS triagens_sem_remocao BEFORE DELETE ON triagens
+BEGIN SELECT RAISE(ABORT, 'auditoria: registros não podem ser removidos'); END;
+CREATE TRIGGER IF NOT EXISTS condicoes_sem_alteracao BEFORE UPDATE ON triagem_condicoes
+BEGIN SELECT RAISE(ABORT, 'auditoria: registros não podem ser alterados'); END;
+CREATE TRIGGER IF NOT EXISTS condicoes_sem_remocao BEFORE DELETE ON triagem_condicoes
+BEGIN SELECT RAISE(ABORT, 'auditoria: registros não podem ser removidos'); END;
+"""
+
+_INSERIR = ("INSERT INTO triagens (id, instante, origem, ident, versao_base, nivel_risco, risco_global, "
+            "condicao_principal, red_flags, texto, nlu, inferencia) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_INSERIR_CONDICOES = "INSERT INTO triagem_condicoes (condicao, triagem, posicao, score) VALUES (?, ?, ?, ?)"
+
+# um codificador para todos os registros: sem espaços nem verificação de ciclos
+_json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), check_circular=False).encode
+
+_COLUNAS = ("id", "instante", "origem", "ident", "versao_base", "nivel_risco", "risco_global",
+            "condicao_principal", "red_flags", "texto")
+
+
+class RegistroTriagem(NamedTuple):
+    """Uma triagem pronta para gravar (campos já serializados: montado fora da thread de gravação)."""
+    instante: float
+    origem: str
+    ident: Optional[str]
+    versao_base: Optional[str]
+    nivel_risco: str
+    risco_global: float
+    condicao_principal: Optional[str]
+    red_flags: str                          # JSON
+    texto: str
+    nlu: str                                # JSON
+    inferencia: str                         # JSON
+    condicoes: Tuple[Tuple[str, float], ...]  # (condição, score) em ordem de score
+
+
+def registro_triagem(texto: str, nlu_out: Dict, inferencia, versao_base: Optional[str] = None,
+                     origem: str = "", ident: Optional[str] = None,
+                     instante: Optional[float] = None) -> RegistroTriagem:
+    """
+    Monta o registro de uma triagem. inferencia: ResultadoInferencia ou seu to_dict().
+    Roda no processo que fez a triagem (nos workers, fora do processo que grava).
+    """
+    dados = inferencia.to_dict() if hasattr(inferencia, "to_dict") else dict(inferencia)
+    dados["regras_disparadas"] = list(getattr(inferencia, "regras_disparadas", dados.get("regras_disparadas", ())))
+    resultados = dados["resultados"]
+    red_flags = set(nlu_out.get("red_flags", ()))
+    for r in resultados:
+        red_flags.update(r["red_flags"])
+    return RegistroTriagem(
+        time.time() if instante is None else instante, origem, None if ident is None else str(ident),
+        versao_base, dados["nivel_risco"], float(dados["risco_global"]),
+        resultados[0]["condicao"] if resultados else None,
+        _json(sorted(red_flags)), texto, _json(nlu_out), _json(dados),
+        tuple((r["condicao"], float(r["score"])) for r in resultados)
+    )
+
+
+def _conectar(caminho: str) -> sqlite3.Connection:
+    db = sqlite3.connect(caminho, check_same_thread=False)
+    # busy_timeout: outro processo gravando espera em vez de falhar; WAL: as consultas
+    # não bloqueiam a gravação; synchronous=NORMAL: sem fsync a cada commit (um lote
+    # confirmado só se perde com queda do sistema, não do processo)
+    db.execute("PRAGMA busy_timeout=5000")
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(_ESQUEMA)
+    return db
+
+
+class AuditoriaTriagem:
+    def __init__(self, caminho: str, fila_max: int = 10000, lote_max: int = 1000,
+                 intervalo: float = 0.05):
+        """
+        fila_max: registros aguardando gravação (o limite de memória); lote_max:
+        registros por transação; intervalo: segundos que a gravação espera juntando
+        registros antes de confirmar um lote (sob carga a fila já tem um lote pronto).
+        """
+        if fila_max <= 0 or lote_max <= 0:
+            raise ValueError("fila_max e lote_max da auditoria devem ser positivos")
+        self.caminho = caminho
+        self.lote_max = lote_max
+        self.intervalo = intervalo
+        self.gravados = 0
+        self.lotes = 0
+        self.esperas = 0       # registrar() encontrou a fila cheia e esperou
+        self.recusados = 0     # a espera esgotou o prazo com a fila cheia: registro não aceito
+        self.perdidos = 0      # aceitos, mas o banco falhou em todas as tentativas
+        self._fila: "queue.Queue[Optional[RegistroTriagem]]" = queue.Queue(maxsize=fila_max)
+        self._lock = threading.Lock()
+        self._fechada = False
+        self._db = _conectar(caminho)
+        self._thread = threading.Thread(target=self._gravar_continuamente, name="auditoria", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def registrar(self, registro: RegistroTriagem, espera: Optional[float] = None) -> bool:
+        """
+        Põe o registro na fila de gravação. Com a fila cheia espera até `espera`
+        segundos (None = o quanto for preciso; 0 = não espera); devolve False se o
+        registro não foi aceito.
+        """
+        if self._fechada:
+            raise RuntimeError("auditoria encerrada")
+        try:
+            self._fila.put_nowait(registro)
+            return True
+        except queue.Full:
+            pass
+        if espera is not None and espera <= 0:
+            return False   # sem espera o chamador decide: não conta como recusado
+        with self._lock:
+            self.esperas += 1
+        try:
+            self._fila.put(registro, timeout=espera)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.recusados += 1
+            return False
+
+    def registrar_triagem(self, texto: str, nlu_out: Dict, inferencia, versao_base: Optional[str] = None,
+                          origem: str = "", ident: Optional[str] = None,
+                          espera: Optional[float] = None) -> bool:
+        return self.registrar(registro_triagem(texto, nlu_out, inferencia, versao_base, origem, ident), espera)
+
+    def pendentes(self) -> int:
+        return self._fila.qsize()
+
+    def descarregar(self) -> None:
+        """Espera a gravação de tudo o que já foi aceito."""
+        self._fila.join()
+
+    def fechar(self) -> None:
+        """Grava o que falta e encerra a thread de gravação (idempotente)."""
+        with self._lock:
+            if self._fechada:
+                return
+            self._fechada = True
+        self._fila.put(None)
+        self._thread.join()
+        self._db.close()
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            return {"gravados": self.gravados, "lotes": self.lotes, "pendentes": self._fila.qsize(),
+                    "esperas": self.esperas, "recusados": self.recusados, "perdidos": self.perdidos}
+
+    def consultar(self, **filtros) -> List[Dict]:
+        """consultar() sobre este banco, depois de gravar o que está na fila."""
+        self.descarregar()
+        return consultar(self.caminho, **filtros)
+
+    def _gravar_continuamente(self) -> None:
+        fila = self._fila
+        while True:
+            lote = [fila.get()]
+            if lote[0] is not None and self.intervalo > 0 and fila.qsize() < self.lote_max:
+                # carga baixa: junta o que chegar no intervalo num só commit
+                time.sleep(self.intervalo)
+            while len(lote) < self.lote_max and lote[-1] is not None:
+                try:
+                    lote.append(fila.get_nowait())
+                except queue.Empty:
+                    break
+            fim = lote[-1] is None
+            registros = [r for r in lote if r is not None]
+            if registros:
+                self._gravar(registros)
+            for _ in lote:
+                fila.task_done()
+            if fim:
+                return
+
+    def _gravar(self, registros: List[RegistroTriagem]) -> None:
+        erro = None
+        for tentativa in range(3):
+            try:
+                with self._db:
+                    # BEGIN IMMEDIATE reserva a escrita antes de numerar o lote: os ids
+                    # saem daqui e as duas tabelas entram com um executemany cada
+                    self._db.execute("BEGIN IMMEDIATE")
+                    primeiro = self._db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM triagens").fetchone()[0]
+                    self._db.executemany(_INSERIR, [(primeiro + n,) + r[:11] for n, r in enumerate(registros)])
+                    self._db.executemany(_INSERIR_CONDICOES, [
+                        (c, primeiro + n, i, score)
+                        for n, r in enumerate(registros) for i, (c, score) in enumerate(r.condicoes)
+                    ])
+                with self._lock:
+                    self.gravados += len(registros)
+                    self.lotes += 1
+                return
+            except sqlite3.Error as e:
+                erro = e
+                time.sleep(0.1 * (tentativa + 1))
+        with self._lock:
+            self.perdidos += len(registros)
+        print(f"Aviso: {len(registros)} registros de auditoria não gravados: {erro}", file=sys.stderr)
+
+
+def abrir_no_worker(caminho: str, **opcoes) -> AuditoriaTriagem:
+    """
+    AuditoriaTriagem para um processo de um pool: os workers saem por os._exit (sem
+    atexit), então a gravação do que restou na fila fica num finalizador do
+    multiprocessing. Vários processos podem gravar no mesmo banco.
+    """
+    from multiprocessing import util
+
+    auditoria = AuditoriaTriagem(caminho, **opcoes)
+    util.Finalize(None, auditoria.fechar, exitpriority=10)
+    return auditoria
+
+
+def do_ambiente() -> Optional[AuditoriaTriagem]:
+    """AuditoriaTriagem no arquivo de TRIAGEM_AUDITORIA, se definida."""
+    caminho = os.environ.get("TRIAGEM_AUDITORIA", "")
+    if caminho in ("", "0"):
+        return None
+    return AuditoriaTriagem("auditoria.db" if caminho == "1" else caminho)
+
+
+Instante = Union[float, int, str, datetime.date, datetime.datetime]
+
+
+def _instante(valor: Instante, fim: bool = False) -> float:
+    # data sem hora como limite final inclui o dia inteiro
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    if isinstance(valor, str):
+        valor = datetime.datetime.fromisoformat(valor) if "T" in valor or " " in valor \
+            else datetime.date.fromisoformat(valor)
+    if not isinstance(valor, datetime.datetime):
+        if fim:
+            valor += datetime.timedelta(days=1)
+        valor = datetime.datetime(valor.year, valor.month, valor.day)
+    return valor.timestamp()
+
+
+def consultar(caminho: str, desde: Optional[Instante] = None, ate: Optional[Instante] = None,
+              nivel: Union[str, Sequence[str], None] = None, condicao: Optional[str] = None,
+              principal: bool = False, limite: Optional[int] = 100, completo: bool = False) -> List[Dict]:
+    """
+    Triagens registradas, das mais recentes para as mais antigas. desde/ate: data
+    ("2026-10-01", inclui o dia inteiro em `ate`), data e hora ISO ou timestamp;
+    nivel: um nível ou lista; condicao: entre as condições pontuadas (principal=True:
+    só como condição principal). completo=True inclui a saída do NLU e da inferência.
+    """
+    sql = ["SELECT " + ", ".join("t." + c for c in _COLUNAS)
+           + (", t.nlu, t.inferencia" if completo else "") + " FROM triagens t"]
+    parametros: List = []
+    if condicao is not None:
+        sql.append("JOIN triagem_condicoes c ON c.triagem = t.id AND c.condicao = ?")
+        parametros.append(condicao.lower())
+        if principal:
+            sql.append("AND c.posicao = 0")
+    filtros = []
+    if desde is not None:
+        filtros.append("t.instante >= ?")
+        parametros.append(_instante(desde))
+    if ate is not None:
+        filtros.append("t.instante < ?" if not isinstance(ate, (int, float)) else "t.instante <= ?")
+        parametros.append(_instante(ate, fim=True))
+    if nivel is not None:
+        niveis = [nivel] if isinstance(nivel, str) else list(nivel)
+        filtros.append(f"t.nivel_risco IN ({', '.join('?' * len(niveis))})")
+        parametros.extend(niveis)
+    if filtros:
+        sql.append("WHERE " + " AND ".join(filtros))
+    sql.append("ORDER BY t.instante DESC, t.id DESC")
+    if limite is not None:
+        sql.append("LIMIT ?")
+        parametros.append(limite)
+
+    # somente leitura: não cria o banco nem disputa a gravação
+    db = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        linhas = db.execute(" ".join(sql), parametros).fetchall()
+    finally:
+        db.close()
+    registros = []
+    for linha in linhas:
+        registro = dict(zip(_COLUNAS, linha))
+        registro["data"] = datetime.datetime.fromtimestamp(registro["instante"]).isoformat(timespec="seconds")
+        registro["red_flags"] = json.loads(registro["red_flags"])
+        if completo:
+            registro["nlu"] = json.loads(linha[len(_COLUNAS)])
+            registro["inferencia"] = json.loads(linha[len(_COLUNAS) + 1])
+        registros.append(registro)
+    return registros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta ao registro de auditoria das triagens")
+    parser.add_argument("banco", help="arquivo SQLite da auditoria")
+    parser.add_argument("--desde", help="data (AAAA-MM-DD) ou data e hora ISO")
+    parser.add_argument("--ate", help="data (inclui o dia inteiro) ou data e hora ISO")
+    parser.add_argument("--nivel", action="append", help="nível de risco (pode repetir)")
+    parser.add_argument("--condicao", help="condição entre as pontuadas")
+    parser.add_argument("--principal", action="store_true", help="só triagens com --condicao como principal")
+    parser.add_argument("--limite", type=int, default=100, help="máximo de registros (0 = todos)")
+    parser.add_argument("--completo", action="store_true", help="inclui a saída do NLU e da inferência")
+    args = parser.parse_args(argv)
+    try:
+        registros = consultar(args.banco, args.desde, args.ate, args.nivel, args.condicao, args.principal,
+                              args.limite or None, args.completo)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    for registro in registros:
+        print(json.dumps(registro, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# Formato binário compilado da base de conhecimento (.kb).
+#
+# Etapa de build: compila o JSON uma vez (normalização, validação, trie de termos,
+# índice de erros de digitação, matriz de pesos) e grava tudo em tabelas planas:
+# strings internadas (cada sintoma, termo e condição vira um id), tabelas de pesos
+# em arrays, a trie do casador serializada como tabela de nós (CSR) e a matriz
+# sintoma x condição em float64 alinhado.
+#
+# Os workers abrem o .kb com mmap somente leitura: a matriz é usada direto do
+# mapeamento (páginas compartilhadas entre os processos pelo cache do sistema) e
+# as estruturas de dicionário são remontadas a partir dos arrays, sem parse de
+# JSON, normalização nem recompilação.
+#
+# Uso: python base_binaria.py base_conhecimento.json [base_conhecimento.kb]
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Dict, List
+
+from base_conhecimento import BaseConhecimento, carregar_base, validar_base
+from casador_termos import _GATILHO, CasadorTermos, dobrar_acentos
+from matriz_pesos import MatrizPesos, np
+from validador_base import Diagnostico, resumo
+
+MAGICO = b"TRIAGKB\0"
+# incrementar quando o layout mudar (2: regras de risco; 3: contexto.sem_negacao; 4: sem ela)
+VERSAO_FORMATO = 4
+
+_CABECALHO = struct.Struct("<8sII")      # mágico, formato, nº de seções
+_SECAO = struct.Struct("<8sQQ")          # nome, offset, tamanho
+_PARA_TRAS = 0x100                        # bit do flag de gatilho posposto
+
+
+class _Strings:
+    """Tabela de strings internadas: cada string distinta ganha um id."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def id(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            if "\0" in s:
+                raise ValueError(f"string com caractere nulo na base: {s!r}")
+            i = self.ids[s] = len(self.ids)
+        return i
+
+    def ids_de(self, strings) -> array:
+        return array("I", (self.id(s) for s in strings))
+
+    def serializar(self) -> bytes:
+        return "\0".join(self.ids).encode("utf-8")
+
+
+def _serializar_trie(raiz: Dict, strings: _Strings) -> Dict[str, array]:
+    # numeração em largura; filhos, termos finais e gatilhos de cada nó em CSR
+    nos = [raiz]
+    filhos_inicio, arestas_token, arestas_filho = array("I", [0]), array("I"), array("I")
+    finais_inicio, finais = array("I", [0]), array("I")
+    gat_inicio, gat_forma, gat_flag = array("I", [0]), array("I"), array("I")
+    k = 0
+    while k < len(nos):
+        no = nos[k]
+        for tok, filho in no.items():
+            if isinstance(tok, str):
+                arestas_token.append(strings.id(tok))
+                arestas_filho.append(len(nos))
+                nos.append(filho)
+        filhos_inicio.append(len(arestas_token))
+        finais.extend(strings.ids_de(no.get(None, ())))
+        finais_inicio.append(len(finais))
+        for forma, flag, para_tras in no.get(_GATILHO, ()):
+            gat_forma.append(strings.id(forma))
+            gat_flag.append(flag | (_PARA_TRAS if para_tras else 0))
+        gat_inicio.append(len(gat_forma))
+        k += 1
+    return {
+        "TFILHOS": filhos_inicio, "TTOKEN": arestas_token, "TFILHO": arestas_filho,
+        "TFINAIS": finais_inicio, "TTERMO": finais,
+        "TGATS": gat_inicio, "TGFORMA": gat_forma, "TGFLAG": gat_flag
+    }
+
+
+def compilar(base: BaseConhecimento, destino: str) -> None:
+    """Grava a base compilada no formato .kb (troca atômica do arquivo)."""
+    strings = _Strings()
+    secoes: Dict[str, object] = {}
+
+    secoes["MAPTERM"] = strings.ids_de(base.mappings.keys())
+    secoes["MAPSINT"] = strings.ids_de(base.mappings.values())
+    secoes["RFNOME"] = strings.ids_de(base.red_flags.keys())
+    secoes["RFPESO"] = array("d", base.red_flags.values())
+
+    cond_nome, cond_desc, cond_inicio = array("I"), array("I"), array("I", [0])
+    peso_sint, peso_valor = array("I"), array("d")
+    for nome, bloco in base.condicoes.items():
+        cond_nome.append(strings.id(nome))
+        cond_desc.append(strings.id(bloco["descricao"]))
+        peso_sint.extend(strings.ids_de(bloco["sintomas"].keys()))
+        peso_valor.extend(bloco["sintomas"].values())
+        cond_inicio.append(len(peso_sint))
+    secoes.update(CNOME=cond_nome, CDESC=cond_desc, CINICIO=cond_inicio, PSINT=peso_sint, PVALOR=peso_valor)
+
+    casador = base.casador
+    secoes.update(_serializar_trie(casador._raiz, strings))
+    chaves_erro, erro_inicio, erro_tokens = array("I"), array("I", [0]), array("I")
+    for chave, tokens in casador._indice_erros.items():
+        chaves_erro.append(strings.id(chave))
+        erro_tokens.extend(strings.ids_de(tokens))
+        erro_inicio.append(len(erro_tokens))
+    secoes.update(ECHAVE=chaves_erro, EINICIO=erro_inicio, ETOKEN=erro_tokens,
+                  VOCAB=strings.ids_de(sorted(casador._vocabulario)))
+
+    if base.matriz is not None:
+        secoes["MLINHAS"] = strings.ids_de(base.matriz.indice)
+        secoes["MPESOS"] = base.matriz._m.astype("<f8").tobytes()
+
+    meta = {
+        "versao": base.versao,
+        "config": _simples(base.config),
+        "thresholds": dict(base.thresholds),
+        "casamento": dict(base.casamento),
+        "contexto": _simples(base.contexto),
+        "regras": _simples(base.regras),
+        "diagnosticos": [list(d) for d in base.diagnosticos],
+        "casador": {
+            "total_termos": casador.total_termos,
+            "max_tokens": casador.max_tokens,
+            "janela": casador.janela,
+            "tem_gatilhos": casador._tem_gatilhos
+        }
+    }
+    secoes["META"] = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    secoes["STRINGS"] = strings.serializar()
+    _gravar(destino, secoes)
+
+
+def _simples(obj):
+    # MappingProxyType/tuplas da base congelada -> dict/list (serializáveis em JSON)
+    if hasattr(obj, "items"):
+        return {k: _simples(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_simples(v) for v in obj]
+    return obj
+
+
+def _gravar(destino: str, secoes: Dict[str, object]) -> None:
+    if sys.byteorder != "little":
+        raise ValueError("o formato .kb é little-endian")
+    dados = [(nome.encode("ascii"), s.tobytes() if isinstance(s, array) else s) for nome, s in secoes.items()]
+    offset = _CABECALHO.size + _SECAO.size * len(dados)
+    tabela = []
+    for nome, conteudo in dados:
+        offset += -offset % 8  # arrays alinhados a 8 bytes
+        tabela.append(_SECAO.pack(nome, offset, len(conteudo)))
+        offset += len(conteudo)
+
+    pasta = os.path.dirname(os.path.abspath(destino))
+    fd, tmp = tempfile.mkstemp(dir=pasta, prefix=os.path.basename(destino) + ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_CABECALHO.pack(MAGICO, VERSAO_FORMATO, len(dados)))
+            f.writelines(tabela)
+            for nome, conteudo in dados:
+                f.write(b"\0" * (-f.tell() % 8))
+                f.write(conteudo)
+        os.replace(tmp, destino)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _ler_secoes(mapa: mmap.mmap) -> Dict[str, memoryview]:
+    magico, formato, n = _CABECALHO.unpack_from(mapa, 0)
+    if magico != MAGICO:
+        raise ValueError("arquivo não é uma base binária (.kb)")
+    if formato != VERSAO_FORMATO:
+        raise ValueError(f"formato .kb {formato} não suportado (esperado {VERSAO_FORMATO}); recompile a base")
+    visao = memoryview(mapa)
+    secoes = {}
+    for k in range(n):
+        nome, offset, tamanho = _SECAO.unpack_from(mapa, _CABECALHO.size + k * _SECAO.size)
+        secoes[nome.rstrip(b"\0").decode("ascii")] = visao[offset:offset + tamanho]
+    return secoes
+
+
+def carregar_base_binaria(caminho: str) -> BaseConhecimento:
+    """
+    Abre um .kb com mmap somente leitura e devolve a BaseConhecimento equivalente à
+    compilada a partir do JSON. Lança FileNotFoundError ou ValueError.
+    """
+    with open(caminho, "rb") as f:
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    s = _ler_secoes(mapa)
+
+    def u32(nome: str) -> memoryview:
+        return s[nome].cast("I")
+
+    def f64(nome: str) -> memoryview:
+        return s[nome].cast("d")
+
+    txt = bytes(s["STRINGS"]).decode("utf-8").split("\0")
+    meta = json.loads(bytes(s["META"]).decode("utf-8"))
+
+    mappings = {txt[t]: txt[v] for t, v in zip(u32("MAPTERM"), u32("MAPSINT"))}
+    red_flags = {txt[r]: p for r, p in zip(u32("RFNOME"), f64("RFPESO"))}
+
+    condicoes = {}
+    inicio = u32("CINICIO")
+    psint, pvalor = u32("PSINT").tolist(), f64("PVALOR").tolist()
+    for c, (nome, desc) in enumerate(zip(u32("CNOME"), u32("CDESC"))):
+        a, b = inicio[c], inicio[c + 1]
+        condicoes[txt[nome]] = {
+            "descricao": txt[desc],
+            "sintomas": {txt[i]: p for i, p in zip(psint[a:b], pvalor[a:b])}
+        }
+
+    matriz = None
+    if np is not None and "MLINHAS" in s:
+        linhas = [txt[i] for i in u32("MLINHAS")]
+        # sem cópia: a matriz fica no mmap (somente leitura)
+        pesos = np.frombuffer(s["MPESOS"], dtype="<f8").reshape(len(linhas), 2 * len(condicoes) + 1)
+        matriz = MatrizPesos.de_tabela(list(condicoes), linhas, pesos)
+    elif np is not None:
+        matriz = MatrizPesos(condicoes, red_flags)
+
+    return BaseConhecimento.de_tabelas(
+        meta["versao"], meta["config"], meta["thresholds"], meta["casamento"], meta["contexto"],
+        meta["regras"], red_flags, mappings, condicoes, matriz, _ler_casador(s, txt, meta),
+        tuple(Diagnostico(*d) for d in meta.get("diagnosticos", ()))
+    )
+
+
+def _ler_casador(s: Dict[str, memoryview], txt: List[str], meta: Dict) -> CasadorTermos:
+    cfg = meta["casamento"]
+    casador = CasadorTermos(dobrar=cfg["ignorar_acentos"], max_erros=cfg["max_erros"],
+                            tamanho_minimo_erro=cfg["tamanho_minimo_erro"])
+
+    filhos_inicio = s["TFILHOS"].cast("I").tolist()
+    tokens = s["TTOKEN"].cast("I").tolist()
+    filhos = s["TFILHO"].cast("I").tolist()
+    finais_inicio = s["TFINAIS"].cast("I").tolist()
+    finais = s["TTERMO"].cast("I").tolist()
+    gat_inicio = s["TGATS"].cast("I").tolist()
+    gat_forma = s["TGFORMA"].cast("I").tolist()
+    gat_flag = s["TGFLAG"].cast("I").tolist()
+    n = len(filhos_inicio) - 1
+    nos = [{} for _ in range(n)]
+    forma = {}
+    dobrar = casador.dobrar
+    for k in range(n):
+        no = nos[k]
+        for e in range(filhos_inicio[k], filhos_inicio[k + 1]):
+            no[txt[tokens[e]]] = nos[filhos[e]]
+        a, b = finais_inicio[k], finais_inicio[k + 1]
+        if a < b:
+            termos = [txt[t] for t in finais[a:b]]
+            no[None] = termos
+            for termo in termos:
+                forma[termo] = dobrar_acentos(termo) if dobrar else termo
+        a, b = gat_inicio[k], gat_inicio[k + 1]
+        if a < b:
+            no[_GATILHO] = [(txt[gat_forma[g]], gat_flag[g] & ~_PARA_TRAS, bool(gat_flag[g] & _PARA_TRAS))
+                            for g in range(a, b)]
+
+    indice_erros = {}
+    einicio = s["EINICIO"].cast("I").tolist()
+    etoken = s["ETOKEN"].cast("I").tolist()
+    for c, chave in enumerate(s["ECHAVE"].cast("I")):
+        indice_erros[txt[chave]] = [txt[t] for t in etoken[einicio[c]:einicio[c + 1]]]
+
+    casador._raiz = nos[0] if nos else {}
+    casador._forma = forma
+    casador._vocabulario = {txt[t] for t in s["VOCAB"].cast("I")}
+    casador._indice_erros = indice_erros
+    casador.total_termos = meta["casador"]["total_termos"]
+    casador.max_tokens = meta["casador"]["max_tokens"]
+    casador.janela = meta["casador"]["janela"]
+    casador._tem_gatilhos = meta["casador"]["tem_gatilhos"]
+    return casador
+
+
+def caminho_binario(caminho_json) -> Path:
+    p = Path(caminho_json)
+    return p.with_suffix(".kb")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila a base de conhecimento no formato binário .kb")
+    parser.add_argument("entrada", nargs="?", default="base_conhecimento.json")
+    parser.add_argument("saida", nargs="?", help="arquivo .kb (padrão: ao lado do JSON)")
+    args = parser.parse_args(argv)
+    saida = args.saida or str(caminho_binario(args.entrada))
+    try:
+        base = carregar_base(args.entrada, usar_cache=False)
+        validar_base(base)
+        compilar(base, saida)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{saida}: versão {base.versao}, {len(base.mappings)} mappings, "
+          f"{len(base.condicoes)} condições, {os.path.getsize(saida):,} bytes")
+    if base.diagnosticos:
+        print(f"Validação: {resumo(base.diagnosticos)} (detalhes: python validador_base.py {args.entrada})")
+
+
+if __name__ == "__main__":
+    main()
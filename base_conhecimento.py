@@ -1,22 +1,145 @@
 """
 Loader da base de conhecimento.
+
+Lê e normaliza o base_conhecimento.json uma única vez e produz uma BaseConhecimento
+compilada e imutável (mappings, red flags, condições, thresholds, regras de risco,
+índice invertido, matriz de pesos e trie de termos), compartilhada por NLUProcessor, MotorInferencia
+e AppTriagem. A versão compilada é guardada em disco (<base>.cache) para que novos
+processos não precisem reler nem renormalizar o JSON; o arquivo é assinado (HMAC)
+com uma chave local do usuário e só é desserializado se a assinatura conferir.
+
+FonteBase guarda a referência para a base atual e permite recarregá-la a quente:
+a nova versão é compilada e validada fora do caminho das requisições e trocada
+atomicamente; cada chamada do NLU/motor usa uma única versão do início ao fim.
 """
+import hashlib
+import hmac
 import json
+import os
+import pickle
+import secrets
+import sys
+import tempfile
+import threading
+import warnings
 from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from casador_termos import NEGADO, PASSADO, TERCEIROS, CasadorTermos
+from matriz_pesos import MatrizPesos, np
+from regras_risco import RegrasRisco, normalizar_regras
+from validador_base import Diagnostico, analisar, resumo
+
+# incrementar quando a estrutura compilada mudar (invalida caches antigos)
+VERSAO_CACHE = 8
+
+THRESHOLDS_PADRAO = {
+    "alto_risco": 0.75,
+    "medio_risco": 0.40,
+    "baixo_risco": 0.10
+}
+
+# casamento dos termos no texto (config "casamento"): acentos e erros de digitação
+CASAMENTO_PADRAO = {
+    "ignorar_acentos": True,
+    # erros de digitação tolerados por palavra (0 = só exato). Desligado por padrão:
+    # com 1 erro, palavras vizinhas viram termos ("suicida" -> "suicidar",
+    # "sentindo" -> "sentido") e os fatos espúrios se multiplicam (bench_casamento)
+    "max_erros": 0,
+    "tamanho_minimo_erro": 7    # palavras mais curtas só casam sem erros
+}
+
+# escopo de negação, passado e terceiros (config "contexto"): gatilhos que alcançam
+# as palavras seguintes, gatilhos de passado que alcançam as anteriores ("anos atrás")
+# e palavras que encerram o escopo; vírgula e fim de frase também o encerram
+CONTEXTO_PADRAO = {
+    "janela": 5,
+    "negacao": ["não", "nunca", "jamais", "nem", "nenhum", "nenhuma"],
+    "passado": ["antigamente", "no passado", "já tive", "já tinha", "antes eu", "quando eu era",
+                "quando era criança"],
+    "passado_depois": ["no passado", "anos atrás", "há anos", "há muito tempo", "antigamente",
+                       "quando era criança", "quando eu era criança"],
+    "terceiros": ["meu amigo", "minha amiga", "um amigo", "uma amiga", "meu pai", "minha mãe",
+                  "meu irmão", "minha irmã", "meu filho", "minha filha", "meu marido",
+                  "minha esposa", "minha mulher", "meu namorado", "minha namorada",
+                  "meu colega", "minha colega", "minha avó", "meu avô"],
+    # além das conjunções adversativas: "e" seguido de verbo abre outra oração
+    # ("não aguento mais e quero morrer") e locuções com "não" que não negam o que
+    # vem depois ("não paro de pensar em suicídio") encerram o escopo do "não"
+    "quebras": ["mas", "porém", "contudo", "entretanto", "todavia", "mesmo assim",
+                "e eu", "e quero", "e penso", "e vou", "e tenho", "e sinto", "e estou", "e fico",
+                "e tento", "e acho", "e vejo", "e pensei", "e tentei",
+                "não paro de", "não consigo parar", "não vejo saída", "não vejo outra saída",
+                "não aguento mais", "não tenho mais vontade de viver"]
+}
+
+# base mínima usada pelo motor quando o arquivo não existe
+BASE_PADRAO = {
+    "config": {
+        "thresholds": dict(THRESHOLDS_PADRAO)
+    },
+    "red_flags": {
+        "ideacao_suicida": 1.0,
+        "automutilacao": 1.0
+    },
+    "mappings": {
+        "triste": "tristeza_persistente",
+        "nao durmo": "insônia"
+    },
+    "condicoes": {
+        "depressao": {
+            "descricao": "Humor deprimido, perda de prazer e energia",
+            "sintomas": {
+                "tristeza_persistente": 1.0,
+                "fadiga": 0.9,
+                "insônia": 0.8
+            }
+        }
+    },
+    "regras": [
+        {"nome": "red_flag_critica", "se": {"algum": ["ideacao_suicida", "automutilacao"]}, "nivel": "Alto"},
+        {"nome": "aviso_triagem",
+         "recomendacoes": ["Lembre-se: Este é um sistema de triagem, não substitui diagnóstico profissional"]}
+    ]
+}
+
+
+def _congelar(obj):
+    """Converte dicts/listas aninhados em MappingProxyType/tuplas (somente leitura)."""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _congelar(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(_congelar(v) for v in obj)
+    return obj
+
+
+def _descongelar(obj):
+    if isinstance(obj, MappingProxyType):
+        return {k: _descongelar(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return tuple(_descongelar(v) for v in obj)
+    return obj
+
 
 class BaseConhecimento:
-    def __init__(self, caminho_json: str = "base_conhecimento.json"):
-        caminho = Path(caminho_json)
-        if not caminho.exists():
-            raise FileNotFoundError(f"Base de conhecimento não encontrada: {caminho}")
-        with caminho.open("r", encoding="utf-8") as f:
-            dados = json.load(f)
+    """
+    Base compilada e somente leitura. Construída a partir do dict do JSON;
+    use carregar_base() para ler um arquivo com cache.
+    """
 
+    def __init__(self, dados: dict, versao: str = ""):
+        self.versao = versao
         self.config = dados.get("config", {})
-        self.red_flags = set(dados.get("red_flags", []))
-        self.mappings = {k.lower(): v.lower() for k, v in dados.get("mappings", {}).items()}
 
-        # condicoes: dict -> cada sintoma normalizado
+        # config.thresholds; a chave "thresholds" da raiz só vale se ela faltar
+        cfg = self.config.get("thresholds", dados.get("thresholds", {}))
+        self.thresholds = {k: float(cfg.get(k, v)) for k, v in THRESHOLDS_PADRAO.items()}
+
+        # red_flags: nome -> peso
+        self.red_flags = {k.lower(): float(v) for k, v in dados.get("red_flags", {}).items()}
+
+        # condicoes: nome -> {descricao, sintomas: {sintoma: peso}}
         conds = {}
         for nome, bloco in dados.get("condicoes", {}).items():
             sintomas = {s.lower(): float(p) for s, p in bloco.get("sintomas", {}).items()}
@@ -26,8 +149,440 @@ class BaseConhecimento:
             }
         self.condicoes = conds
 
+        cfg = {**CASAMENTO_PADRAO, **self.config.get("casamento", {})}
+        self.casamento = {
+            "ignorar_acentos": bool(cfg["ignorar_acentos"]),
+            "max_erros": int(cfg["max_erros"]),
+            "tamanho_minimo_erro": int(cfg["tamanho_minimo_erro"])
+        }
+
+        # mappings: termo (lower) -> sintoma_normalizado, já sem as entradas mortas
+        # ou duplicadas apontadas pela validação
+        mappings = {k.lower(): v.lower() for k, v in dados.get("mappings", {}).items()}
+
+        # regras de risco: nível mínimo e recomendações (seção obrigatória, ver regras_risco)
+        if "regras" not in dados:
+            raise ValueError("base sem a seção 'regras' (regras de risco e recomendações)")
+        self.regras = normalizar_regras(dados["regras"])
+
+        diagnosticos, self.mappings = analisar(mappings, self.red_flags, conds, self.config,
+                                               dados.get("thresholds"), self.casamento["ignorar_acentos"],
+                                               self.regras)
+        self.diagnosticos = tuple(diagnosticos)
+        cfg = {**CONTEXTO_PADRAO, **self.config.get("contexto", {})}
+        self.contexto = {
+            "janela": int(cfg["janela"]),
+            **{chave: [str(g).lower() for g in cfg[chave]]
+               for chave in ("negacao", "passado", "passado_depois", "terceiros", "quebras")}
+        }
+        self._derivar()
+
+        # matriz sintoma x condição para inferência em lote (só com NumPy)
+        self.matriz = MatrizPesos(conds, self.red_flags) if np is not None else None
+
+        # trie única com os termos dos mappings e das red flags
+        self.casador = CasadorTermos(
+            list(self.mappings) + list(self.red_flags_lex),
+            dobrar=self.casamento["ignorar_acentos"],
+            max_erros=self.casamento["max_erros"],
+            tamanho_minimo_erro=self.casamento["tamanho_minimo_erro"]
+        )
+        for chave, flag, para_tras in (("negacao", NEGADO, False), ("passado", PASSADO, False),
+                                       ("passado_depois", PASSADO, True), ("terceiros", TERCEIROS, False)):
+            for gatilho in self.contexto[chave]:
+                self.casador.adicionar_gatilho(gatilho, flag, para_tras)
+        self.casador.configurar_contexto(self.contexto["janela"], self.contexto["quebras"])
+
+        self._congelar()
+
+    def _derivar(self):
+        # índices derivados de mappings, red flags e condições
+        conds = self.condicoes
+
+        # termos que disparam red flag diretamente no texto (o próprio nome)
+        self.red_flags_lex = {rf: rf for rf in self.red_flags}
+
+        # soma dos pesos e posição de cada condição
+        self.soma_pesos = {nome: sum(bloco["sintomas"].values()) for nome, bloco in conds.items()}
+        self.ordem = {nome: i for i, nome in enumerate(conds)}
+
+        # índice invertido: sintoma -> [(condição, peso)]
+        indice = {}
+        for nome, bloco in conds.items():
+            for sintoma, peso in bloco["sintomas"].items():
+                indice.setdefault(sintoma, []).append((nome, peso))
+        self.indice_sintomas = indice
+
+        # relevância de cada termo para o resumo: maior peso do seu sintoma entre as
+        # condições, somado ao peso da red flag que o termo dispara
+        peso_termos = {}
+        for termo, sintoma in self.mappings.items():
+            peso_termos[termo] = max((p for _, p in indice.get(sintoma, ())), default=0.0)
+        for termo, rf in self.red_flags_lex.items():
+            peso_termos[termo] = peso_termos.get(termo, 0.0) + self.red_flags[rf]
+        self.peso_termos = peso_termos
+
+        # tabela de predicados das regras de risco
+        self.tabela_regras = RegrasRisco(self.regras, list(self.red_flags))
+
+    @classmethod
+    def de_tabelas(cls, versao: str, config: dict, thresholds: Dict[str, float], casamento: dict,
+                   contexto: dict, regras: List[dict], red_flags: Dict[str, float], mappings: Dict[str, str],
+                   condicoes: Dict[str, dict], matriz: Optional[MatrizPesos],
+                   casador: CasadorTermos, diagnosticos: Tuple[Diagnostico, ...] = ()) -> "BaseConhecimento":
+        """
+        Monta a base a partir de tabelas já normalizadas e compiladas (ex.: formato
+        binário .kb), sem reler o JSON nem recompilar a trie; só os índices derivados
+        são refeitos.
+        """
+        base = cls.__new__(cls)
+        base.versao = versao
+        base.config = config
+        base.thresholds = thresholds
+        base.casamento = casamento
+        base.contexto = contexto
+        base.regras = regras
+        base.red_flags = red_flags
+        base.mappings = mappings
+        base.condicoes = condicoes
+        base.diagnosticos = tuple(diagnosticos)
+        base._derivar()
+        base.matriz = matriz
+        base.casador = casador
+        base._congelar()
+        return base
+
+    _CONGELAVEIS = ("config", "thresholds", "casamento", "contexto", "regras", "red_flags", "red_flags_lex",
+                    "mappings", "condicoes", "soma_pesos", "ordem", "indice_sintomas", "peso_termos")
+
+    def _congelar(self):
+        for nome in self._CONGELAVEIS:
+            object.__setattr__(self, nome, _congelar(getattr(self, nome)))
+        object.__setattr__(self, "_congelada", True)
+
+    def __setattr__(self, nome, valor):
+        if getattr(self, "_congelada", False):
+            raise AttributeError("BaseConhecimento é imutável")
+        object.__setattr__(self, nome, valor)
+
+    def __getstate__(self):
+        estado = dict(self.__dict__)
+        estado.pop("_congelada", None)
+        for nome in self._CONGELAVEIS:
+            estado[nome] = _descongelar(estado[nome])
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._congelar()
+
+    @classmethod
+    def vazia(cls) -> "BaseConhecimento":
+        return cls({"regras": []}, versao="vazia")
+
+    @classmethod
+    def padrao(cls) -> "BaseConhecimento":
+        return cls(BASE_PADRAO, versao="padrao")
+
     def listar_condicoes(self):
         return list(self.condicoes.keys())
 
     def obter_condicao(self, nome):
-        return self.condicoes.get(nome.lower())
\ No newline at end of file
+        return self.condicoes.get(nome.lower())
+
+
+# cache em memória do processo: caminho absoluto -> (mtime_ns, tamanho, base)
+_CACHE_PROCESSO: Dict[str, Tuple[int, int, BaseConhecimento]] = {}
+
+
+def caminho_cache(caminho_json) -> Path:
+    p = Path(caminho_json)
+    return p.with_name(p.name + ".cache")
+
+
+def carregar_base(caminho_json: str = "base_conhecimento.json", usar_cache: bool = True) -> BaseConhecimento:
+    """
+    Carrega a base compilada. Ordem de tentativa: cache do processo, cache em disco
+    (validado por mtime+tamanho e, se estes mudarem, pelo hash do conteúdo) e, por
+    fim, compilação do JSON. Lança FileNotFoundError se o arquivo não existir e
+    ValueError se a base não passar em validar_base (erros da validação impedem a
+    carga; avisos saem pelo warnings). Um caminho .kb é lido no formato binário
+    compilado (ver base_binaria).
+    """
+    caminho = Path(caminho_json)
+    if not caminho.exists():
+        raise FileNotFoundError(f"Base de conhecimento não encontrada: {caminho}")
+
+    chave = str(caminho.resolve())
+    st = caminho.stat()
+    if usar_cache:
+        em_memoria = _CACHE_PROCESSO.get(chave)
+        if em_memoria and em_memoria[0] == st.st_mtime_ns and em_memoria[1] == st.st_size:
+            return em_memoria[2]
+
+    if caminho.suffix == ".kb":
+        # base já compilada (python base_binaria.py): mmap, sem cache em disco
+        from base_binaria import carregar_base_binaria
+        base = carregar_base_binaria(str(caminho))
+        validar_base(base)
+        if usar_cache:
+            _CACHE_PROCESSO[chave] = (st.st_mtime_ns, st.st_size, base)
+        return base
+
+    base = _ler_cache_disco(caminho, st) if usar_cache else None
+    if base is None:
+        conteudo = caminho.read_bytes()
+        versao = hashlib.sha256(conteudo).hexdigest()[:12]
+        base = _ler_cache_disco(caminho, st, versao) if usar_cache else None
+        if base is None:
+            base = BaseConhecimento(json.loads(conteudo.decode("utf-8")), versao=versao)
+            if any(d.nivel != "info" for d in base.diagnosticos):
+                # pelo warnings (saída de erro; repetições filtradas no processo)
+                warnings.warn(f"{caminho.name}: {resumo(base.diagnosticos)} na validação "
+                              f"(detalhes: python validador_base.py {caminho})", stacklevel=2)
+        validar_base(base)
+        if usar_cache:
+            _gravar_cache_disco(caminho, st, base)
+
+    if usar_cache:
+        _CACHE_PROCESSO[chave] = (st.st_mtime_ns, st.st_size, base)
+    return base
+
+
+# <base>.cache: _MAGICO, tamanho do cabeçalho (4 bytes), cabeçalho em JSON, HMAC-SHA256
+# de cabeçalho + corpo e o corpo (pickle da base). O pickle executa código ao ser lido,
+# então um cache que outra pessoa pôs ao lado do JSON é descartado sem ser aberto
+_MAGICO = b"TRIAGEMC"
+_CHAVE_CACHE: Optional[bytes] = None
+
+
+def _chave_cache() -> Optional[bytes]:
+    """
+    Chave do HMAC do cache em disco: TRIAGEM_CHAVE_CACHE no ambiente ou 32 bytes
+    aleatórios em ~/.cache/triagem/chave_cache (modo 0600, criado no primeiro uso).
+    None se não houver chave utilizável: carregar_base segue sem cache em disco.
+    """
+    global _CHAVE_CACHE
+    if _CHAVE_CACHE is None:
+        env = os.environ.get("TRIAGEM_CHAVE_CACHE")
+        _CHAVE_CACHE = env.encode("utf-8") if env else _ler_chave_usuario()
+    return _CHAVE_CACHE or None
+
+
+def _ler_chave_usuario() -> bytes:
+    pasta = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "triagem"
+    arquivo = pasta / "chave_cache"
+    try:
+        pasta.mkdir(mode=0o700, parents=True, exist_ok=True)
+        try:
+            fd = os.open(str(arquivo), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_bytes(32))
+        st = arquivo.stat()
+        # chave legível por outros (ou de outro usuário) não protege o cache
+        if st.st_mode & 0o077 or (hasattr(os, "getuid") and st.st_uid != os.getuid()):
+            return b""
+        chave = arquivo.read_bytes()
+        return chave if len(chave) >= 32 else b""
+    except OSError:
+        return b""
+
+
+def _cabecalho(st: os.stat_result) -> dict:
+    return {
+        "formato": VERSAO_CACHE,
+        "numpy": np is not None,
+        "mtime_ns": st.st_mtime_ns,
+        "tamanho": st.st_size
+    }
+
+
+def _ler_cache_disco(caminho: Path, st: os.stat_result, versao: Optional[str] = None) -> Optional[BaseConhecimento]:
+    """
+    Sem versao, aceita o cache se mtime e tamanho baterem; com versao (hash do JSON),
+    aceita se o hash bater mesmo que o arquivo tenha sido apenas tocado. O corpo só
+    é desserializado se o HMAC conferir com _chave_cache().
+    """
+    chave = _chave_cache()
+    if chave is None:
+        return None
+    try:
+        with caminho_cache(caminho).open("rb") as f:
+            if f.read(len(_MAGICO)) != _MAGICO:
+                return None
+            bruto = f.read(int.from_bytes(f.read(4), "big"))
+            cabecalho = json.loads(bruto.decode("utf-8"))
+            esperado = _cabecalho(st)
+            if cabecalho.get("formato") != esperado["formato"] or cabecalho.get("numpy") != esperado["numpy"]:
+                return None
+            if versao is None:
+                if cabecalho.get("mtime_ns") != esperado["mtime_ns"] or cabecalho.get("tamanho") != esperado["tamanho"]:
+                    return None
+            elif cabecalho.get("versao") != versao:
+                return None
+            assinatura = f.read(hashlib.sha256().digest_size)
+            corpo = f.read()
+        if not hmac.compare_digest(assinatura, hmac.new(chave, bruto + corpo, hashlib.sha256).digest()):
+            return None
+        return pickle.loads(corpo)
+    except Exception:
+        # cache ausente, corrompido ou de outra versão: recompila
+        return None
+
+
+def _gravar_cache_disco(caminho: Path, st: os.stat_result, base: BaseConhecimento) -> None:
+    chave = _chave_cache()
+    if chave is None:
+        return
+    destino = caminho_cache(caminho)
+    bruto = json.dumps(dict(_cabecalho(st), versao=base.versao)).encode("utf-8")
+    corpo = pickle.dumps(base, protocol=pickle.HIGHEST_PROTOCOL)
+    assinatura = hmac.new(chave, bruto + corpo, hashlib.sha256).digest()
+    try:
+        fd, tmp = tempfile.mkstemp(dir=str(destino.parent), prefix=destino.name + ".")
+    except OSError:
+        # diretório somente leitura: segue sem cache em disco
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGICO + len(bruto).to_bytes(4, "big") + bruto + assinatura)
+            f.write(corpo)
+        # troca atômica: leitores nunca veem um cache pela metade
+        os.replace(tmp, destino)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def validar_base(base: BaseConhecimento) -> None:
+    """
+    Verificações mínimas antes de colocar uma base em uso; lança ValueError,
+    inclusive para os diagnósticos de nível "erro" da validação na compilação.
+    """
+    erros = [d for d in base.diagnosticos if d.nivel == "erro"]
+    if erros:
+        raise ValueError("; ".join(d.mensagem for d in erros))
+    t = base.thresholds
+    for nome, valor in t.items():
+        if not 0.0 <= valor <= 1.0:
+            raise ValueError(f"Threshold {nome} fora de [0, 1]: {valor}")
+    if not t["alto_risco"] >= t["medio_risco"] >= t["baixo_risco"]:
+        raise ValueError("Thresholds devem obedecer alto_risco >= medio_risco >= baixo_risco")
+    if not 0 <= base.casamento["max_erros"] <= 2:
+        raise ValueError(f"casamento.max_erros deve estar entre 0 e 2: {base.casamento['max_erros']}")
+    if base.contexto["janela"] < 1:
+        raise ValueError(f"contexto.janela deve ser positiva: {base.contexto['janela']}")
+    if not base.condicoes:
+        raise ValueError("A base não tem nenhuma condição")
+    for nome, bloco in base.condicoes.items():
+        if any(peso < 0 for peso in bloco["sintomas"].values()):
+            raise ValueError(f"Condição {nome} tem peso negativo")
+    for rf, peso in base.red_flags.items():
+        if peso < 0:
+            raise ValueError(f"Red flag {rf} tem peso negativo")
+    for termo, sintoma in base.mappings.items():
+        if not termo.strip() or not sintoma.strip():
+            raise ValueError(f"Mapping vazio: {termo!r} -> {sintoma!r}")
+
+
+class FonteBase:
+    """
+    Referência compartilhada para a base compilada em uso, com recarga a quente.
+    """
+
+    def __init__(self, base: BaseConhecimento, caminho_json: Optional[str] = None):
+        self._atual = base
+        self.caminho = Path(caminho_json) if caminho_json else None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ouvintes: List[Callable[[BaseConhecimento], None]] = []
+        # assinatura do arquivo correspondente à base em uso
+        self._ultima = self._assinatura() if self.caminho else None
+
+    @classmethod
+    def de_arquivo(cls, caminho_json: str = "base_conhecimento.json") -> "FonteBase":
+        return cls(carregar_base(caminho_json), caminho_json)
+
+    @property
+    def atual(self) -> BaseConhecimento:
+        return self._atual
+
+    def ao_trocar(self, ouvinte: Callable[[BaseConhecimento], None]) -> None:
+        """Registra uma função chamada (na thread da recarga) após cada troca de versão."""
+        self._ouvintes.append(ouvinte)
+
+    def recarregar(self) -> bool:
+        """
+        Compila e valida o arquivo; se a versão for nova e válida, troca a referência.
+        Em caso de erro a versão em uso é mantida. Retorna True se houve troca.
+        """
+        if self.caminho is None:
+            return False
+        with self._lock:
+            try:
+                nova = carregar_base(str(self.caminho))
+                validar_base(nova)
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                print(f"Aviso: base {self.caminho} inválida, mantendo versão {self._atual.versao}: {e}",
+                      file=sys.stderr)
+                return False
+            if nova.versao == self._atual.versao:
+                return False
+            # atribuição de referência é atômica: quem já pegou a versão antiga termina com ela
+            self._atual = nova
+        for ouvinte in list(self._ouvintes):
+            ouvinte(nova)
+        return True
+
+    def iniciar_observacao(self, intervalo: float = 2.0) -> None:
+        """Observa o arquivo (mtime/tamanho) numa thread daemon e recarrega quando mudar."""
+        if self.caminho is None or self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._observar, args=(intervalo,),
+                                        name="observador-base", daemon=True)
+        self._thread.start()
+
+    def parar_observacao(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _assinatura(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.caminho.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _observar(self, intervalo: float) -> None:
+        while not self._parar.wait(intervalo):
+            atual = self._assinatura()
+            if atual is None or atual == self._ultima:
+                continue
+            # uma tentativa por mudança; uma escrita incompleta é corrigida pela próxima
+            self._ultima = atual
+            self.recarregar()
+
+
+def como_fonte(base: Union[BaseConhecimento, FonteBase, None], caminho_json: str,
+               fallback: Callable[[], BaseConhecimento]) -> FonteBase:
+    """
+    Normaliza o argumento base de NLUProcessor/MotorInferencia para uma FonteBase:
+    reaproveita a fonte recebida, embrulha uma base fixa ou carrega do arquivo.
+    """
+    if isinstance(base, FonteBase):
+        return base
+    if isinstance(base, BaseConhecimento):
+        return FonteBase(base)
+    try:
+        return FonteBase.de_arquivo(caminho_json)
+    except FileNotFoundError:
+        return FonteBase(fallback())
@@ -0,0 +1,114 @@
+# Registro de auditoria no caminho da triagem: sem auditoria x gravação síncrona
+# (INSERT + commit a cada triagem, como um registro feito direto após cada chamada)
+# x AuditoriaTriagem (fila limitada + gravação em lotes numa thread). Reporta a
+# latência p50/p99/máx por triagem e a vazão, e confere que todas as triagens foram
+# gravadas. Por fim, uma rajada com fila pequena mostra a contrapressão: a fila
+# nunca passa do limite e registrar() espera a gravação.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_auditoria --triagens 5000
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, List
+
+from auditoria import _ESQUEMA, _INSERIR, _INSERIR_CONDICOES, AuditoriaTriagem
+from benchmarks.carga_servidor import carregar_textos, percentil
+from triagem import PipelineTriagem, registro_de_saida
+
+
+def medir(rotulo: str, textos: List[str], triar: Callable[[str], object], concluir=None) -> None:
+    latencias = []
+    inicio = time.perf_counter()
+    for texto in textos:
+        t0 = time.perf_counter()
+        triar(texto)
+        latencias.append(time.perf_counter() - t0)
+    if concluir is not None:
+        concluir()   # o que ficou na fila conta no tempo total, não na latência
+    total = time.perf_counter() - inicio
+    print(f"{rotulo:<22} {percentil(latencias, 50) * 1e6:>9.1f} {percentil(latencias, 99) * 1e6:>9.1f} "
+          f"{max(latencias) * 1e6:>10.1f} {len(textos) / total:>10,.0f}")
+
+
+def contar(caminho: str) -> int:
+    db = sqlite3.connect(caminho)
+    try:
+        return db.execute("SELECT COUNT(*) FROM triagens").fetchone()[0]
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do registro de auditoria das triagens")
+    parser.add_argument("--casos", default="Casos_para_teste")
+    parser.add_argument("--triagens", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    base = carregar_textos(args.casos)
+    textos = (base * (args.triagens // len(base) + 1))[:args.triagens]
+    pipeline = PipelineTriagem()
+    for texto in base:
+        pipeline.processar(texto)   # aquece relatórios e estruturas preguiçosas
+
+    with tempfile.TemporaryDirectory() as pasta:
+        print(f"{'':<22} {'p50 (us)':>9} {'p99 (us)':>9} {'máx (us)':>10} {'triagens/s':>10}")
+        medir("sem auditoria", textos, pipeline.processar)
+
+        # síncrona: uma transação por triagem, no próprio caminho da requisição
+        caminho = os.path.join(pasta, "sincrona.db")
+        db = sqlite3.connect(caminho)
+        db.executescript(_ESQUEMA)
+        proximo = [1]
+
+        def triar_sincrono(texto: str) -> None:
+            r = registro_de_saida(pipeline.processar(texto), "bench")
+            with db:
+                db.execute(_INSERIR, (proximo[0],) + r[:11])
+                db.executemany(_INSERIR_CONDICOES, [(c, proximo[0], i, s) for i, (c, s) in enumerate(r.condicoes)])
+            proximo[0] += 1
+
+        medir("síncrona", textos, triar_sincrono)
+        db.close()
+        print(f"{'':<22} gravadas: {contar(caminho)}")
+
+        caminho = os.path.join(pasta, "lotes.db")
+        auditoria = AuditoriaTriagem(caminho)
+        auditada = PipelineTriagem(base=pipeline.fonte, auditoria=auditoria, origem="bench")
+        medir("fila + lotes", textos, auditada.processar, auditoria.descarregar)
+        estatisticas = auditoria.estatisticas()
+        auditoria.fechar()
+        print(f"{'':<22} gravadas: {contar(caminho)} em {estatisticas['lotes']} lotes")
+
+        # contrapressão: rajada de registros prontos com fila de 200 e lotes de 50
+        caminho = os.path.join(pasta, "rajada.db")
+        auditoria = AuditoriaTriagem(caminho, fila_max=200, lote_max=50, intervalo=0.0)
+        registros = [registro_de_saida(pipeline.processar(t), "bench") for t in textos]
+        maior_fila = [0]
+        parar = threading.Event()
+
+        def observar() -> None:
+            while not parar.is_set():
+                maior_fila[0] = max(maior_fila[0], auditoria.pendentes())
+                time.sleep(0.0005)
+
+        observador = threading.Thread(target=observar)
+        observador.start()
+        inicio = time.perf_counter()
+        for r in registros:
+            auditoria.registrar(r)
+        auditoria.descarregar()
+        dt = time.perf_counter() - inicio
+        parar.set()
+        observador.join()
+        estatisticas = auditoria.estatisticas()
+        auditoria.fechar()
+        print(f"\nRajada de {len(registros)} registros (fila 200, lotes de 50): {len(registros) / dt:,.0f} registros/s, "
+              f"maior fila {maior_fila[0]}, esperas {estatisticas['esperas']}, gravados {contar(caminho)}")
+
+
+if __name__ == "__main__":
+    main()
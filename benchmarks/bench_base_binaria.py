@@ -0,0 +1,110 @@
+# Carga da base por processo: JSON (compilação completa), cache pickle (<base>.cache)
+# e formato binário .kb com mmap, em bases sintéticas de tamanhos crescentes.
+#
+# Cada forma é medida num processo novo (como um worker recém-iniciado): tempo de
+# carga e memória privada x compartilhada do processo após a carga (Linux, via
+# /proc/self/smaps_rollup). Com o .kb a matriz de pesos fica nas páginas do arquivo,
+# compartilhadas entre todos os workers.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_base_binaria
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from base_binaria import compilar
+from base_conhecimento import carregar_base
+
+TAMANHOS = [(12, 200), (200, 2000), (1000, 8000)]   # (condições, mappings)
+SINTOMAS_POR_CONDICAO = 8
+
+_FILHO = r"""
+import json, sys, time
+import base_binaria
+from base_conhecimento import carregar_base
+t0 = time.perf_counter()
+base = carregar_base(sys.argv[1], usar_cache=sys.argv[2] == "1")
+t1 = time.perf_counter()
+memoria = {}
+try:
+    with open("/proc/self/smaps_rollup") as f:
+        for linha in f:
+            partes = linha.split()
+            if partes[0] in ("Private_Clean:", "Private_Dirty:", "Shared_Clean:", "Shared_Dirty:"):
+                memoria[partes[0][:-1]] = int(partes[1])
+except OSError:
+    pass
+print(json.dumps({"carga_ms": (t1 - t0) * 1000, "memoria_kb": memoria}))
+"""
+
+
+def gerar_base(n_condicoes: int, n_mappings: int, rng: random.Random) -> dict:
+    sintomas = [f"sintoma_{i}" for i in range(n_condicoes * 4)]
+    condicoes = {}
+    for c in range(n_condicoes):
+        condicoes[f"condicao_{c}"] = {
+            "descricao": f"Condição sintética {c}",
+            "sintomas": {s: round(rng.uniform(0.3, 1.0), 2) for s in rng.sample(sintomas, SINTOMAS_POR_CONDICAO)}
+        }
+    palavras = [f"palavra{i}" for i in range(max(50, n_mappings // 2))]
+    mappings = {}
+    while len(mappings) < n_mappings:
+        termo = " ".join(rng.sample(palavras, rng.randint(1, 3)))
+        mappings[termo] = rng.choice(sintomas)
+    return {
+        "config": {"thresholds": {"alto_risco": 0.75, "medio_risco": 0.40, "baixo_risco": 0.10}},
+        "red_flags": {"ideacao_suicida": 1.0, "automutilacao": 1.0},
+        "mappings": mappings,
+        "condicoes": condicoes,
+        "regras": []
+    }
+
+
+def medir(caminho: str, usar_cache: bool, repeticoes: int) -> dict:
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    medidas = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, "-c", _FILHO, caminho, "1" if usar_cache else "0"],
+                               cwd=raiz, capture_output=True, text=True, check=True)
+        medidas.append(json.loads(saida.stdout))
+    melhor = min(medidas, key=lambda m: m["carga_ms"])
+    mem = melhor["memoria_kb"]
+    return {
+        "carga_ms": melhor["carga_ms"],
+        "privada_mb": (mem.get("Private_Clean", 0) + mem.get("Private_Dirty", 0)) / 1024 if mem else None,
+        "compartilhada_mb": (mem.get("Shared_Clean", 0) + mem.get("Shared_Dirty", 0)) / 1024 if mem else None
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da carga da base: JSON x pickle x .kb")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.semente)
+    with tempfile.TemporaryDirectory() as pasta:
+        for n_condicoes, n_mappings in TAMANHOS:
+            caminho = os.path.join(pasta, f"base_{n_condicoes}.json")
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump(gerar_base(n_condicoes, n_mappings, rng), f, ensure_ascii=False)
+            base = carregar_base(caminho)   # grava o <base>.cache
+            kb = caminho[:-5] + ".kb"
+            compilar(base, kb)
+
+            print(f"\n{n_condicoes} condições, {n_mappings} mappings "
+                  f"(JSON {os.path.getsize(caminho) / 1024:,.0f} KB, .kb {os.path.getsize(kb) / 1024:,.0f} KB)")
+            for rotulo, alvo, cache in (("JSON", caminho, False), ("pickle", caminho, True), (".kb", kb, True)):
+                r = medir(alvo, cache, args.repeticoes)
+                memoria = ""
+                if r["privada_mb"] is not None:
+                    memoria = f"  privada {r['privada_mb']:7.1f} MB  compartilhada {r['compartilhada_mb']:7.1f} MB"
+                print(f"  {rotulo:<7} carga {r['carga_ms']:8.1f} ms{memoria}")
+
+
+if __name__ == "__main__":
+    main()
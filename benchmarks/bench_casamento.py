@@ -0,0 +1,132 @@
+# Casamento exato x sem acentos x tolerante a erros de digitação.
+#
+# 1. Revocação: queixas do corpus com acentos removidos e erros de digitação
+#    sorteados; conta quantos fatos do texto limpo ainda são encontrados (e quantos
+#    fatos novos aparecem).
+# 2. Vazão: termos_encontrados sobre textos sintéticos em cada modo, e o custo de
+#    corrigir uma palavra pelo dicionário de deleções x varredura do vocabulário.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_casamento --textos 20000
+
+import argparse
+import random
+import time
+from typing import Dict, List, Set
+
+from base_conhecimento import carregar_base
+from benchmarks.corpus import carregar_casos, expandir
+from casador_termos import CasadorTermos, distancia_edicao
+from nlu_processor import NLUProcessor
+
+MODOS = {
+    "exato": {"dobrar": False, "max_erros": 0},
+    "sem_acentos": {"dobrar": True, "max_erros": 0},
+    "sem_acentos+erros": {"dobrar": True, "max_erros": 1},
+}
+
+_SEM_ACENTO = str.maketrans("áàâãéêíóôõúç", "aaaaeeiooouc")
+
+
+def perturbar(texto: str, rng: random.Random, prob_erro: float) -> str:
+    """Remove acentos e, com probabilidade prob_erro, erra uma letra das palavras longas."""
+    palavras = []
+    for p in texto.translate(_SEM_ACENTO).split(" "):
+        if len(p) >= 8 and rng.random() < prob_erro:
+            i = rng.randrange(1, len(p) - 1)
+            tipo = rng.randrange(3)
+            if tipo == 0:
+                p = p[:i] + p[i + 1:]                          # letra omitida
+            elif tipo == 1:
+                p = p[:i] + p[i] + p[i:]                       # letra repetida
+            else:
+                p = p[:i - 1] + p[i] + p[i - 1] + p[i + 1:]    # vizinhas trocadas
+        palavras.append(p)
+    return " ".join(palavras)
+
+
+def _fatos(nlu: NLUProcessor, casador: CasadorTermos, texto: str) -> Set[str]:
+    base = nlu.base
+    termos = casador.termos_encontrados(nlu.normalizar_texto(texto))
+    return set(nlu._sintomas_de(base, termos)) | set(nlu._red_flags_de(base, termos))
+
+
+def medir_revocacao(nlu: NLUProcessor, casadores: Dict[str, CasadorTermos],
+                    textos: List[str], semente: int, prob_erro: float) -> Dict:
+    rng = random.Random(semente)
+    perturbados = [perturbar(t, rng, prob_erro) for t in textos]
+    referencia = casadores["exato"]
+    limpos = [_fatos(nlu, referencia, t) for t in textos]
+    total = sum(map(len, limpos))
+    resultado = {}
+    for modo, casador in casadores.items():
+        achados = extras = 0
+        for limpo, texto in zip(limpos, perturbados):
+            fatos = _fatos(nlu, casador, texto)
+            achados += len(fatos & limpo)
+            extras += len(fatos - limpo)
+        resultado[modo] = {"revocacao": achados / total if total else 0.0, "fatos_extras": extras}
+    return resultado
+
+
+def medir_vazao(nlu: NLUProcessor, casadores: Dict[str, CasadorTermos], textos: List[str]) -> Dict:
+    normalizados = [nlu.normalizar_texto(t) for t in textos]
+    resultado = {}
+    for modo, casador in casadores.items():
+        inicio = time.perf_counter()
+        for t in normalizados:
+            casador.termos_encontrados(t)
+        resultado[modo] = len(normalizados) / (time.perf_counter() - inicio)
+    return resultado
+
+
+def medir_correcao(casador: CasadorTermos, palavras: List[str]) -> Dict:
+    vocabulario = sorted(casador._vocabulario)
+    inicio = time.perf_counter()
+    for p in palavras:
+        casador._memo.clear()
+        casador.corrigir(p)
+    indice = (time.perf_counter() - inicio) / len(palavras)
+    inicio = time.perf_counter()
+    for p in palavras:
+        min(vocabulario, key=lambda v: distancia_edicao(p, v, casador.max_erros))
+    varredura = (time.perf_counter() - inicio) / len(palavras)
+    return {"indice_us": indice * 1e6, "varredura_us": varredura * 1e6}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do casamento tolerante")
+    parser.add_argument("--casos", default="Casos_para_teste")
+    parser.add_argument("--base", default="base_conhecimento.json")
+    parser.add_argument("--textos", type=int, default=20000)
+    parser.add_argument("--erro", type=float, default=0.3, help="chance de erro por palavra longa")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    base = carregar_base(args.base)
+    nlu = NLUProcessor(base=base)
+    termos = list(base.mappings) + list(base.red_flags_lex)
+    casadores = {modo: CasadorTermos(termos, **opcoes) for modo, opcoes in MODOS.items()}
+
+    casos = [c.texto for c in carregar_casos(args.casos)]
+    revocacao = medir_revocacao(nlu, casadores, casos * 20, args.semente, args.erro)
+    print(f"Revocação com acentos removidos e {args.erro:.0%} de erro nas palavras longas:")
+    for modo, r in revocacao.items():
+        print(f"  {modo:<18} {r['revocacao']:6.1%}  fatos extras: {r['fatos_extras']}")
+
+    textos = list(expandir(carregar_casos(args.casos), args.textos, semente=args.semente))
+    rng = random.Random(args.semente)
+    textos = [perturbar(t, rng, args.erro) if rng.random() < 0.5 else t for t in textos]
+    vazao = medir_vazao(nlu, casadores, textos)
+    print(f"\nVazão de termos_encontrados ({len(textos)} textos):")
+    for modo, v in vazao.items():
+        print(f"  {modo:<18} {v:10,.0f} textos/s  ({v / vazao['exato']:.2f}x do exato)")
+
+    palavras = [p for t in textos[:2000] for p in nlu.normalizar_texto(t).split()
+                if len(p) >= base.casamento["tamanho_minimo_erro"]][:5000]
+    correcao = medir_correcao(casadores["sem_acentos+erros"], palavras)
+    print(f"\nCorreção de uma palavra: índice {correcao['indice_us']:.1f} us, "
+          f"varredura do vocabulário {correcao['varredura_us']:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# Benchmark e regressão guiados por Casos_para_teste.
+#
+# 1. Acurácia: nível de risco e condição esperados do corpus rotulado.
+# 2. Desempenho: vazão e latência por etapa (normalizar_texto, extrair_sintomas,
+#    extrair_red_flags, gerar_resumo, inferir) sobre textos sintéticos.
+# 3. Casos de contexto (negação, passado, terceiros, "mas"): qualquer erro conta
+#    como regressão.
+# Cada execução é gravada em benchmarks/resultados/ e comparada com a anterior.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_casos --textos 100000
+
+import argparse
+import json
+import platform
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import Caso, carregar_casos, expandir
+from triagem import PipelineTriagem, extrair_fatos
+
+DIR_RESULTADOS = Path(__file__).parent / "resultados"
+ETAPAS = ["normalizar_texto", "extrair_sintomas", "extrair_red_flags", "gerar_resumo", "inferir"]
+# queda de vazão (fração) acima da qual a comparação acusa regressão
+TOLERANCIA_VAZAO = 0.10
+
+
+def avaliar_acuracia(pipeline: PipelineTriagem, casos: List[Caso]) -> Dict:
+    acertos_risco = Counter()
+    total_risco = Counter()
+    confusao = Counter()
+    acertos_top1 = acertos_top3 = total_cond = 0
+    erros = []
+
+    for caso in casos:
+        saida = pipeline.processar(caso.texto)["inferencia"]
+        nivel = saida.nivel_risco
+        condicoes = [r.condicao for r in saida.resultados]
+        if caso.risco is not None:
+            total_risco[caso.risco] += 1
+            confusao[f"{caso.risco}->{nivel}"] += 1
+            if nivel == caso.risco:
+                acertos_risco[caso.risco] += 1
+            else:
+                erros.append({"texto": caso.texto, "esperado": caso.risco, "obtido": nivel,
+                              "contexto": caso.contexto})
+        if caso.condicao is not None:
+            total_cond += 1
+            acertos_top1 += bool(condicoes) and condicoes[0] == caso.condicao
+            acertos_top3 += caso.condicao in condicoes[:3]
+            if not condicoes or condicoes[0] != caso.condicao:
+                erros.append({"texto": caso.texto, "esperado": caso.condicao,
+                              "obtido": condicoes[0] if condicoes else None})
+
+    n_risco = sum(total_risco.values())
+    return {
+        "risco": sum(acertos_risco.values()) / n_risco if n_risco else 0.0,
+        "risco_por_nivel": {k: acertos_risco[k] / v for k, v in total_risco.items()},
+        "condicao_top1": acertos_top1 / total_cond if total_cond else 0.0,
+        "condicao_top3": acertos_top3 / total_cond if total_cond else 0.0,
+        "confusao_risco": dict(confusao),
+        "erros": erros
+    }
+
+
+def _resumo_latencias(amostras: List[float]) -> Dict:
+    ordenadas = sorted(amostras)
+    n = len(ordenadas)
+
+    def pct(p):
+        return ordenadas[min(n - 1, int(p / 100 * (n - 1) + 0.5))] * 1e6
+
+    return {
+        "media_us": sum(ordenadas) / n * 1e6,
+        "p50_us": pct(50),
+        "p99_us": pct(99),
+        "total_s": sum(ordenadas)
+    }
+
+
+def medir_desempenho(pipeline: PipelineTriagem, textos: List[str]) -> Dict:
+    nlu, motor = pipeline.nlu, pipeline.motor
+    tempos = {etapa: [] for etapa in ETAPAS}
+    relogio = time.perf_counter
+
+    for texto in textos:
+        t0 = relogio()
+        tn = nlu.normalizar_texto(texto)
+        t1 = relogio()
+        sintomas = nlu.extrair_sintomas(tn)
+        t2 = relogio()
+        red_flags = nlu.extrair_red_flags(tn)
+        t3 = relogio()
+        nlu.gerar_resumo(texto, sintomas)
+        t4 = relogio()
+        motor.inferir(extrair_fatos({"sintomas": sintomas, "red_flags": red_flags}))
+        t5 = relogio()
+        for etapa, dt in zip(ETAPAS, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+            tempos[etapa].append(dt)
+
+    etapas = {etapa: _resumo_latencias(amostras) for etapa, amostras in tempos.items()}
+
+    # vazão ponta a ponta pela API de lote (o caminho usado em produção)
+    inicio = relogio()
+    for _ in pipeline.processar_lote(textos):
+        pass
+    total = relogio() - inicio
+
+    return {
+        "textos": len(textos),
+        "caracteres_medios": sum(map(len, textos)) / len(textos),
+        "vazao_textos_s": len(textos) / total,
+        "etapas": etapas
+    }
+
+
+def ultimo_resultado(diretorio: Path, parametros: Dict) -> Optional[Dict]:
+    """Execução mais recente com os mesmos parâmetros (comparáveis entre si)."""
+    for arquivo in sorted(diretorio.glob("*.json"), reverse=True):
+        with arquivo.open("r", encoding="utf-8") as f:
+            dados = json.load(f)
+        if dados.get("parametros") == parametros:
+            return dados
+    return None
+
+
+def comparar(atual: Dict, anterior: Dict) -> List[str]:
+    """Retorna a lista de regressões (acurácia menor ou vazão abaixo da tolerância)."""
+    regressoes = []
+    print(f"\nComparação com {anterior['data']} (rótulo: {anterior.get('rotulo') or '-'})")
+    for chave in ("risco", "condicao_top1", "condicao_top3"):
+        a, b = atual["acuracia"][chave], anterior["acuracia"][chave]
+        print(f"  acurácia {chave:<14} {b:6.1%} -> {a:6.1%}")
+        if a < b:
+            regressoes.append(f"acurácia {chave} caiu de {b:.1%} para {a:.1%}")
+    a, b = atual["desempenho"]["vazao_textos_s"], anterior["desempenho"]["vazao_textos_s"]
+    print(f"  vazão {b:,.0f} -> {a:,.0f} textos/s ({(a / b - 1):+.1%})")
+    if a < b * (1 - TOLERANCIA_VAZAO):
+        regressoes.append(f"vazão caiu {(1 - a / b):.1%}")
+    for etapa in ETAPAS:
+        a = atual["desempenho"]["etapas"][etapa]["media_us"]
+        b = anterior["desempenho"]["etapas"].get(etapa, {}).get("media_us")
+        if b:
+            print(f"  {etapa:<18} {b:8.1f} -> {a:8.1f} us ({(a / b - 1):+.1%})")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark e regressão com Casos_para_teste")
+    parser.add_argument("--casos", default="Casos_para_teste")
+    parser.add_argument("--base", default="base_conhecimento.json")
+    parser.add_argument("--textos", type=int, default=100000, help="nº de textos sintéticos")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--rotulo", default="", help="identificação da execução (ex.: hash do commit)")
+    parser.add_argument("--saida", default=str(DIR_RESULTADOS))
+    parser.add_argument("--estrito", action="store_true", help="sai com código 1 se houver regressão")
+    args = parser.parse_args(argv)
+
+    pipeline = PipelineTriagem(args.base)
+    casos = carregar_casos(args.casos)
+
+    acuracia = avaliar_acuracia(pipeline, casos)
+    print(f"Corpus: {len(casos)} casos rotulados")
+    print(f"  acurácia de risco: {acuracia['risco']:.1%} "
+          + " ".join(f"{k}={v:.0%}" for k, v in acuracia["risco_por_nivel"].items()))
+    print(f"  condição top-1: {acuracia['condicao_top1']:.1%}  top-3: {acuracia['condicao_top3']:.1%}")
+    # casos de contexto (negação, passado, terceiros, "mas") não toleram erro algum
+    falhas_contexto = [e for e in acuracia["erros"] if e.get("contexto")]
+    for e in falhas_contexto:
+        print(f"  FALHA de contexto: {e['texto']!r} esperado {e['esperado']}, obtido {e['obtido']}")
+
+    textos = list(expandir(casos, args.textos, semente=args.semente))
+    desempenho = medir_desempenho(pipeline, textos)
+    print(f"\nDesempenho: {desempenho['textos']} textos sintéticos "
+          f"({desempenho['caracteres_medios']:.0f} caracteres em média)")
+    print(f"  vazão ponta a ponta: {desempenho['vazao_textos_s']:,.0f} textos/s")
+    for etapa, r in desempenho["etapas"].items():
+        print(f"  {etapa:<18} média {r['media_us']:8.1f} us  p50 {r['p50_us']:8.1f} us  p99 {r['p99_us']:8.1f} us")
+
+    diretorio = Path(args.saida)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    parametros = {"textos": args.textos, "semente": args.semente}
+    anterior = ultimo_resultado(diretorio, parametros)
+
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "rotulo": args.rotulo,
+        "python": platform.python_version(),
+        "versao_base": pipeline.motor.base.versao,
+        "parametros": parametros,
+        "acuracia": acuracia,
+        "desempenho": desempenho
+    }
+    destino = diretorio / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    with destino.open("w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado gravado em {destino}")
+
+    regressoes = comparar(resultado, anterior) if anterior else []
+    regressoes += [f"caso de contexto errado: {e['texto']!r}" for e in falhas_contexto]
+    for r in regressoes:
+        print(f"REGRESSÃO: {r}")
+    if regressoes and args.estrito:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Benchmark do índice invertido sintoma -> condição: compara a varredura completa
+# (todas as condições a cada inferência) com a inferência pelo índice, em bases
+# sintéticas de 12 a 5.000 condições.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_indice
+
+import json
+import os
+import random
+import tempfile
+import time
+
+from motor_inferencia import MotorInferencia
+
+TAMANHOS = [12, 100, 1000, 5000]
+SINTOMAS_POR_CONDICAO = 8
+FATOS_POR_CONSULTA = 5
+CONSULTAS = 2000
+
+
+def gerar_base(n_condicoes: int, rng: random.Random) -> dict:
+    vocabulario = [f"sintoma_{i}" for i in range(n_condicoes * 4)]
+    condicoes = {}
+    for c in range(n_condicoes):
+        sintomas = rng.sample(vocabulario, SINTOMAS_POR_CONDICAO)
+        condicoes[f"condicao_{c}"] = {
+            "descricao": f"Condição sintética {c}",
+            "sintomas": {s: round(rng.uniform(0.3, 1.0), 2) for s in sintomas}
+        }
+    return {
+        "config": {"thresholds": {"alto_risco": 0.75, "medio_risco": 0.40, "baixo_risco": 0.10}},
+        "red_flags": {"ideacao_suicida": 1.0},
+        "mappings": {},
+        "condicoes": condicoes,
+        "regras": []
+    }
+
+
+def varredura_completa(motor: MotorInferencia, fatos_set: set) -> int:
+    """Referência: o laço antigo sobre todas as condições (só a pontuação)."""
+    candidatas = 0
+    for nome, bloco in motor.base.condicoes.items():
+        presentes = bloco["sintomas"].keys() & fatos_set
+        if presentes:
+            sum(bloco["sintomas"][s] for s in presentes) / sum(bloco["sintomas"].values())
+            candidatas += 1
+    return candidatas
+
+
+def medir(funcao, consultas) -> float:
+    inicio = time.perf_counter()
+    for fatos in consultas:
+        funcao(fatos)
+    return (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'condições':>10} {'varredura (us)':>15} {'índice (us)':>12} {'inferir (us)':>13} {'candidatas':>11}")
+    for n in TAMANHOS:
+        dados = gerar_base(n, rng)
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+            json.dump(dados, f)
+        try:
+            motor = MotorInferencia(f.name)
+        finally:
+            os.unlink(f.name)
+
+        vocabulario = list(motor.base.indice_sintomas)
+        consultas = [set(rng.sample(vocabulario, FATOS_POR_CONSULTA)) for _ in range(CONSULTAS)]
+
+        t_varredura = medir(lambda fatos: varredura_completa(motor, fatos), consultas)
+        base = motor.base
+        t_indice = medir(lambda fatos: motor._pontuar(base, fatos), consultas)
+        t_inferir = medir(motor.inferir, consultas)
+        candidatas = sum(len(motor._pontuar(base, fatos)[0]) for fatos in consultas) / len(consultas)
+        print(f"{n:>10} {t_varredura:>15.1f} {t_indice:>12.1f} {t_inferir:>13.1f} {candidatas:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Avaliação das regras de risco da base: tabela compilada (máscaras de bits e índice
+# de regras candidatas, ver regras_risco) x interpretação direta de cada regra a cada
+# inferência, com 10 a 2.000 regras sintéticas sobre fatos, fatos citados (negados ou
+# passados), condições, scores e níveis. Confere também que as duas formas disparam as
+# mesmas regras e sai com código 1 se alguma consulta divergir. As regras da base real
+# (--base) entram em todas as bases sintéticas.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_regras
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Dict, List
+
+from base_conhecimento import BaseConhecimento
+from motor_inferencia import MotorInferencia
+from regras_risco import NIVEIS_RISCO, normalizar_regras
+
+TAMANHOS = [10, 100, 500, 1000, 2000]
+N_CONDICOES = 200
+SINTOMAS_POR_CONDICAO = 8
+FATOS_POR_CONSULTA = 5
+CITADOS_POR_CONSULTA = 40
+
+
+def gerar_base(n_regras: int, rng: random.Random, regras_base: List[Dict]) -> dict:
+    vocabulario = [f"sintoma_{i}" for i in range(N_CONDICOES * 4)]
+    condicoes = {}
+    for c in range(N_CONDICOES):
+        condicoes[f"condicao_{c}"] = {
+            "descricao": f"Condição sintética {c}",
+            "sintomas": {s: round(rng.uniform(0.3, 1.0), 2)
+                         for s in rng.sample(vocabulario, SINTOMAS_POR_CONDICAO)}
+        }
+    red_flags = {f"red_flag_{i}": 1.0 for i in range(5)}
+    fatos = vocabulario + list(red_flags)
+    nomes = list(condicoes)
+
+    regras = list(regras_base)
+    while len(regras) < n_regras:
+        tipo = rng.randrange(6)
+        if tipo == 0:
+            se = {"todos": rng.sample(fatos, 2)}
+        elif tipo == 1:
+            se = {"algum": rng.sample(fatos, 3), "nenhum": rng.sample(fatos, 1)}
+        elif tipo == 2:
+            se = {"condicao_principal": rng.sample(nomes, 2), "risco_minimo": 0.2}
+        elif tipo == 3:
+            c = rng.choice(nomes)
+            se = {"todos": rng.sample(list(condicoes[c]["sintomas"]), 1), "score_minimo": {c: 0.3}}
+        elif tipo == 4:
+            se = {"algum_citado": rng.sample(fatos, 2)}
+        else:
+            se = {"red_flag": True, "nivel": [rng.choice(NIVEIS_RISCO)]}
+        regra = {"nome": f"regra_{len(regras)}", "se": se, "recomendacoes": [f"Conduta {len(regras)}"]}
+        if "nivel" not in se and rng.random() < 0.3:
+            regra["nivel"] = rng.choice(NIVEIS_RISCO[1:])
+        regras.append(regra)
+    return {
+        "config": {"thresholds": {"alto_risco": 0.75, "medio_risco": 0.40, "baixo_risco": 0.10}},
+        "red_flags": red_flags,
+        "mappings": {},
+        "condicoes": condicoes,
+        "regras": regras
+    }
+
+
+def avaliar_ingenuo(regras: List[Dict], red_flags, fatos: set, nivel: str, risco_global: float,
+                    resultados, citados: set) -> tuple:
+    """Referência: confere todas as regras, cláusula a cláusula, em duas etapas."""
+    principal = resultados[0].condicao if resultados else None
+    scores = {r.condicao: r.score for r in resultados}
+
+    def vale(se: Dict, nivel_atual: str) -> bool:
+        if not all(f in fatos for f in se.get("todos", ())):
+            return False
+        if se.get("algum") and not any(f in fatos for f in se["algum"]):
+            return False
+        if any(f in fatos for f in se.get("nenhum", ())):
+            return False
+        if se.get("algum_citado") and not any(f in citados for f in se["algum_citado"]):
+            return False
+        if "red_flag" in se and se["red_flag"] != any(rf in fatos for rf in red_flags):
+            return False
+        if "condicao_principal" in se and principal not in se["condicao_principal"]:
+            return False
+        if any(scores.get(c, 0.0) < v for c, v in se.get("score_minimo", {}).items()):
+            return False
+        if "risco_minimo" in se and risco_global < se["risco_minimo"]:
+            return False
+        if "sem_condicoes" in se and se["sem_condicoes"] != (not resultados):
+            return False
+        return "nivel" not in se or nivel_atual in se["nivel"]
+
+    disparadas = []
+    for i, regra in enumerate(regras):
+        if "nivel" not in regra["se"] and vale(regra["se"], nivel):
+            disparadas.append(i)
+            if "nivel" in regra and NIVEIS_RISCO.index(regra["nivel"]) > NIVEIS_RISCO.index(nivel):
+                nivel = regra["nivel"]
+    for i, regra in enumerate(regras):
+        if "nivel" in regra["se"] and vale(regra["se"], nivel):
+            disparadas.append(i)
+    return nivel, tuple(sorted(disparadas))
+
+
+def medir(funcao, consultas) -> float:
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        funcao(*consulta)
+    return (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das regras de risco: tabela compilada x interpretação")
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--base", default="base_conhecimento.json")
+    args = parser.parse_args(argv)
+
+    with open(args.base, "r", encoding="utf-8") as f:
+        regras_base = json.load(f)["regras"]
+
+    rng = random.Random(args.semente)
+    total_divergencias = 0
+    print(f"{'regras':>7} {'ingênuo (us)':>13} {'tabela (us)':>12} {'inferir (us)':>13} "
+          f"{'candidatas':>11} {'disparadas':>11} {'divergências':>13}")
+    for n in TAMANHOS:
+        dados = gerar_base(n, rng, regras_base)
+        base = BaseConhecimento(dados)
+        motor = MotorInferencia(base=base)
+        tabela = base.tabela_regras
+        regras = normalizar_regras(dados["regras"])
+        vocabulario = list(base.indice_sintomas) + list(base.red_flags)
+
+        # entradas da avaliação como o motor as monta: fatos, nível pelos thresholds, risco, resultados
+        consultas, fatos_consultas = [], []
+        for _ in range(args.consultas):
+            fatos = set(rng.sample(vocabulario, FATOS_POR_CONSULTA))
+            # fatos citados só como negados ou passados (disjuntos dos afirmados)
+            citados = set(rng.sample(vocabulario, CITADOS_POR_CONSULTA)) - fatos
+            r = motor._montar_resultado(base, fatos, motor._pontuar(base, fatos))
+            consultas.append((fatos, motor._calcular_nivel_risco(base, r.risco_global), r.risco_global,
+                              r.resultados, citados))
+            fatos_consultas.append(fatos)
+
+        t_ingenuo = medir(lambda *c: avaliar_ingenuo(regras, base.red_flags, *c), consultas)
+        t_tabela = medir(tabela.avaliar, consultas)
+        t_inferir = medir(motor.inferir, [(f,) for f in fatos_consultas])
+
+        divergencias = sum(tabela.avaliar(*c) != avaliar_ingenuo(regras, base.red_flags, *c) for c in consultas)
+        total_divergencias += divergencias
+        disparadas = sum(len(tabela.avaliar(*c)[1]) for c in consultas) / len(consultas)
+        candidatas = sum(_candidatas(tabela, c[0], c[3]) for c in consultas) / len(consultas)
+        print(f"{len(tabela):>7} {t_ingenuo:>13.1f} {t_tabela:>12.1f} {t_inferir:>13.1f} "
+              f"{candidatas:>11.1f} {disparadas:>11.1f} {divergencias:>13}")
+    if total_divergencias:
+        print(f"ERRO: {total_divergencias} consultas com regras disparadas diferentes da referência")
+        sys.exit(1)
+
+
+def _candidatas(tabela, fatos: set, resultados) -> int:
+    # regras da primeira etapa que a tabela chega a conferir
+    mascara = tabela._sempre
+    for f in fatos:
+        mascara |= tabela._por_fato.get(f, 0)
+    if resultados:
+        mascara |= tabela._por_condicao.get(resultados[0].condicao, 0)
+    return bin(mascara & ~tabela._finais).count("1")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Triagem incremental (SessaoTriagem) x texto inteiro: conversas montadas com os casos
+# de Casos_para_teste (sempre com um caso de contexto) chegam em trechos cortados em
+# fins de palavra sorteados, de modo que gatilhos pospostos caem no trecho seguinte
+# ("tentei me matar" + "anos atrás"). Ao fim, a sessão deve ter os mesmos sintomas,
+# red flags, contexto e nível de risco que o texto inteiro processado de uma vez; sai
+# com código 1 se alguma divisão divergir. Mede também o custo por trecho da sessão e
+# o de reprocessar a conversa acumulada a cada trecho.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_sessao_triagem
+
+import argparse
+import random
+import re
+import sys
+import time
+from typing import List
+
+from benchmarks.corpus import carregar_casos
+from sessao_triagem import SessaoTriagem
+from triagem import PipelineTriagem, extrair_fatos
+
+_RE_PALAVRA = re.compile(r"\w+")
+
+
+def dividir(texto: str, rng: random.Random, max_trechos: int) -> List[str]:
+    """Corta o texto em até max_trechos trechos, sempre logo depois de uma palavra."""
+    fins = [m.end() for m in _RE_PALAVRA.finditer(texto)][:-1]
+    cortes = sorted(rng.sample(fins, min(len(fins), rng.randint(1, max_trechos - 1))))
+    return [texto[a:b] for a, b in zip([0] + cortes, cortes + [len(texto)])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triagem incremental x texto inteiro")
+    parser.add_argument("--divisoes", type=int, default=400)
+    parser.add_argument("--max-trechos", type=int, default=8)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.semente)
+    pipeline = PipelineTriagem()
+    nlu, motor = pipeline.nlu, pipeline.motor
+    casos = carregar_casos()
+    contexto = [c.texto for c in casos if c.contexto]
+    textos = [c.texto for c in casos]
+
+    divergentes = []
+    trechos = 0
+    t_sessao = t_inteiro = 0.0
+    for _ in range(args.divisoes):
+        conversa = [rng.choice(contexto)] + rng.sample(textos, rng.randint(0, 2))
+        rng.shuffle(conversa)
+        texto = " ".join(conversa)
+        partes = dividir(texto, rng, args.max_trechos)
+
+        sessao = SessaoTriagem(pipeline)
+        for i, parte in enumerate(partes):
+            t0 = time.perf_counter()
+            sessao.adicionar(parte, separador="")
+            t1 = time.perf_counter()
+            saida = nlu.processar_texto(texto[:sum(map(len, partes[:i + 1]))])
+            motor.inferir(extrair_fatos(saida), saida["contexto"])
+            t_sessao += t1 - t0
+            t_inteiro += time.perf_counter() - t1
+        trechos += len(partes)
+
+        saida = nlu.processar_texto(texto)
+        esperado = (saida["sintomas"], set(saida["red_flags"]), saida["contexto"],
+                    motor.inferir(extrair_fatos(saida), saida["contexto"]).nivel_risco)
+        obtido = (sessao.sintomas, set(sessao.red_flags), sessao.contexto, sessao.nivel_risco)
+        if obtido != esperado:
+            divergentes.append((partes, esperado, obtido))
+
+    print(f"{args.divisoes} conversas, {trechos} trechos")
+    print(f"  sessão (só o trecho novo)      {t_sessao / trechos * 1e6:>9.1f} us/trecho")
+    print(f"  texto acumulado reprocessado   {t_inteiro / trechos * 1e6:>9.1f} us/trecho")
+    print(f"  divisões com resultado diferente do texto inteiro: {len(divergentes)}")
+    for partes, esperado, obtido in divergentes[:5]:
+        print(f"    {partes!r}\n      texto inteiro: {esperado}\n      sessão:        {obtido}")
+    if divergentes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Sessões com várias rodadas: a cada rodada chegam alguns fatos novos e a sessão é
+# reinferida. Compara a inferência completa sobre os fatos acumulados (inferir) com a
+# repontuação incremental só das condições ligadas aos fatos novos (inferir_sessao),
+# só a pontuação e a inferência inteira (com a montagem do resultado), e mede o
+# ArmazemSessoes com muitas sessões intercaladas e memória limitada.
+#
+# Uso (na raiz do projeto): python -m benchmarks.bench_sessoes
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from base_conhecimento import BaseConhecimento
+from benchmarks.bench_indice import gerar_base
+from motor_inferencia import MotorInferencia, PontuacaoSessao
+from sessoes import ArmazemSessoes
+
+TAMANHOS = [100, 1000, 5000]
+RODADAS = 12
+FATOS_POR_RODADA = 3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de sessões: inferência completa x incremental")
+    parser.add_argument("--sessoes", type=int, default=300)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.semente)
+    print(f"{'condições':>10} {'pontuar (us)':>13} {'delta (us)':>11} {'completa (us)':>14} "
+          f"{'incremental (us)':>17} {'tocadas/rodada':>15} {'condições/rodada':>17}")
+    for n in TAMANHOS:
+        motor = MotorInferencia(base=BaseConhecimento(gerar_base(n, rng)))
+        vocabulario = list(motor.base.indice_sintomas)
+        sessoes = [[rng.sample(vocabulario, FATOS_POR_RODADA) for _ in range(RODADAS)]
+                   for _ in range(args.sessoes)]
+
+        base = motor.base
+        t_pontuar = t_delta = t_completa = t_incremental = 0.0
+        tocadas = avaliadas = 0
+        for rodadas in sessoes:
+            estado, fatos = PontuacaoSessao(), set()
+            so_delta = PontuacaoSessao()
+            for novos in rodadas:
+                novos = [f for f in novos if f not in fatos]
+                fatos.update(novos)
+                t0 = time.perf_counter()
+                motor._pontuar(base, fatos)
+                t1 = time.perf_counter()
+                tocadas += so_delta.aplicar(base, novos, 1)
+                t_pontuar += t1 - t0
+                t_delta += time.perf_counter() - t1
+
+                t0 = time.perf_counter()
+                completo = motor.inferir(fatos)
+                t1 = time.perf_counter()
+                incremental = motor.inferir_sessao(estado, fatos)
+                t2 = time.perf_counter()
+                t_completa += t1 - t0
+                t_incremental += t2 - t1
+                avaliadas += len(completo.resultados)
+                # a ordem das somas muda: mesmos scores a menos de arredondamento
+                assert abs(completo.risco_global - incremental.risco_global) < 1e-9
+        total = args.sessoes * RODADAS
+        print(f"{n:>10} {t_pontuar / total * 1e6:>13.1f} {t_delta / total * 1e6:>11.1f} "
+              f"{t_completa / total * 1e6:>14.1f} {t_incremental / total * 1e6:>17.1f} "
+              f"{tocadas / total:>15.1f} {avaliadas / total:>17.1f}")
+
+    # armazém: sessões intercaladas, capacidade menor que o total de sessões
+    vocabulario = list(motor.base.indice_sintomas)
+    with tempfile.TemporaryDirectory() as pasta:
+        for rotulo, caminho in (("memória", None), ("SQLite", os.path.join(pasta, "sessoes.db"))):
+            armazem = ArmazemSessoes(motor, capacidade=args.sessoes // 2, caminho_sqlite=caminho)
+            rodadas = [(f"s{rng.randrange(args.sessoes)}", rng.sample(vocabulario, FATOS_POR_RODADA))
+                       for _ in range(args.sessoes * RODADAS)]
+            t0 = time.perf_counter()
+            for id_sessao, novos in rodadas:
+                armazem.atualizar(id_sessao, novos)
+            dt = time.perf_counter() - t0
+            print(f"\nArmazém ({rotulo}): {len(rodadas)} rodadas em {args.sessoes} sessões, "
+                  f"{dt / len(rodadas) * 1e6:.1f} us/rodada, {len(armazem)} sessões em memória "
+                  f"(capacidade {armazem.capacidade})")
+            armazem.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Teste de carga do servidor HTTP de triagem: N clientes concorrentes com conexões
+# keep-alive enviando queixas de Casos_para_teste; reporta latência p50/p99 e vazão.
+#
+# Uso (com o servidor rodando): python -m benchmarks.carga_servidor --clientes 64 --duracao 10
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from typing import List
+
+
+def carregar_textos(caminho: str = "Casos_para_teste") -> List[str]:
+    with open(caminho, "r", encoding="utf-8") as f:
+        return re.findall(r'"([^"]+)"', f.read())
+
+
+async def cliente(host: str, porta: int, textos: List[str], fim: float,
+                  latencias: List[float], erros: List[int], rng: random.Random) -> None:
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        while time.perf_counter() < fim:
+            corpo = json.dumps({"texto": rng.choice(textos)}).encode("utf-8")
+            requisicao = (
+                f"POST /triagem HTTP/1.1\r\nHost: {host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n"
+            ).encode("latin-1") + corpo
+            inicio = time.perf_counter()
+            writer.write(requisicao)
+            await writer.drain()
+            cabecalho = await reader.readuntil(b"\r\n\r\n")
+            linhas = cabecalho.decode("latin-1").split("\r\n")
+            tamanho = 0
+            for linha in linhas[1:]:
+                if linha.lower().startswith("content-length:"):
+                    tamanho = int(linha.split(":", 1)[1])
+            await reader.readexactly(tamanho)
+            latencias.append(time.perf_counter() - inicio)
+            if not linhas[0].startswith("HTTP/1.1 200"):
+                erros.append(1)
+    finally:
+        writer.close()
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def executar(args) -> None:
+    textos = carregar_textos(args.casos)
+    latencias: List[float] = []
+    erros: List[int] = []
+    inicio = time.perf_counter()
+    fim = inicio + args.duracao
+    await asyncio.gather(*(
+        cliente(args.host, args.porta, textos, fim, latencias, erros, random.Random(i))
+        for i in range(args.clientes)
+    ))
+    total = time.perf_counter() - inicio
+    if not latencias:
+        print("Nenhuma requisição concluída.")
+        return
+    print(f"requisições: {len(latencias)}  erros: {len(erros)}  clientes: {args.clientes}")
+    print(f"vazão: {len(latencias) / total:.0f} req/s")
+    print(f"latência p50: {percentil(latencias, 50) * 1000:.2f} ms  "
+          f"p99: {percentil(latencias, 99) * 1000:.2f} ms  "
+          f"máx: {max(latencias) * 1000:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do servidor de triagem")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--clientes", type=int, default=32)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos")
+    parser.add_argument("--casos", default="Casos_para_teste")
+    asyncio.run(executar(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Corpus rotulado a partir de Casos_para_teste e expansão sintética para benchmarks.
+
+import random
+import re
+import unicodedata
+from typing import Iterator, List, NamedTuple, Optional
+
+# cabeçalhos de seção -> nível de risco esperado
+_SECOES_RISCO = {
+    "alto risco": "Alto",
+    "medio risco": "Médio",
+    "baixo risco": "Baixo",
+    "risco minimo": "Mínimo"
+}
+
+# rótulos de condição do arquivo que não coincidem com o nome na base
+_ALIASES_CONDICAO = {
+    "transtorno do panico": "transtorno_panico",
+}
+
+_RE_CASO = re.compile(r'^"(.+)"\s*$')
+_RE_ROTULO = re.compile(r"^([^\"].*):\s*$")
+
+# frases neutras usadas para variar o comprimento dos textos sintéticos
+FRASES_NEUTRAS = [
+    "Hoje fui trabalhar normalmente",
+    "Moro com minha família há alguns anos",
+    "Meu médico pediu para eu procurar ajuda",
+    "Não sei bem como explicar o que acontece",
+    "Isso começou há algumas semanas",
+    "Costumo caminhar no fim de semana",
+    "Estou escrevendo porque uma amiga recomendou",
+    "Minha rotina mudou bastante no último mês",
+]
+
+
+class Caso(NamedTuple):
+    texto: str
+    risco: Optional[str]      # nível esperado (seções de risco)
+    condicao: Optional[str]   # condição esperada (casos por condição)
+    contexto: bool = False    # caso de regressão de negação/passado/terceiros
+
+
+def _dobrar(texto: str) -> str:
+    sem_acento = unicodedata.normalize("NFD", texto)
+    return "".join(c for c in sem_acento if not unicodedata.combining(c)).lower()
+
+
+def carregar_casos(caminho: str = "Casos_para_teste") -> List[Caso]:
+    """
+    Lê o arquivo de casos: seções de risco (ALTO/MÉDIO/MÍNIMO) e, depois de
+    "CASOS ADICIONAIS POR CONDIÇÃO", blocos "Condição:" seguidos das queixas.
+    Seções "CASOS DE CONTEXTO - <risco>" marcam os casos com contexto=True.
+    """
+    casos = []
+    risco = None
+    condicao = None
+    contexto = False
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            m = _RE_CASO.match(linha)
+            if m:
+                casos.append(Caso(m.group(1), risco if condicao is None else None, condicao, contexto))
+                continue
+            dobrada = _dobrar(linha)
+            if "casos adicionais" in dobrada:
+                risco = None
+                condicao = None
+                contexto = False
+                continue
+            secao = next((r for chave, r in _SECOES_RISCO.items() if chave in dobrada), None)
+            if secao is not None and "casos" in dobrada:
+                risco = secao
+                condicao = None
+                contexto = "casos de contexto" in dobrada
+                continue
+            m = _RE_ROTULO.match(linha)
+            if m:
+                nome = _dobrar(m.group(1)).strip()
+                condicao = _ALIASES_CONDICAO.get(nome, nome.replace(" ", "_"))
+    return casos
+
+
+def expandir(casos: List[Caso], total: int, semente: int = 42,
+             max_frases: int = 12) -> Iterator[str]:
+    """
+    Gera `total` textos sintéticos de comprimento variado, misturando queixas do
+    corpus com frases neutras (gerador: memória constante).
+    """
+    rng = random.Random(semente)
+    textos = [c.texto for c in casos]
+    for _ in range(total):
+        n = rng.randint(1, max_frases)
+        frases = []
+        for _ in range(n):
+            if rng.random() < 0.4:
+                frases.append(rng.choice(textos))
+            else:
+                frases.append(rng.choice(FRASES_NEUTRAS) + ".")
+        yield " ".join(frases)
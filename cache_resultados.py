@@ -0,0 +1,90 @@
+# Cache LRU com validade (TTL) opcional para resultados do NLU e do motor.
+#
+# Queixas repetidas (aberturas de chat padronizadas, textos colados, reenvios) e,
+# mais ainda, conjuntos de fatos repetidos pulam o recálculo. O cache é esvaziado
+# quando a versão da base muda; os valores guardados são compartilhados entre as
+# chamadas e não devem ser modificados por quem os recebe.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_AUSENTE = object()
+
+
+class CacheLRU:
+    def __init__(self, capacidade: int = 1024, ttl: Optional[float] = None):
+        """
+        capacidade: máximo de entradas (a menos usada recentemente sai primeiro).
+        ttl: validade de cada entrada em segundos (None = sem expiração).
+        """
+        if capacidade <= 0:
+            raise ValueError("capacidade do cache deve ser positiva")
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.versao: Optional[str] = None
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()  # chave -> (valor, expira_em)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.expulsoes = 0
+        self.expiracoes = 0
+        self.invalidacoes = 0
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def validar_versao(self, versao: str) -> None:
+        """Esvazia o cache se a base mudou desde a última chamada."""
+        if versao != self.versao:
+            with self._lock:
+                if versao != self.versao:
+                    if self._dados:
+                        self.invalidacoes += 1
+                    self._dados.clear()
+                    self.versao = versao
+
+    def obter(self, chave: Hashable, padrao: Any = None) -> Any:
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                self.falhas += 1
+                return padrao
+            valor, expira_em = item
+            if expira_em is not None and time.monotonic() >= expira_em:
+                del self._dados[chave]
+                self.expiracoes += 1
+                self.falhas += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave: Hashable, valor: Any) -> None:
+        expira_em = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._dados[chave] = (valor, expira_em)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+                self.expulsoes += 1
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "entradas": len(self._dados),
+                "capacidade": self.capacidade,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "expulsoes": self.expulsoes,
+                "expiracoes": self.expiracoes,
+                "invalidacoes": self.invalidacoes,
+                "versao_base": self.versao
+            }
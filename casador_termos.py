@@ -0,0 +1,367 @@
+# Casador de termos: trie de tokens que encontra todos os termos cadastrados
+# (mappings e red-flags) numa única passada linear sobre o texto normalizado.
+#
+# Opcionalmente ignora acentos ("nao durmo" casa "não durmo") e tolera erros de
+# digitação (distância de edição limitada, "irritabilidde" -> "irritabilidade") por meio
+# de um dicionário de deleções (estilo SymSpell) montado uma vez sobre o vocabulário
+# dos termos: corrigir um token custa algumas consultas a dict, não uma varredura
+# do vocabulário.
+#
+# Gatilhos de contexto (negação, passado, terceiros: "não", "nunca", "meu amigo")
+# e palavras de quebra ("mas") ficam na mesma trie; na mesma passada, cada
+# ocorrência recebe os flags dos gatilhos cujo escopo a alcança (até `janela`
+# palavras, sem atravessar fim de oração nem quebra).
+
+import re
+import unicodedata
+from itertools import combinations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+_RE_TOKEN = re.compile(r"\w+")
+
+# limite do memo de correções por casador (tokens distintos vistos nos textos)
+_MAX_MEMO = 100000
+
+# flags de contexto de uma ocorrência (0 = afirmada pelo próprio paciente, no presente)
+NEGADO = 1
+PASSADO = 2
+TERCEIROS = 4
+NOMES_CONTEXTO = {NEGADO: "negado", PASSADO: "passado", TERCEIROS: "terceiros"}
+
+# chave dos gatilhos num nó da trie (os tokens são sempre str)
+_GATILHO = 0
+
+
+def _tabela_dobra() -> Dict[int, str]:
+    # letra acentuada -> letra base, um caractere por outro (preserva as posições)
+    tabela = {}
+    for codigo in range(0xC0, 0x250):
+        c = chr(codigo)
+        base = "".join(x for x in unicodedata.normalize("NFD", c) if not unicodedata.combining(x))
+        if len(base) == 1 and base != c:
+            tabela[codigo] = base
+    return tabela
+
+
+_DOBRA = _tabela_dobra()
+
+
+def dobrar_acentos(texto: str) -> str:
+    """Remove acentos e cedilha sem mudar o comprimento do texto."""
+    return texto.translate(_DOBRA)
+
+
+def distancia_edicao(a: str, b: str, limite: int) -> int:
+    """
+    Distância de Damerau-Levenshtein restrita (transposição de vizinhos conta 1).
+    Retorna limite + 1 assim que o limite é ultrapassado.
+    """
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        atual = [i] + [0] * len(b)
+        menor = i
+        for j in range(1, len(b) + 1):
+            custo = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + custo)
+            if (anterior2 is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                v = min(v, anterior2[j - 2] + 1)
+            atual[j] = v
+            menor = min(menor, v)
+        if menor > limite:
+            return limite + 1
+        anterior2, anterior = anterior, atual
+    return anterior[-1]
+
+
+def _delecoes(palavra: str, max_erros: int) -> Set[str]:
+    resultado = set()
+    for n in range(1, min(max_erros, len(palavra) - 1) + 1):
+        for posicoes in combinations(range(len(palavra)), n):
+            resultado.add("".join(c for i, c in enumerate(palavra) if i not in posicoes))
+    return resultado
+
+
+def descrever_contexto(flags: int) -> List[str]:
+    """Nomes dos flags de contexto, ex.: NEGADO | TERCEIROS -> ["negado", "terceiros"]."""
+    return [nome for flag, nome in NOMES_CONTEXTO.items() if flags & flag]
+
+
+class Ocorrencia(NamedTuple):
+    inicio: int
+    fim: int
+    termo: str
+    contexto: int = 0  # flags NEGADO / PASSADO / TERCEIROS
+
+
+def separar_contexto(ocorrencias: Iterable[Ocorrencia]) -> Tuple[List[str], Dict[str, int]]:
+    """(termos afirmados na ordem da primeira ocorrência, termo só em contexto -> flags)."""
+    afirmados = {}
+    outros: Dict[str, int] = {}
+    for o in ocorrencias:
+        if o.contexto:
+            outros[o.termo] = outros.get(o.termo, 0) | o.contexto
+        else:
+            afirmados[o.termo] = None
+    return list(afirmados), {t: f for t, f in outros.items() if t not in afirmados}
+
+
+class CasadorTermos:
+    def __init__(self, termos: Iterable[str] = (), dobrar: bool = False,
+                 max_erros: int = 0, tamanho_minimo_erro: int = 7):
+        """
+        Cada nó da trie é um dict token -> nó filho; a chave None guarda os
+        termos que terminam naquele nó e a chave _GATILHO, os gatilhos de contexto.
+
+        dobrar: compara sem acentos. max_erros: erros de digitação tolerados por token
+        (só em tokens com pelo menos tamanho_minimo_erro letras, no texto e no termo).
+        """
+        self._raiz: Dict = {}
+        self.total_termos = 0
+        self.max_tokens = 0  # tokens do termo mais longo
+        self.dobrar = dobrar
+        self.max_erros = max_erros
+        self.tamanho_minimo_erro = tamanho_minimo_erro
+        self._forma: Dict[str, str] = {}         # termo -> forma comparada (sem acentos, se dobrar)
+        self._vocabulario: Set[str] = set()      # tokens de todos os termos
+        self._indice_erros: Dict[str, List[str]] = {}  # deleção -> tokens do vocabulário
+        self._memo: Dict[str, str] = {}          # token do texto -> token corrigido
+        self.janela = 5                          # palavras alcançadas por um gatilho
+        self._tem_gatilhos = False
+        for termo in termos:
+            self.adicionar(termo)
+
+    def adicionar(self, termo: str) -> None:
+        forma = dobrar_acentos(termo) if self.dobrar else termo
+        tokens = _RE_TOKEN.findall(forma)
+        if not tokens:
+            return
+        no = self._raiz
+        for tok in tokens:
+            no = no.setdefault(tok, {})
+        finais = no.setdefault(None, [])
+        if termo not in finais:
+            finais.append(termo)
+            self._forma[termo] = forma
+            self.total_termos += 1
+            self.max_tokens = max(self.max_tokens, len(tokens))
+            for tok in tokens:
+                self._indexar_token(tok)
+            self._memo.clear()
+
+    def adicionar_gatilho(self, gatilho: str, flag: int, para_tras: bool = False) -> None:
+        """
+        Registra um gatilho de contexto. Por padrão ele alcança as palavras seguintes
+        ("nunca pensei em me matar"); com para_tras, as anteriores da mesma oração
+        ("tentei me matar anos atrás"). Um gatilho que faz parte de um termo casado
+        ("nao durmo") não vale como gatilho. flag 0 registra uma quebra, que encerra
+        os escopos abertos ("mas").
+        """
+        forma = dobrar_acentos(gatilho) if self.dobrar else gatilho
+        tokens = _RE_TOKEN.findall(forma)
+        if not tokens:
+            return
+        no = self._raiz
+        for tok in tokens:
+            no = no.setdefault(tok, {})
+        item = (forma, flag, para_tras)
+        gatilhos = no.setdefault(_GATILHO, [])
+        if item not in gatilhos:
+            gatilhos.append(item)
+            self._tem_gatilhos = True
+            self.max_tokens = max(self.max_tokens, len(tokens))
+            for tok in tokens:
+                self._indexar_token(tok)
+            self._memo.clear()
+
+    def configurar_contexto(self, janela: int, quebras: Iterable[str] = ()) -> None:
+        """janela: palavras alcançadas por um gatilho. quebras: palavras que encerram o escopo."""
+        self.janela = janela
+        for quebra in quebras:
+            self.adicionar_gatilho(quebra, 0)
+
+    def _indexar_token(self, tok: str) -> None:
+        if tok in self._vocabulario:
+            return
+        self._vocabulario.add(tok)
+        if self.max_erros > 0 and len(tok) >= self.tamanho_minimo_erro:
+            for chave in _delecoes(tok, self.max_erros) | {tok}:
+                self._indice_erros.setdefault(chave, []).append(tok)
+
+    def corrigir(self, tok: str) -> str:
+        """Token do vocabulário mais próximo (até max_erros), ou o próprio token."""
+        if tok in self._vocabulario or len(tok) < self.tamanho_minimo_erro or not self._indice_erros:
+            return tok
+        corrigido = self._memo.get(tok)
+        if corrigido is not None:
+            return corrigido
+
+        melhor, melhor_dist = tok, self.max_erros + 1
+        vistos = set()
+        for chave in _delecoes(tok, self.max_erros) | {tok}:
+            for candidato in self._indice_erros.get(chave, ()):
+                if candidato in vistos:
+                    continue
+                vistos.add(candidato)
+                d = distancia_edicao(tok, candidato, self.max_erros)
+                if d < melhor_dist or (d == melhor_dist and candidato < melhor):
+                    melhor, melhor_dist = candidato, d
+
+        if len(self._memo) >= _MAX_MEMO:
+            self._memo.clear()
+        self._memo[tok] = melhor
+        return melhor
+
+    def buscar(self, texto: str, estatisticas: Optional[Dict[str, int]] = None,
+               limites: Optional[List[int]] = None) -> List[Ocorrencia]:
+        """
+        Retorna todas as ocorrências (inclusive sobrepostas) dos termos no texto,
+        com a mesma semântica de r'\\b' + re.escape(termo) + r'\\b'. Se receber
+        `estatisticas`, preenche tokens analisados, passos dados na trie e tokens
+        corrigidos.
+
+        Com acentos dobrados, termos que só diferem na acentuação geram uma única
+        ocorrência (a do termo escrito como no texto, se houver).
+
+        limites: posições (crescentes) em que começam as orações do texto; o escopo
+        dos gatilhos de contexto não atravessa esses limites.
+        """
+        comparado = dobrar_acentos(texto) if self.dobrar else texto
+        tolerante = self.max_erros > 0
+        tokens = []
+        correcoes = 0
+        for m in _RE_TOKEN.finditer(comparado):
+            tok = m.group()
+            if tolerante:
+                corrigido = self.corrigir(tok)
+                if corrigido != tok:
+                    correcoes += 1
+                    tokens.append((corrigido, m.start(), m.end(), True))
+                    continue
+            tokens.append((tok, m.start(), m.end(), False))
+        n = len(tokens)
+        raiz = self._raiz
+        forma = self._forma
+        ocorrencias = []
+        passos = 0
+
+        contexto = self._tem_gatilhos
+        escopos: Dict[int, tuple] = {}   # flag -> (primeiro, último token alcançado)
+        primeiro_token = []              # token inicial de cada ocorrência
+        coberto_ate = -1                 # último token coberto por um termo casado
+        oracao = 0                       # primeiro token da oração atual
+        limites = limites or ()
+        k = 0
+        janela = self.janela
+
+        for i in range(n):
+            no = raiz.get(tokens[i][0])
+            if no is None:
+                continue
+            # limites de oração só importam onde algo casa: conferidos aqui, não a cada token
+            if k < len(limites) and limites[k] <= tokens[i][1]:
+                while k < len(limites) and limites[k] <= tokens[i][1]:
+                    k += 1
+                escopos.clear()
+                oracao = i
+            flags = 0
+            if escopos:
+                for flag, (de, ate) in escopos.items():
+                    if de <= i <= ate:
+                        flags |= flag
+            inicio = tokens[i][1]
+            j = i
+            alterado = tokens[i][3]
+            achados = None
+            while True:
+                passos += 1
+                finais = no.get(None)
+                if finais:
+                    fim = tokens[j][2]
+                    if alterado:
+                        trecho = self._reconstruir(comparado, tokens, i, j)
+                    else:
+                        trecho = comparado[inicio:fim]
+                    # confere os separadores entre tokens (ex.: espaço simples)
+                    casados = [termo for termo in finais if forma[termo] == trecho]
+                    if len(casados) > 1:
+                        original = texto[inicio:fim]
+                        casados = [next((t for t in casados if t == original), casados[0])]
+                    for termo in casados:
+                        ocorrencias.append(Ocorrencia(inicio, fim, termo, flags))
+                        primeiro_token.append(i)
+                        coberto_ate = max(coberto_ate, j)
+                if contexto:
+                    gatilhos = no.get(_GATILHO)
+                    if gatilhos:
+                        trecho = (self._reconstruir(comparado, tokens, i, j) if alterado
+                                  else comparado[inicio:tokens[j][2]])
+                        for g in gatilhos:
+                            if g[0] == trecho:
+                                if achados is None:
+                                    achados = []
+                                achados.append((j, g[1], g[2]))
+                j += 1
+                if j == n:
+                    break
+                no = no.get(tokens[j][0])
+                if no is None:
+                    break
+                alterado = alterado or tokens[j][3]
+
+            if achados:
+                for j, flag, para_tras in achados:
+                    if j <= coberto_ate:
+                        continue  # o gatilho faz parte de um termo ("nao durmo")
+                    if not flag:
+                        # quebra ("mas"): encerra os escopos abertos
+                        escopos.clear()
+                        oracao = j + 1
+                        continue
+                    if not para_tras:
+                        escopos[flag] = (j + 1, j + janela)
+                        continue
+                    # alcança as ocorrências anteriores da mesma oração, dentro da janela
+                    desde = max(oracao, i - janela)
+                    x = len(ocorrencias) - 1
+                    while x >= 0 and primeiro_token[x] >= desde:
+                        if primeiro_token[x] < i:
+                            o = ocorrencias[x]
+                            ocorrencias[x] = o._replace(contexto=o.contexto | flag)
+                        x -= 1
+
+        if estatisticas is not None:
+            estatisticas["tokens"] = n
+            estatisticas["passos_trie"] = passos
+            estatisticas["correcoes"] = correcoes
+        return ocorrencias
+
+    @staticmethod
+    def _reconstruir(texto: str, tokens: list, i: int, j: int) -> str:
+        # tokens corrigidos com os separadores originais entre eles
+        partes = [tokens[i][0]]
+        for k in range(i + 1, j + 1):
+            partes.append(texto[tokens[k - 1][2]:tokens[k][1]])
+            partes.append(tokens[k][0])
+        return "".join(partes)
+
+    def termos_encontrados(self, texto: str, estatisticas: Optional[Dict[str, int]] = None) -> List[str]:
+        """Termos distintos presentes no texto, na ordem da primeira ocorrência."""
+        return list(dict.fromkeys(o.termo for o in self.buscar(texto, estatisticas)))
+
+    def termos_em_contexto(self, texto: str, estatisticas: Optional[Dict[str, int]] = None,
+                           limites: Optional[List[int]] = None) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Separa os termos do texto em afirmados (alguma ocorrência sem flags) e os
+        demais, com os flags de todas as suas ocorrências combinados.
+        """
+        return separar_contexto(self.buscar(texto, estatisticas, limites))
+
+    def __getstate__(self):
+        # o memo de correções é só do processo; não vai para o cache em disco
+        estado = dict(self.__dict__)
+        estado["_memo"] = {}
+        return estado
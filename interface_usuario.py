@@ -1,8 +1,18 @@
 # UI Tkinter que integra NLU + MotorInferencia e mostra justificativas, risco e recomendações.
+# A análise roda numa thread de trabalho; o resultado volta ao loop do Tk via after().
+# Com "Acumular na sessão", cada análise soma seus fatos aos das anteriores
+# (perguntas de seguimento) até o clique em "Nova sessão".
+import queue
+import threading
+from typing import Optional
 import tkinter as tk
 from tkinter import ttk, messagebox
-from nlu_processor import NLUProcessor
-from motor_inferencia import MotorInferencia
+import auditoria
+from base_conhecimento import FonteBase
+from nlu_processor import CacheFrases, NLUProcessor
+from motor_inferencia import MotorInferencia, ResultadoInferencia
+from sessoes import ArmazemSessoes
+from triagem import extrair_fatos
 
 
 class AppTriagem(tk.Tk):
@@ -12,9 +22,16 @@ class AppTriagem(tk.Tk):
         self.geometry("920x760")
         self.config(bg="#f7f7f7")
 
-        # inicializa NLU e Motor (apontando para base_conhecimento.json)
-        self.nlu = NLUProcessor("base_conhecimento.json")
-        self.motor = MotorInferencia("base_conhecimento.json")
+        # inicializa NLU e Motor com a mesma base compilada (base_conhecimento.json),
+        # recarregada a quente quando o arquivo for editado
+        self.fonte_base = FonteBase.de_arquivo("base_conhecimento.json")
+        self.fonte_base.iniciar_observacao()
+        self.nlu = NLUProcessor(base=self.fonte_base)
+        self.motor = MotorInferencia(base=self.fonte_base)
+        self.sessoes = ArmazemSessoes(self.motor, capacidade=16)
+        # com TRIAGEM_AUDITORIA no ambiente, cada análise pedida (não as feitas ao digitar) é registrada
+        self.auditoria = auditoria.do_ambiente()
+        self._id_sessao = 1
 
         # Cabeçalho
         lbl = tk.Label(self, text="Sistema Especialista de Triagem e Pré-diagnóstico", font=("Helvetica", 16, "bold"),
@@ -29,8 +46,18 @@ class AppTriagem(tk.Tk):
         self.txt_entrada = tk.Text(frm_in, height=6, width=120)
         self.txt_entrada.pack(pady=6)
 
-        btn = ttk.Button(frm_in, text="Analisar", command=self.analisar)
-        btn.pack(pady=6)
+        frm_acoes = tk.Frame(frm_in, bg="#f7f7f7")
+        frm_acoes.pack(pady=6)
+        btn = ttk.Button(frm_acoes, text="Analisar", command=self.analisar)
+        btn.pack(side="left")
+        self.var_ao_digitar = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frm_acoes, text="Analisar ao digitar", variable=self.var_ao_digitar).pack(side="left", padx=12)
+        self.var_sessao = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frm_acoes, text="Acumular na sessão", variable=self.var_sessao).pack(side="left")
+        ttk.Button(frm_acoes, text="Nova sessão", command=self.nova_sessao).pack(side="left", padx=(6, 12))
+        self.lbl_status = tk.Label(frm_acoes, text="", bg="#f7f7f7", fg="#666")
+        self.lbl_status.pack(side="left")
+        self.txt_entrada.bind("<KeyRelease>", self._ao_digitar)
 
         # Notebook com abas de saída
         notebook = ttk.Notebook(self)
@@ -85,55 +112,145 @@ class AppTriagem(tk.Tk):
                               bg="#f7f7f7", fg="#666")
         lbl_rodape.pack(pady=8)
 
+        # análise em segundo plano: pedidos -> thread de trabalho -> respostas -> after()
+        self._pedidos = queue.Queue()
+        self._respostas = queue.Queue()
+        self._geracao = 0  # só a resposta do pedido mais recente é exibida
+        self._coletando = False
+        self._debounce = None
+        self._cache_frases = CacheFrases()  # usado só pela thread de trabalho
+        threading.Thread(target=self._trabalhar, name="analise", daemon=True).start()
+
     def analisar(self):
         texto = self.txt_entrada.get("1.0", tk.END).strip()
         if not texto:
             messagebox.showwarning("Aviso", "Por favor, descreva a queixa ou sintomas.")
             return
+        self._solicitar(texto, incremental=False)
+
+    def nova_sessao(self):
+        # os fatos acumulados até aqui deixam de valer para as próximas análises
+        self.sessoes.encerrar(str(self._id_sessao))
+        self._id_sessao += 1
+        self.lbl_status.config(text=f"Sessão {self._id_sessao} iniciada")
+
+    def _ao_digitar(self, _evento=None):
+        if not self.var_ao_digitar.get():
+            return
+        # debounce: só analisa depois de uma pausa na digitação
+        if self._debounce is not None:
+            self.after_cancel(self._debounce)
+        self._debounce = self.after(400, self._analisar_ao_digitar)
+
+    def _analisar_ao_digitar(self):
+        self._debounce = None
+        texto = self.txt_entrada.get("1.0", tk.END).strip()
+        if texto:
+            # só as frases alteradas desde a última análise são reprocessadas
+            self._solicitar(texto, incremental=True)
+
+    def _solicitar(self, texto: str, incremental: bool):
+        self._geracao += 1
+        sessao = str(self._id_sessao) if self.var_sessao.get() else None
+        self._pedidos.put((self._geracao, texto, incremental, sessao))
+        self.lbl_status.config(text="Analisando...")
+        if not self._coletando:
+            self._coletando = True
+            self.after(30, self._coletar)
+
+    def _trabalhar(self):
+        while True:
+            pedidos = [self._pedidos.get()]
+            while not self._pedidos.empty():
+                pedidos.append(self._pedidos.get_nowait())
+            # prévias ao digitar acumuladas: só a mais recente interessa; as análises
+            # pedidas no botão acumulam fatos na sessão e vão para a auditoria, então
+            # todas são processadas, em ordem
+            for i, pedido in enumerate(pedidos):
+                if pedido[2] and i + 1 < len(pedidos):
+                    continue
+                self._processar_pedido(*pedido)
+
+    def _processar_pedido(self, geracao: int, texto: str, incremental: bool, sessao: Optional[str]):
+        try:
+            base = self.nlu.base  # a mesma versão no NLU, no motor e na auditoria
+            # NLU -> retorna sintomas (dict), red_flags (list), resumo
+            nlu_out = self.nlu.processar_texto(texto, self._cache_frases if incremental else None, base)
+            # transforma para conjunto de chaves (fatos) para o motor: sintomas + red flags
+            fatos = extrair_fatos(nlu_out)
+            # inferência (na sessão: sobre os fatos de todas as análises dela); a análise
+            # ao digitar é só uma prévia do texto e não acumula fatos na sessão
+            if sessao is None or incremental:
+                out = self.motor.inferir(fatos, nlu_out.get("contexto"), base)
+            else:
+                out = self.sessoes.atualizar(sessao, fatos, nlu_out.get("contexto"))
+                fatos = set(self.sessoes.obter(sessao).fatos)
+            if self.auditoria is not None and not incremental:
+                self.auditoria.registrar_triagem(texto, nlu_out, out, base.versao,
+                                                 "interface", sessao)
+            self._respostas.put((geracao, (nlu_out, fatos, out), None))
+        except Exception as e:
+            self._respostas.put((geracao, None, e))
+
+    def _coletar(self):
+        # roda no loop do Tk: consome as respostas prontas e renderiza a mais recente
+        resposta = None
+        while not self._respostas.empty():
+            resposta = self._respostas.get_nowait()
+        if resposta is not None and resposta[0] == self._geracao:
+            self._coletando = False
+            self.lbl_status.config(text="")
+            _, dados, erro = resposta
+            if erro is not None:
+                messagebox.showerror("Erro", f"Falha na análise: {erro}")
+            else:
+                self._renderizar(*dados)
+            return
+        self.after(30, self._coletar)
 
-        # NLU -> retorna sintomas (dict), red_flags (list), resumo
-        nlu_out = self.nlu.processar_texto(texto)
+    def _renderizar(self, nlu_out: dict, fatos: set, out: ResultadoInferencia):
+        """Monta o texto de cada painel e atualiza cada widget uma única vez."""
         sintomas_dict = nlu_out.get("sintomas", {})
         red_flags = nlu_out.get("red_flags", [])
         resumo = nlu_out.get("resumo", "")
 
-        # transforma para conjunto de chaves (fatos) para o motor
-        fatos = set(k.lower() for k in sintomas_dict.keys())
-        # inclui red_flags textuais como fatos també
-        for rf in red_flags:
-            fatos.add(rf.lower())
-
-        # inferência
-        out = self.motor.inferir(fatos)
-
-        # atualizar GUI
-        self.txt_rel.config(state="normal")
-        self.txt_sinais.config(state="normal")
-        self.txt_recs.config(state="normal")
-        self.txt_inf.config(state="normal")
-        self.txt_nlu.config(state="normal")
-
-        # limpar
-        self.txt_rel.delete("1.0", tk.END)
-        self.txt_sinais.delete("1.0", tk.END)
-        self.txt_recs.delete("1.0", tk.END)
-        self.txt_inf.delete("1.0", tk.END)
-        self.txt_nlu.delete("1.0", tk.END)
-
-        # preencher relatorio
-        rel_motor = out.get("relatorio_queixas", "")
+        # relatorio
+        rel_motor = out.relatorio_queixas
         texto_relatorio = resumo if resumo else rel_motor
-        self.txt_rel.insert(tk.END, texto_relatorio)
 
         # sinais detectados (NLU)
         if sintomas_dict:
-            for k, v in sorted(sintomas_dict.items()):
-                self.txt_sinais.insert(tk.END, f"• {k.replace('_', ' ')} (ocorrências: {v})\n")
+            texto_sinais = "".join(f"• {k.replace('_', ' ')} (ocorrências: {v})\n"
+                                   for k, v in sorted(sintomas_dict.items()))
+        else:
+            texto_sinais = "Nenhum sinal identificado pelo NLU.\n"
+
+        # recomendações
+        texto_recs = "".join(f"• {r}\n" for r in out.recomendacoes)
+
+        # inferências e justificativas
+        resultados = out.resultados
+        if not resultados:
+            texto_inf = "Nenhuma condição compatível encontrada.\n"
         else:
-            self.txt_sinais.insert(tk.END, "Nenhum sinal identificado pelo NLU.\n")
+            texto_inf = "".join(
+                f"== {item.condicao.capitalize()} — Score: {item.score * 100:.0f}%\n"
+                f"{item.justificativa}\n\n"
+                for item in resultados
+            )
+
+        # saída NLU completa (debug)
+        partes_nlu = [f"Resumo NLU: {resumo}\n", "Sintomas extraídos (NLU):\n"]
+        partes_nlu.extend(f" - {k}: {v}\n" for k, v in sorted(sintomas_dict.items()))
+        partes_nlu.append(f"Red-flags detectadas (NLU): {', '.join(red_flags) if red_flags else 'Nenhuma'}\n")
+        contexto = nlu_out.get("contexto", {})
+        if contexto:
+            partes_nlu.append("Citados sem afirmação (NLU): "
+                              + ", ".join(f"{k} ({', '.join(v)})" for k, v in sorted(contexto.items())) + "\n")
+        partes_nlu.append(f"\nFatos passados ao motor: {', '.join(sorted(fatos))}\n")
 
         # risco com cores
-        nivel_risco = out.get("nivel_risco", "-")
+        nivel_risco = out.nivel_risco
         cor_risco = {
             "Alto": "#ff4444",
             "Médio": "#ffaa00",
@@ -141,35 +258,20 @@ class AppTriagem(tk.Tk):
             "Mínimo": "#666666"
         }.get(nivel_risco, "#000000")
 
-        self.lbl_risco.config(text=nivel_risco, fg=cor_risco, font=("Helvetica", 12, "bold"))
-
-        # recomendações
-        for r in out.get("recomendacoes", []):
-            self.txt_recs.insert(tk.END, f"• {r}\n")
-
-        # inferências e justificativas
-        resultados = out.get("resultados", [])
-        if not resultados:
-            self.txt_inf.insert(tk.END, "Nenhuma condição compatível encontrada.\n")
-        else:
-            for item in resultados:
-                self.txt_inf.insert(tk.END, f"== {item['condicao'].capitalize()} — Score: {item['score'] * 100:.0f}%\n")
-                self.txt_inf.insert(tk.END, item['justificativa'] + "\n\n")
+        # atualizar GUI: um delete/insert por widget
+        for widget, conteudo in (
+            (self.txt_rel, texto_relatorio),
+            (self.txt_sinais, texto_sinais),
+            (self.txt_recs, texto_recs),
+            (self.txt_inf, texto_inf),
+            (self.txt_nlu, "".join(partes_nlu)),
+        ):
+            widget.config(state="normal")
+            widget.delete("1.0", tk.END)
+            widget.insert(tk.END, conteudo)
+            widget.config(state="disabled")
 
-        # saída NLU completa (debug)
-        self.txt_nlu.insert(tk.END, f"Resumo NLU: {resumo}\n")
-        self.txt_nlu.insert(tk.END, f"Sintomas extraídos (NLU):\n")
-        for k, v in sorted(sintomas_dict.items()):
-            self.txt_nlu.insert(tk.END, f" - {k}: {v}\n")
-        self.txt_nlu.insert(tk.END, f"Red-flags detectadas (NLU): {', '.join(red_flags) if red_flags else 'Nenhuma'}\n")
-        self.txt_nlu.insert(tk.END, f"\nFatos passados ao motor: {', '.join(sorted(fatos))}\n")
-
-        # bloquear campos
-        self.txt_rel.config(state="disabled")
-        self.txt_sinais.config(state="disabled")
-        self.txt_recs.config(state="disabled")
-        self.txt_inf.config(state="disabled")
-        self.txt_nlu.config(state="disabled")
+        self.lbl_risco.config(text=nivel_risco, fg=cor_risco, font=("Helvetica", 12, "bold"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+# Matriz sintoma x condição compilada a partir da base de conhecimento (NumPy).
+# Usada na inferência em lote: cada bloco de conjuntos de fatos vira uma matriz
+# indicadora e todas as pontuações saem de um único produto matriz-matriz.
+# Sem NumPy, o motor pontua pelo índice invertido da base.
+
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+# bônus de 30% do peso de cada red flag presente
+FATOR_BONUS_RED_FLAG = 0.3
+
+# ({condição: soma dos pesos presentes} só das condições candidatas, bônus das red flags)
+Pontuacao = Tuple[Dict[str, float], float]
+
+
+class MatrizPesos:
+    def __init__(self, condicoes: Dict[str, Dict], red_flags: Dict[str, float]):
+        if np is None:
+            raise ImportError("MatrizPesos requer NumPy")
+
+        # coluna -> condição e linha -> sintoma (as red flags também ganham linha)
+        self.condicoes: List[str] = list(condicoes)
+        self.indice: Dict[str, int] = {}
+        for bloco in condicoes.values():
+            for s in bloco["sintomas"]:
+                self.indice.setdefault(s, len(self.indice))
+        for rf in red_flags:
+            self.indice.setdefault(rf, len(self.indice))
+
+        linhas: List[List[Tuple[int, float]]] = [[] for _ in self.indice]
+        for j, bloco in enumerate(condicoes.values()):
+            for s, peso in bloco["sintomas"].items():
+                linhas[self.indice[s]].append((j, peso))
+
+        bonus = [0.0] * len(self.indice)
+        for rf, peso in red_flags.items():
+            bonus[self.indice[rf]] = float(peso) * FATOR_BONUS_RED_FLAG
+
+        # colunas: [pesos (C) | presença (C) | bônus de red flag (1)]
+        n_c = len(self.condicoes)
+        m = np.zeros((len(self.indice), 2 * n_c + 1))
+        for i, linha in enumerate(linhas):
+            for j, peso in linha:
+                m[i, j] = peso
+                m[i, n_c + j] = 1.0
+            m[i, 2 * n_c] = bonus[i]
+        self._m = m
+
+    @classmethod
+    def de_tabela(cls, condicoes: List[str], linhas: List[str], m) -> "MatrizPesos":
+        """
+        Reaproveita uma matriz já montada (ex.: mapeada do arquivo .kb, sem cópia);
+        linhas: sintoma de cada linha, na ordem da matriz.
+        """
+        matriz = cls.__new__(cls)
+        matriz.condicoes = list(condicoes)
+        matriz.indice = {s: i for i, s in enumerate(linhas)}
+        matriz._m = m
+        return matriz
+
+    def _indices(self, fatos: Set[str]) -> List[int]:
+        indice = self.indice
+        return [indice[f] for f in fatos if f in indice]
+
+    def pontuar(self, fatos: Set[str]) -> Pontuacao:
+        return next(self._pontuar_bloco([fatos]))
+
+    def pontuar_lote(self, lista_de_fatos: Iterable[Set[str]], tamanho_bloco: int = 512) -> Iterator[Pontuacao]:
+        """
+        Pontua vários conjuntos de fatos; cada bloco é um único produto matriz-matriz,
+        e só um bloco fica em memória por vez.
+        """
+        bloco: List[Set[str]] = []
+        for fatos in lista_de_fatos:
+            bloco.append(fatos)
+            if len(bloco) >= tamanho_bloco:
+                yield from self._pontuar_bloco(bloco)
+                bloco = []
+        if bloco:
+            yield from self._pontuar_bloco(bloco)
+
+    def _pontuar_bloco(self, bloco: List[Set[str]]) -> Iterator[Pontuacao]:
+        n_c = len(self.condicoes)
+        x = np.zeros((len(bloco), len(self.indice)))
+        for k, fatos in enumerate(bloco):
+            x[k, self._indices(fatos)] = 1.0
+        produto = x @ self._m
+        for linha in produto:
+            # só as condições com ao menos um sintoma presente entram no resultado
+            colunas = np.flatnonzero(linha[n_c:2 * n_c]).tolist()
+            somas = linha[:n_c].tolist()
+            yield {self.condicoes[j]: somas[j] for j in colunas}, float(linha[2 * n_c])
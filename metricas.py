@@ -0,0 +1,201 @@
+# Instrumentação opcional do pipeline de triagem: tempo de parede por etapa
+# (histogramas), contadores (termos casados, condições avaliadas...) e versão da
+# base em uso. Desativada por padrão: NLU e motor recebem NULO, cujo marcar() por
+# etapa não faz nada.
+#
+# Ativação: variável de ambiente TRIAGEM_METRICAS=1 ou metricas.ativar().
+# Exportação: exportar_prometheus() (formato texto do Prometheus) ou exportar_json().
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+# limites superiores dos buckets dos histogramas, em segundos
+LIMITES_SEGUNDOS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0
+)
+
+
+class Histograma:
+    __slots__ = ("baldes", "soma", "contagem")
+
+    def __init__(self):
+        self.baldes = [0] * (len(LIMITES_SEGUNDOS) + 1)  # último = +Inf
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor: float) -> None:
+        i = 0
+        for limite in LIMITES_SEGUNDOS:
+            if valor <= limite:
+                break
+            i += 1
+        self.baldes[i] += 1
+        self.soma += valor
+        self.contagem += 1
+
+    def para_dict(self) -> Dict:
+        acumulado = 0
+        baldes = {}
+        for limite, n in zip(LIMITES_SEGUNDOS + (float("inf"),), self.baldes):
+            acumulado += n
+            baldes["+Inf" if limite == float("inf") else repr(limite)] = acumulado
+        return {"baldes": baldes, "soma": self.soma, "contagem": self.contagem}
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas: Dict[str, Histograma] = {}
+        self.contadores: Dict[Tuple[str, str], float] = {}  # (nome, versao da base) -> valor
+        self.versao_base: Optional[str] = None
+
+    def observar(self, etapa: str, segundos: float) -> None:
+        with self._lock:
+            hist = self.etapas.get(etapa)
+            if hist is None:
+                hist = self.etapas[etapa] = Histograma()
+            hist.observar(segundos)
+
+    def contar(self, nome: str, valor: float = 1.0, versao_base: str = "") -> None:
+        with self._lock:
+            chave = (nome, versao_base)
+            self.contadores[chave] = self.contadores.get(chave, 0.0) + valor
+            if versao_base:
+                self.versao_base = versao_base
+
+    def zerar(self) -> None:
+        with self._lock:
+            self.etapas.clear()
+            self.contadores.clear()
+            self.versao_base = None
+
+    def exportar_json(self) -> Dict:
+        with self._lock:
+            return {
+                "versao_base": self.versao_base,
+                "etapas": {etapa: h.para_dict() for etapa, h in sorted(self.etapas.items())},
+                "contadores": [
+                    {"nome": nome, "versao_base": versao, "valor": valor}
+                    for (nome, versao), valor in sorted(self.contadores.items())
+                ]
+            }
+
+    def exportar_prometheus(self) -> str:
+        dados = self.exportar_json()
+        linhas = [
+            "# HELP triagem_etapa_segundos Tempo de parede por etapa do pipeline de triagem",
+            "# TYPE triagem_etapa_segundos histogram",
+        ]
+        for etapa, h in dados["etapas"].items():
+            for limite, n in h["baldes"].items():
+                linhas.append(f'triagem_etapa_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {n}')
+            linhas.append(f'triagem_etapa_segundos_sum{{etapa="{etapa}"}} {h["soma"]!r}')
+            linhas.append(f'triagem_etapa_segundos_count{{etapa="{etapa}"}} {h["contagem"]}')
+
+        nomes = sorted({c["nome"] for c in dados["contadores"]})
+        for nome in nomes:
+            linhas.append(f"# TYPE triagem_{nome}_total counter")
+            for c in dados["contadores"]:
+                if c["nome"] == nome:
+                    linhas.append(f'triagem_{nome}_total{{versao_base="{c["versao_base"]}"}} {c["valor"]!r}')
+
+        if dados["versao_base"]:
+            linhas.append("# TYPE triagem_base_info gauge")
+            linhas.append(f'triagem_base_info{{versao="{dados["versao_base"]}"}} 1')
+        return "\n".join(linhas) + "\n"
+
+    def gravar_json(self, caminho: str) -> None:
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.exportar_json(), f, ensure_ascii=False, indent=2)
+
+
+class Etapas:
+    """
+    Cronômetro de uma chamada do NLU ou do motor: marcar(etapa) encerra a etapa
+    corrente (que começa onde a anterior terminou) e contar() soma contadores da
+    chamada. O pipeline é um só: com a instrumentação desligada ele recebe NULO.
+    """
+    __slots__ = ("componente", "inicio", "marcas", "contadores", "estatisticas")
+
+    def __init__(self, componente: str):
+        self.componente = componente
+        self.marcas: List[Tuple[str, float]] = []   # (etapa, instante do fim)
+        self.contadores: Dict[str, float] = {}
+        self.estatisticas: Optional[Dict[str, int]] = {}   # preenchido pelo casador de termos
+        self.inicio = time.perf_counter()
+
+    def marcar(self, etapa: str) -> None:
+        self.marcas.append((etapa, time.perf_counter()))
+
+    def contar(self, nome: str, valor: float = 1) -> None:
+        self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    def trechos(self) -> List[Tuple[str, float, float]]:
+        """(etapa, início, fim) de cada etapa marcada, em perf_counter."""
+        trechos = []
+        anterior = self.inicio
+        for etapa, fim in self.marcas:
+            trechos.append((etapa, anterior, fim))
+            anterior = fim
+        return trechos
+
+    def registrar(self, m: "RegistroMetricas", versao_base: str) -> None:
+        fim = self.marcas[-1][1] if self.marcas else time.perf_counter()
+        for etapa, inicio, fim_etapa in self.trechos():
+            m.observar(f"{self.componente}.{etapa}", fim_etapa - inicio)
+        m.observar(f"{self.componente}.total", fim - self.inicio)
+        for nome, valor in self.contadores.items():
+            m.contar(nome, valor, versao_base)
+
+
+class _EtapasNulas:
+    __slots__ = ()
+    estatisticas = None
+
+    def marcar(self, etapa: str) -> None:
+        pass
+
+    def contar(self, nome: str, valor: float = 1) -> None:
+        pass
+
+
+NULO = _EtapasNulas()
+
+
+def etapas(componente: str, forcar: bool = False) -> Union[Etapas, _EtapasNulas]:
+    """
+    Cronômetro para uma chamada de `componente` ("nlu", "motor"), ou NULO se a
+    instrumentação estiver desligada. forcar: cronometra mesmo assim (modo de perfil).
+    """
+    return Etapas(componente) if _ativo or forcar else NULO
+
+
+REGISTRO = RegistroMetricas()
+_ativo = os.environ.get("TRIAGEM_METRICAS", "") not in ("", "0")
+
+
+def ativar() -> None:
+    global _ativo
+    _ativo = True
+
+
+def desativar() -> None:
+    global _ativo
+    _ativo = False
+
+
+def registro_ativo() -> Optional[RegistroMetricas]:
+    """O registro global se a instrumentação estiver ligada; senão None."""
+    return REGISTRO if _ativo else None
+
+
+def exportar_prometheus() -> str:
+    return REGISTRO.exportar_prometheus()
+
+
+def exportar_json() -> Dict:
+    return REGISTRO.exportar_json()
@@ -1,191 +1,545 @@
 # Motor de Inferência
 
-import json
-from pathlib import Path
-from typing import Set, Dict, List
+import time
+from collections import deque
+from collections.abc import Mapping
+from typing import Set, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import metricas
+import perfilador
+from base_conhecimento import BaseConhecimento, FonteBase, como_fonte
+from cache_resultados import CacheLRU
+from matriz_pesos import FATOR_BONUS_RED_FLAG, Pontuacao
+
+
+class ResultadoCondicao(Mapping):
+    """
+    Uma condição pontuada. Sintomas casados e justificativa só são montados quando
+    acessados (ou serializados por to_dict). Aceita acesso por chave, como o dict de antes.
+    """
+    __slots__ = ("condicao", "descricao", "grau", "score", "_pai", "_sintomas", "_justificativa")
+
+    _CAMPOS = ("condicao", "descricao", "sintomas_que_casaram", "grau", "score",
+               "red_flags", "justificativa")
+
+    def __init__(self, condicao: str, descricao: str, grau: float, score: float,
+                 pai: "ResultadoInferencia"):
+        self.condicao = condicao
+        self.descricao = descricao
+        self.grau = grau
+        self.score = score
+        self._pai = pai
+        self._sintomas = None
+        self._justificativa = None
+
+    def _casados(self) -> List[str]:
+        if self._sintomas is None:
+            sintomas_base = self._pai._base.condicoes[self.condicao]["sintomas"]
+            self._sintomas = sorted(sintomas_base.keys() & self._pai._fatos)
+        return self._sintomas
+
+    @property
+    def sintomas_que_casaram(self) -> List[str]:
+        return list(self._casados())
+
+    @property
+    def red_flags(self) -> List[str]:
+        return list(self._pai._red_flags)
+
+    @property
+    def justificativa(self) -> str:
+        if self._justificativa is None:
+            self._justificativa = self._pai._motor._construir_justificativa(
+                self.condicao, self._casados(), self.grau, self._pai._red_flags
+            )
+        return self._justificativa
 
+    def to_dict(self) -> Dict:
+        return {
+            "condicao": self.condicao,
+            "descricao": self.descricao,
+            "sintomas_que_casaram": list(self._casados()),
+            "grau": self.grau,
+            "score": self.score,
+            "red_flags": list(self._pai._red_flags),
+            "justificativa": self.justificativa
+        }
 
-class BaseConhecimento:
-    def __init__(self, caminho_json: str = "base_conhecimento.json"):
-        p = Path(caminho_json)
-        if p.exists():
-            with p.open("r", encoding="utf-8") as f:
-                dados = json.load(f)
-        else:
-            dados = self._fallback_base()
+    def __getitem__(self, chave):
+        if chave not in self._CAMPOS:
+            raise KeyError(chave)
+        return getattr(self, chave)
+
+    def __iter__(self):
+        return iter(self._CAMPOS)
+
+    def __len__(self):
+        return len(self._CAMPOS)
+
+    def __repr__(self):
+        return f"ResultadoCondicao({self.condicao!r}, score={self.score:.3f})"
+
+    def __getstate__(self):
+        # pickle (ex.: entre processos): leva o texto pronto, sem a base nem o motor
+        return self.to_dict()
+
+    def __setstate__(self, estado):
+        self.condicao = estado["condicao"]
+        self.descricao = estado["descricao"]
+        self.grau = estado["grau"]
+        self.score = estado["score"]
+        self._sintomas = estado["sintomas_que_casaram"]
+        self._justificativa = estado["justificativa"]
+        self._pai = _Desanexado(estado["red_flags"])
+
+
+class _Desanexado:
+    # pai mínimo de um ResultadoCondicao reconstruído fora do motor
+    __slots__ = ("_red_flags",)
+
+    def __init__(self, red_flags):
+        self._red_flags = tuple(red_flags)
+
+
+class ResultadoInferencia(Mapping):
+    """
+    Resultado de MotorInferencia.inferir. Nível e scores são calculados na hora;
+    relatório de queixas, recomendações e justificativas só quando acessados.
+    to_dict() reproduz o dict completo; o acesso por chave continua funcionando.
+    contexto: fatos citados sem afirmação (negados, passados, de terceiros).
+    """
+    __slots__ = ("resultados", "nivel_risco", "risco_global", "contexto", "_motor", "_base",
+                 "_fatos", "_red_flags", "_regras", "_relatorio", "_recomendacoes")
+
+    _CAMPOS = ("resultados", "nivel_risco", "relatorio_queixas", "recomendacoes", "risco_global",
+               "contexto")
+
+    def __init__(self, motor: Optional["MotorInferencia"], base: Optional[BaseConhecimento],
+                 fatos: Set[str], red_flags: Tuple[str, ...] = ()):
+        self.resultados: List[ResultadoCondicao] = []
+        self.nivel_risco = "Mínimo"
+        self.risco_global = 0.0
+        self.contexto: Dict[str, List[str]] = {}
+        self._motor = motor
+        self._base = base
+        self._fatos = fatos
+        self._red_flags = red_flags
+        self._regras: Tuple[int, ...] = ()   # regras de risco disparadas (índices na tabela da base)
+        self._relatorio = None
+        self._recomendacoes = None
+
+    @classmethod
+    def vazio(cls) -> "ResultadoInferencia":
+        r = cls(None, None, set())
+        r._relatorio = "Nenhum sintoma específico detectado."
+        r._recomendacoes = ["Monitorar possíveis sintomas e buscar avaliação se necessário."]
+        return r
+
+    @property
+    def relatorio_queixas(self) -> str:
+        if self._relatorio is None:
+            self._relatorio = self._motor._gerar_relatorio_queixas(self._base, self._fatos, self.contexto)
+        return self._relatorio
+
+    @property
+    def recomendacoes(self) -> List[str]:
+        if self._recomendacoes is None:
+            self._recomendacoes = self._motor._gerar_recomendacoes(self._base, self._regras)
+        return list(self._recomendacoes)
+
+    @property
+    def regras_disparadas(self) -> List[str]:
+        """Nomes das regras de risco da base que dispararam (vazio depois de cruzar processos)."""
+        if self._base is None:
+            return []
+        nomes = self._base.tabela_regras.nomes
+        return [nomes[i] for i in self._regras]
+
+    def to_dict(self) -> Dict:
+        return {
+            "resultados": [r.to_dict() for r in self.resultados],
+            "nivel_risco": self.nivel_risco,
+            "relatorio_queixas": self.relatorio_queixas,
+            "recomendacoes": self.recomendacoes,
+            "risco_global": self.risco_global,
+            "contexto": self.contexto
+        }
 
-        # carregar elementos
-        self.config = dados.get("config", {})
+    def __getitem__(self, chave):
+        if chave not in self._CAMPOS:
+            raise KeyError(chave)
+        return getattr(self, chave)
 
-        # red_flags: é um dicionário no JSON
-        rf_dict = dados.get("red_flags", {})
-        self.red_flags = rf_dict
+    def __iter__(self):
+        return iter(self._CAMPOS)
 
-        # mappings
-        self.mappings = {k.lower(): v.lower() for k, v in dados.get("mappings", {}).items()}
+    def __len__(self):
+        return len(self._CAMPOS)
 
-        # condicoes: nome -> {descricao, sintomas: {sintoma: peso}}
-        conds = {}
-        for nome, bloco in dados.get("condicoes", {}).items():
-            sintomas = {s.lower(): float(p) for s, p in bloco.get("sintomas", {}).items()}
-            conds[nome.lower()] = {
-                "descricao": bloco.get("descricao", ""),
-                "sintomas": sintomas
-            }
-        self.condicoes = conds
+    def __repr__(self):
+        return f"ResultadoInferencia(nivel_risco={self.nivel_risco!r}, condicoes={len(self.resultados)})"
 
-    def _fallback_base(self):
+    def __getstate__(self):
+        # renderiza o que falta e não leva motor nem base para o outro processo
         return {
-            "config": {
-                "thresholds": {
-                    "alto_risco": 0.75,
-                    "medio_risco": 0.40,
-                    "baixo_risco": 0.10
-                }
-            },
-            "red_flags": {
-                "ideacao_suicida": 1.0,
-                "automutilacao": 1.0
-            },
-            "mappings": {
-                "triste": "tristeza_persistente",
-                "nao durmo": "insônia"
-            },
-            "condicoes": {
-                "depressao": {
-                    "descricao": "Humor deprimido, perda de prazer e energia",
-                    "sintomas": {
-                        "tristeza_persistente": 1.0,
-                        "fadiga": 0.9,
-                        "insônia": 0.8
-                    }
-                }
-            }
+            "resultados": self.resultados,
+            "nivel_risco": self.nivel_risco,
+            "risco_global": self.risco_global,
+            "relatorio_queixas": self.relatorio_queixas,
+            "recomendacoes": self.recomendacoes,
+            "contexto": self.contexto
         }
 
-    def listar_condicoes(self) -> List[str]:
-        return list(self.condicoes.keys())
+    def __setstate__(self, estado):
+        self.resultados = estado["resultados"]
+        self.nivel_risco = estado["nivel_risco"]
+        self.risco_global = estado["risco_global"]
+        self.contexto = estado.get("contexto", {})
+        self._relatorio = estado["relatorio_queixas"]
+        self._recomendacoes = estado["recomendacoes"]
+        self._motor = self._base = None
+        self._fatos = set()
+        self._red_flags = ()
+        self._regras = ()
+
+
+class PontuacaoSessao:
+    """
+    Pontuação acumulada de uma sessão de triagem (ver MotorInferencia.inferir_sessao):
+    fatos que pontuam, soma dos pesos por condição e bônus das red flags. A cada
+    turno só as condições ligadas aos fatos que entraram ou saíram são atualizadas.
+    """
+    __slots__ = ("versao", "fatos", "somas", "presentes", "bonus")
+
+    def __init__(self):
+        self.reiniciar(None)
+
+    def reiniciar(self, versao: Optional[str]) -> None:
+        self.versao = versao
+        self.fatos: Set[str] = set()
+        self.somas: Dict[str, float] = {}
+        self.presentes: Dict[str, int] = {}   # condição -> fatos presentes que pesam nela
+        self.bonus = 0.0
+
+    def aplicar(self, base: BaseConhecimento, fatos: Iterable[str], sinal: int) -> int:
+        """Soma (sinal 1) ou subtrai (-1) os pesos dos fatos; devolve as condições tocadas."""
+        somas, presentes = self.somas, self.presentes
+        indice = base.indice_sintomas
+        red_flags = base.red_flags
+        tocadas = 0
+        for fato in fatos:
+            for nome, peso in indice.get(fato, ()):
+                tocadas += 1
+                n = presentes.get(nome, 0) + sinal
+                if n:
+                    presentes[nome] = n
+                    somas[nome] = somas.get(nome, 0.0) + sinal * peso
+                else:
+                    del presentes[nome], somas[nome]
+            if fato in red_flags:
+                self.bonus += sinal * red_flags[fato] * FATOR_BONUS_RED_FLAG
+        return tocadas
+
+
+def para_json(objeto):
+    """Use como default= de json.dumps para serializar resultados do motor."""
+    if isinstance(objeto, (ResultadoInferencia, ResultadoCondicao)):
+        return objeto.to_dict()
+    raise TypeError(f"{type(objeto).__name__} não é serializável em JSON")
 
 
 class MotorInferencia:
-    def __init__(self, caminho_base: str = "base_conhecimento.json"):
-        self.base = BaseConhecimento(caminho_base)
-        cfg = self.base.config.get("thresholds", {})
-        self.threshold_alto = cfg.get("alto_risco", 0.75)
-        self.threshold_medio = cfg.get("medio_risco", 0.40)
-        self.threshold_baixo = cfg.get("baixo_risco", 0.10)
-
-    def inferir(self, fatos: Set[str]) -> Dict:
+    def __init__(self, caminho_base: str = "base_conhecimento.json",
+                 base: Optional[Union[BaseConhecimento, FonteBase]] = None,
+                 cache: Optional[CacheLRU] = None):
         """
-        Inferência principal com sistema de risco funcional.
+        Usa a base compilada (ou a FonteBase, para recarga a quente) recebida e
+        compartilhada com o NLU, ou carrega a do arquivo; se o arquivo não existir,
+        usa a base padrão mínima. cache: resultados por (fatos, contexto, versão da base).
         """
-        resultados = []
-        risco_global = 0.0
+        self.fonte = como_fonte(base, caminho_base, BaseConhecimento.padrao)
+        self.cache = cache
 
-        if not isinstance(fatos, (set, list, tuple)):
-            fatos = set()
+    @property
+    def base(self) -> BaseConhecimento:
+        # versão em uso agora; cada inferência captura uma vez e usa até o fim
+        return self.fonte.atual
 
-        fatos_set = set([f.lower() for f in fatos])
+    @property
+    def threshold_alto(self) -> float:
+        return self.base.thresholds["alto_risco"]
 
-        # Se não há fatos, retorna vazio
-        if not fatos_set:
-            return {
-                "resultados": [],
-                "nivel_risco": "Mínimo",
-                "relatorio_queixas": "Nenhum sintoma específico detectado.",
-                "recomendacoes": ["Monitorar possíveis sintomas e buscar avaliação se necessário."],
-                "risco_global": 0.0
-            }
-
-        for nome, bloco in self.base.condicoes.items():
-            sintomas_base = bloco["sintomas"]
-            sintomas_presentes = sintomas_base.keys() & fatos_set
-
-            if not sintomas_presentes:
-                continue
+    @property
+    def threshold_medio(self) -> float:
+        return self.base.thresholds["medio_risco"]
 
-            # Cálculo do score baseado na correspondência de sintomas
-            soma_pesos_presentes = sum(sintomas_base[s] for s in sintomas_presentes)
-            soma_pesos_totais = sum(sintomas_base.values())
-            grau = soma_pesos_presentes / soma_pesos_totais if soma_pesos_totais > 0 else 0.0
+    @property
+    def threshold_baixo(self) -> float:
+        return self.base.thresholds["baixo_risco"]
 
-            # Adicionar peso das red flags encontradas
-            bonus_red_flags = 0.0
-            red_encontradas = []
+    def inferir(self, fatos: Set[str], contexto: Optional[Dict[str, List[str]]] = None,
+                base: Optional[BaseConhecimento] = None) -> ResultadoInferencia:
+        """
+        Inferência principal com sistema de risco funcional.
 
-            for rf, peso_rf in self.base.red_flags.items():
-                if rf in fatos_set:
-                    red_encontradas.append(rf)
-                    bonus_red_flags += peso_rf * 0.3  # bonus de 30% do peso da red flag
+        contexto: fatos citados sem afirmação -> flags ("negado", "passado",
+        "terceiros"), como no "contexto" do NLU. Negados e de terceiros não pontuam;
+        os só do passado pontuam como histórico, mas não contam nas regras de risco
+        da base (ex.: red flag crítica -> "Alto"). base: versão da base a usar (padrão:
+        a atual da fonte).
+        """
+        base = base or self.base
+        cache = self.cache
+        if cache is None:
+            return self._inferir(base, fatos, contexto)
+        cache.validar_versao(base.versao)
+        chave = (frozenset(self._normalizar_fatos(fatos)), self._chave_contexto(contexto), base.versao)
+        resultado = cache.obter(chave)
+        if resultado is None:
+            resultado = self._inferir(base, fatos, contexto)
+            cache.guardar(chave, resultado)
+        return resultado
+
+    def _inferir(self, base: BaseConhecimento, fatos: Set[str],
+                 contexto: Optional[Dict[str, List[str]]] = None) -> ResultadoInferencia:
+        p = perfilador.perfil_ativo()
+        etapas = metricas.etapas("motor", p is not None)
+        fatos_set = self._normalizar_fatos(fatos)
+        historico = self._historico(contexto, fatos_set)
+        todos = fatos_set | historico if historico else fatos_set
+        if not todos and not base.tabela_regras.cita(_citados(contexto)):
+            resultado = self._resultado_vazio(contexto)
+        else:
+            pontuacao = self._pontuar(base, todos)
+            etapas.marcar("pontuacao")
+            resultado = self._montar_resultado(base, todos, pontuacao, fatos_set, contexto, etapas)
+        if etapas is not metricas.NULO:
+            self._registrar_etapas(etapas, base, todos, contexto, resultado, p)
+        return resultado
+
+    @staticmethod
+    def _registrar_etapas(etapas: "metricas.Etapas", base: BaseConhecimento, todos: Set[str],
+                          contexto: Optional[Dict[str, List[str]]], resultado: ResultadoInferencia,
+                          p: Optional["perfilador.Perfil"]) -> None:
+        m = metricas.registro_ativo()
+        if m is not None:
+            etapas.contar("inferencias")
+            if contexto:
+                etapas.contar("fatos_em_contexto", len(contexto))
+            if todos:
+                etapas.contar("fatos", len(todos))
+                etapas.contar("condicoes_avaliadas", len(resultado.resultados))
+            etapas.registrar(m, base.versao)
+        if p is None:
+            return
+
+        # modo de perfil: a pontuação é dividida, depois da chamada, entre as condições
+        # em proporção aos pares (fato, condição) do índice, e as red flags pelos fatos
+        # que são red flags; a montagem em partes iguais entre as condições pontuadas.
+        # Só as etapas são medidas: as parcelas ficam sob o quadro perfilador.ESTIMADO
+        trechos = etapas.trechos()
+        if not trechos:
+            p.trechos((("motor", etapas.inicio, time.perf_counter(), {"fatos": 0}),))
+            return
+        (_, t0, t1), (_, _, t2), (_, _, t3) = trechos
+        pares: Dict[str, int] = {}
+        indice = base.indice_sintomas
+        for fato in todos:
+            for nome, _ in indice.get(fato, ()):
+                pares[nome] = pares.get(nome, 0) + 1
+        red_flags = len(base.red_flags.keys() & todos) + 1   # + a interseção em si
+        parcela = (t1 - t0) / (sum(pares.values()) + red_flags)
+        estimado = perfilador.ESTIMADO
+        pilhas: Dict[tuple, float] = {("motor", "pontuacao", estimado, "red_flags"): red_flags * parcela}
+        for nome, n in pares.items():
+            pilhas[("motor", "pontuacao", estimado, "condicoes", nome)] = n * parcela
+        if pares:
+            parcela = (t2 - t1) / len(pares)
+            for nome in pares:
+                pilhas[("motor", "montagem", estimado, "condicoes", nome)] = parcela
+        else:
+            pilhas[("motor", "montagem")] = t2 - t1
+        pilhas[("motor", "regras")] = t3 - t2
+        p.acumular(pilhas)
+
+        principais = [r.condicao for r in resultado.resultados[:3]]
+        p.trechos((
+            ("motor", t0, t3, {"fatos": len(todos), "condicoes": len(pares), "nivel_risco": resultado.nivel_risco}),
+            ("motor.pontuacao", t0, t1, {"principais": principais}),
+            ("motor.montagem", t1, t2, None),
+            ("motor.regras", t2, t3, {"regras": [base.tabela_regras.nomes[i] for i in resultado._regras]}),
+        ))
+
+    def inferir_sessao(self, estado: PontuacaoSessao, fatos: Set[str],
+                       contexto: Optional[Dict[str, List[str]]] = None) -> ResultadoInferencia:
+        """
+        Inferência de um turno de sessão: fatos e contexto são os acumulados até aqui
+        e estado guarda a pontuação do turno anterior. Só as condições que dependem
+        dos fatos novos (ou que deixaram de valer) são repontuadas, pelo índice
+        invertido; com uma versão nova da base a sessão é repontuada do zero. Os
+        scores são os de inferir a menos de arredondamento (a ordem das somas muda).
+        Não usa o cache de resultados.
+        """
+        base = self.base
+        fatos_set = self._normalizar_fatos(fatos)
+        historico = self._historico(contexto, fatos_set)
+        todos = fatos_set | historico if historico else fatos_set
+        if estado.versao != base.versao:
+            estado.reiniciar(base.versao)
+        tocadas = estado.aplicar(base, todos - estado.fatos, 1)
+        tocadas += estado.aplicar(base, estado.fatos - todos, -1)
+        estado.fatos = todos
+        m = metricas.registro_ativo()
+        if m is not None:
+            m.contar("inferencias_sessao", 1, base.versao)
+            m.contar("condicoes_repontuadas", tocadas, base.versao)
+        if not todos and not base.tabela_regras.cita(_citados(contexto)):
+            return self._resultado_vazio(contexto)
+        return self._montar_resultado(base, todos, (estado.somas, estado.bonus), fatos_set, contexto)
+
+    def inferir_lote(self, lista_de_fatos: Iterable[Set[str]]) -> Iterator[ResultadoInferencia]:
+        """
+        Inferência em lote: gerador com um resultado por conjunto de fatos, na mesma
+        estrutura de inferir. Com NumPy, cada bloco de conjuntos é pontuado num único
+        produto matriz-matriz; sem NumPy, pelo índice invertido. O lote inteiro usa
+        a versão da base vigente no seu início. Os conjuntos são tratados como fatos
+        afirmados (sem contexto).
+        """
+        base = self.base
+        lista = (self._normalizar_fatos(fatos) for fatos in lista_de_fatos)
+        if base.matriz is not None:
+            # conjuntos vazios passam pela matriz (vetor nulo) e caem no resultado vazio
+            pares = _emparelhar(lista, base.matriz.pontuar_lote)
+        else:
+            pares = ((fatos_set, self._pontuar(base, fatos_set)) for fatos_set in lista)
+        m = metricas.registro_ativo()
+        cache = self.cache
+        if cache is not None:
+            cache.validar_versao(base.versao)
+        for fatos_set, pontuacao in pares:
+            if m is not None:
+                # no lote a pontuação é feita por blocos: só contadores por item
+                m.contar("inferencias", 1, base.versao)
+                m.contar("fatos", len(fatos_set), base.versao)
+                m.contar("condicoes_avaliadas", len(pontuacao[0]), base.versao)
+            if not fatos_set:
+                yield self._resultado_vazio()
+                continue
+            if cache is None:
+                yield self._montar_resultado(base, fatos_set, pontuacao)
+                continue
+            # a pontuação do bloco já saiu da matriz; o cache poupa a montagem
+            chave = (frozenset(fatos_set), None, base.versao)
+            resultado = cache.obter(chave)
+            if resultado is None:
+                resultado = self._montar_resultado(base, fatos_set, pontuacao)
+                cache.guardar(chave, resultado)
+            yield resultado
+
+    @staticmethod
+    def _pontuar(base: BaseConhecimento, fatos_set: Set[str]) -> Pontuacao:
+        """
+        Percorre o índice invertido: só visita as condições que compartilham ao
+        menos um fato, com custo proporcional às correspondências.
+        """
+        somas = {}
+        indice = base.indice_sintomas
+        for fato in fatos_set:
+            for nome, peso in indice.get(fato, ()):
+                somas[nome] = somas.get(nome, 0.0) + peso
+
+        red_flags = base.red_flags
+        bonus = sum(red_flags[rf] * FATOR_BONUS_RED_FLAG for rf in red_flags.keys() & fatos_set)
+        return somas, bonus
+
+    @staticmethod
+    def _normalizar_fatos(fatos) -> Set[str]:
+        if not isinstance(fatos, (set, frozenset, list, tuple)):
+            return set()
+        return set([f.lower() for f in fatos])
+
+    @staticmethod
+    def _historico(contexto: Optional[Dict[str, List[str]]], fatos_set: Set[str]) -> Set[str]:
+        # fatos só do passado (sem negação nem terceiros) que não foram afirmados
+        if not contexto:
+            return set()
+        return {f.lower() for f, rotulos in contexto.items()
+                if rotulos and all(r == "passado" for r in rotulos)} - fatos_set
+
+    @staticmethod
+    def _chave_contexto(contexto: Optional[Dict[str, List[str]]]):
+        if not contexto:
+            return None
+        return frozenset((f, tuple(r)) for f, r in contexto.items())
+
+    @staticmethod
+    def _resultado_vazio(contexto: Optional[Dict[str, List[str]]] = None) -> ResultadoInferencia:
+        resultado = ResultadoInferencia.vazio()
+        if contexto:
+            resultado.contexto = dict(contexto)
+            resultado._relatorio += " " + _mencionados(contexto)
+        return resultado
+
+    def _montar_resultado(self, base: BaseConhecimento, fatos_set: Set[str], pontuacao: Pontuacao,
+                          afirmados: Optional[Set[str]] = None,
+                          contexto: Optional[Dict[str, List[str]]] = None,
+                          etapas=metricas.NULO) -> ResultadoInferencia:
+        """
+        afirmados: fatos vistos pelas regras de risco (padrão: todos). etapas:
+        cronômetro da chamada, marcado ao fim da montagem e das regras.
+        """
+        somas, bonus_red_flags = pontuacao
+        red_encontradas = tuple(sorted(base.red_flags.keys() & fatos_set))
+        resultado = ResultadoInferencia(self, base, fatos_set, red_encontradas)
+        if contexto:
+            resultado.contexto = dict(contexto)
+        resultados = resultado.resultados
+        risco_global = 0.0
 
+        condicoes = base.condicoes
+        soma_pesos = base.soma_pesos
+        for nome, soma_pesos_presentes in somas.items():
+            # Cálculo do score baseado na correspondência de sintomas
+            soma_pesos_totais = soma_pesos[nome]
+            grau = soma_pesos_presentes / soma_pesos_totais if soma_pesos_totais > 0 else 0.0
             score = min(grau + bonus_red_flags, 1.0)  # não ultrapassar 1.0
 
-            justificativa = self._construir_justificativa(
-                nome, sintomas_presentes, sintomas_base, grau, red_encontradas
-            )
-
-            resultados.append({
-                "condicao": nome,
-                "descricao": bloco.get("descricao", ""),
-                "sintomas_que_casaram": sorted(list(sintomas_presentes)),
-                "grau": grau,
-                "score": score,
-                "red_flags": sorted(red_encontradas),
-                "justificativa": justificativa
-            })
+            resultados.append(ResultadoCondicao(
+                nome, condicoes[nome].get("descricao", ""), grau, score, resultado
+            ))
 
             # Atualizar risco global (maior score entre todas as condições)
             risco_global = max(risco_global, score)
 
-        # Ordenar por score
-        resultados.sort(key=lambda x: x["score"], reverse=True)
-
-        # Determinar nível de risco
-        nivel_risco = self._calcular_nivel_risco(risco_global, resultados, fatos_set)
-
-        relatorio = self._gerar_relatorio_queixas(fatos_set)
-        recomendacoes = self._gerar_recomendacoes(nivel_risco, resultados, fatos_set)
-
-        return {
-            "resultados": resultados,
-            "nivel_risco": nivel_risco,
-            "relatorio_queixas": relatorio,
-            "recomendacoes": recomendacoes,
-            "risco_global": risco_global
-        }
-
-    def _calcular_nivel_risco(self, risco_global: float, resultados: List[Dict], fatos_set: set) -> str:
-        """Calcula o nível de risco considerando red flags e scores"""
-
-        # Verificar se há red flags críticas diretamente nos fatos
-        red_flags_criticas = {"ideacao_suicida", "automutilacao", "planos_suicidas"}
-        tem_red_flag_critica = any(rf in fatos_set for rf in red_flags_criticas)
-
-        # Verificar termos de emergência diretos
-        termos_emergencia = {
-            "vou me matar", "me enforcar", "overdose", "pular do", "atirar em mim",
-            "carta de despedida", "tudo planejado", "amanhã", "agora"
-        }
-
-        # Verificar nos resultados também
-        for res in resultados:
-            if any(rf in red_flags_criticas for rf in res["red_flags"]):
-                tem_red_flag_critica = True
-                break
-
-        if tem_red_flag_critica:
-            return "Alto"
-        elif risco_global >= self.threshold_alto:
+        # Ordenar por score (empates seguem a ordem das condições na base)
+        ordem = base.ordem
+        resultados.sort(key=lambda x: (-x.score, ordem[x.condicao]))
+        etapas.marcar("montagem")
+
+        resultado.risco_global = risco_global
+        # regras de risco da base: uma passada pela tabela compilada por inferência;
+        # fatos só negados ou passados entram à parte (cláusula algum_citado)
+        resultado.nivel_risco, resultado._regras = base.tabela_regras.avaliar(
+            fatos_set if afirmados is None else afirmados,
+            self._calcular_nivel_risco(base, risco_global), risco_global, resultados, _citados(contexto)
+        )
+        etapas.marcar("regras")
+        return resultado
+
+    def _calcular_nivel_risco(self, base: BaseConhecimento, risco_global: float) -> str:
+        """Nível de risco pelos thresholds; as regras da base só podem elevá-lo."""
+        thresholds = base.thresholds
+        if risco_global >= thresholds["alto_risco"]:
             return "Alto"
-        elif risco_global >= self.threshold_medio:
+        elif risco_global >= thresholds["medio_risco"]:
             return "Médio"
-        elif risco_global >= self.threshold_baixo:
+        elif risco_global >= thresholds["baixo_risco"]:
             return "Baixo"
         else:
             return "Mínimo"
 
-    def _construir_justificativa(self, condicao_nome: str, sintomas_presentes: set,
-                                 sintomas_base: dict, grau: float, red_encontradas: set) -> str:
+    def _construir_justificativa(self, condicao_nome: str, sintomas_presentes: List[str],
+                                 grau: float, red_encontradas: Iterable[str]) -> str:
         partes = []
         partes.append(f"Condição considerada: {condicao_nome.capitalize()}.")
 
@@ -200,13 +554,19 @@ class MotorInferencia:
 
         return " ".join(partes)
 
-    def _gerar_relatorio_queixas(self, fatos_set: set) -> str:
+    def _gerar_relatorio_queixas(self, base: BaseConhecimento, fatos_set: set,
+                                 contexto: Optional[Dict[str, List[str]]] = None) -> str:
+        if contexto:
+            # os do histórico aparecem só na lista de mencionados, com o rótulo
+            fatos_set = fatos_set - contexto.keys()
+            relatorio = self._gerar_relatorio_queixas(base, fatos_set) if fatos_set else ""
+            return (relatorio + " " if relatorio else "") + _mencionados(contexto)
         if not fatos_set:
             return "Nenhuma queixa específica detectada."
 
         # Separar sintomas normais de red flags
-        sintomas_normais = [f for f in fatos_set if f not in self.base.red_flags]
-        red_flags = [f for f in fatos_set if f in self.base.red_flags]
+        sintomas_normais = [f for f in fatos_set if f not in base.red_flags]
+        red_flags = [f for f in fatos_set if f in base.red_flags]
 
         relatorio = ""
         if sintomas_normais:
@@ -222,45 +582,34 @@ class MotorInferencia:
 
         return relatorio
 
-    def _gerar_recomendacoes(self, nivel_risco: str, resultados: List[Dict], fatos_set: set) -> List[str]:
-        recs = []
-
-        if nivel_risco == "Alto":
-            recs.append("🚨 AVALIAÇÃO IMEDIATA - Busque atendimento de emergência")
-            recs.append("📞 Contate CVV (188) ou serviço de saúde mental urgentemente")
-            recs.append("👥 Não deixe a pessoa sozinha até receber atendimento")
-            recs.append("🏥 Procure um hospital ou serviço de emergência psiquiátrica")
-        elif nivel_risco == "Médio":
-            recs.append("📞 Agendar consulta com psiquiatra/psicólogo esta semana")
-            recs.append("📊 Monitorar sintomas diariamente")
-            recs.append("👥 Buscar apoio familiar ou de amigos")
-            recs.append("💊 Avaliar necessidade de intervenção farmacológica")
-        elif nivel_risco == "Baixo":
-            recs.append("👥 Agendar avaliação com profissional de saúde")
-            recs.append("💪 Praticar autocuidado e monitorar evolução")
-            recs.append("📝 Manter diário de sintomas")
-            recs.append("🧘 Considerar psicoterapia como prevenção")
-        else:
-            recs.append("💡 Manter hábitos saudáveis e observar possíveis mudanças")
-            recs.append("🏃 Praticar atividade física regular")
-            recs.append("🍎 Manter alimentação balanceada")
-            recs.append("😴 Cuidar da qualidade do sono")
-
-        # Recomendações específicas por condição
-        if resultados:
-            top_condicao = resultados[0]["condicao"]
-            if top_condicao == "depressao":
-                recs.append("Específico para depressão: Atividade física regular e psicoterapia")
-            elif top_condicao in ["ansiedade", "transtorno_panico", "crise_ansiedade"]:
-                recs.append("Específico para ansiedade: Técnicas de respiração e mindfulness")
-            elif top_condicao == "crise_suicida":
-                recs.append("INTERVENÇÃO IMEDIATA: Risco suicida ativo detectado")
-
-        # Se há red flags mas nenhuma condição foi detectada
-        red_flags_presentes = [rf for rf in self.base.red_flags if rf in fatos_set]
-        if red_flags_presentes and not resultados:
-            recs.append("⚠️ Sintomas de alerta detectados - Busque avaliação profissional")
-
-        recs.append("Lembre-se: Este é um sistema de triagem, não substitui diagnóstico profissional")
-
-        return recs
+    def _gerar_recomendacoes(self, base: BaseConhecimento, regras: Tuple[int, ...]) -> List[str]:
+        # conduta por nível, específicas por condição e aviso final vêm das regras da base
+        return base.tabela_regras.recomendacoes(regras)
+
+
+def _citados(contexto: Optional[Dict[str, List[str]]]) -> List[str]:
+    # fatos só negados ou no passado (os de terceiros não contam nas regras)
+    if not contexto:
+        return []
+    return [f for f, nomes in contexto.items() if "negado" in nomes or "passado" in nomes]
+
+
+def _mencionados(contexto: Dict[str, List[str]]) -> str:
+    lista = ", ".join(f"{f.replace('_', ' ')} ({', '.join(r)})" for f, r in sorted(contexto.items()))
+    return f"Mencionados sem afirmação: {lista}."
+
+
+def _emparelhar(itens: Iterator, funcao) -> Iterator:
+    """
+    Aplica uma função de lote (gerador que consome um iterável e produz um resultado
+    por item, na mesma ordem) devolvendo pares (item, resultado) sem materializar a entrada.
+    """
+    pendentes = deque()
+
+    def _registrar():
+        for item in itens:
+            pendentes.append(item)
+            yield item
+
+    for resultado in funcao(_registrar()):
+        yield pendentes.popleft(), resultado
@@ -1,98 +1,184 @@
 # NLU básico para pt-BR: normalização, mapeamentos, extração de sintomas e red-flags,
 # resumo de queixas e saída estruturada para o MotorInferencia.
 
-import json
+import bisect
+import heapq
+import itertools
 import re
 from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import metricas
+import perfilador
+from base_conhecimento import BaseConhecimento, FonteBase, como_fonte
+from cache_resultados import CacheLRU
+from casador_termos import descrever_contexto, separar_contexto
+
+# regexes compiladas uma vez por processo
+_RE_PONTUACAO = re.compile(r"[^\w\sáéíóúâêôãõç-]")
+_RE_ESPACOS = re.compile(r"\s+")
+_RE_FRASES = re.compile(r"[.!?]\s*")
+# como _RE_PONTUACAO, mas preserva fins de frase e de oração (usada por _segmentar)
+_RE_PONTUACAO_FRASES = re.compile(r"[^\w\sáéíóúâêôãõç.!?,;:-]")
+_RE_ORACOES = re.compile(r"[,;:]")
+
+
+class CacheFrases:
+    """
+    Memória por frase para análise incremental (ex.: análise ao digitar): entre duas
+    chamadas, só as frases novas ou alteradas são normalizadas e casadas de novo.
+    Guarda apenas as frases do último texto e é descartada se a base mudar.
+    """
+
+    def __init__(self):
+        self.versao: Optional[str] = None
+        # frase -> (normalizada, termos casados, afirmados, só em contexto -> flags)
+        self.frases: Dict[str, Tuple[str, List[str], List[str], Dict[str, int]]] = {}
 
 
 class NLUProcessor:
-    def __init__(self, caminho_base: str = "base_conhecimento.json"):
+    def __init__(self, caminho_base: str = "base_conhecimento.json",
+                 base: Optional[Union[BaseConhecimento, FonteBase]] = None,
+                 limite_resumo: int = 2, cache: Optional[CacheLRU] = None):
         """
-        Carrega mappings e red_flags da base se existir.
+        Usa mappings, red_flags e a trie de termos da base compilada (ou da FonteBase,
+        para recarga a quente) recebida e compartilhada com o motor, ou carregada do
+        arquivo, se existir. limite_resumo: máximo de frases no resumo. cache: saídas
+        de processar_texto por texto normalizado (opcional).
         """
-        self.mappings = {}  # termo (lower) -> sintoma_normalizado
-        self.red_flags_lex = {}  # termo -> red_flag_normalizado
-        self.red_flags_set = set()  # conjunto de red flags para busca rápida
-        try:
-            with open(caminho_base, "r", encoding="utf-8") as f:
-                dados = json.load(f)
-
-            # carregar mappings
-            raw_maps = dados.get("mappings", {})
-            self.mappings = {k.lower(): v.lower() for k, v in raw_maps.items()}
-
-            # carregar red_flags
-            rf_dict = dados.get("red_flags", {})
-            self.red_flags_set = set(rf_dict.keys())
-
-            # criar mapeamento para busca de red flags
-            for termo in self.red_flags_set:
-                self.red_flags_lex[termo] = termo
-
-        except FileNotFoundError:
+        def _base_vazia():
             print(f"Aviso: Arquivo {caminho_base} não encontrado. Usando base vazia.")
-            self.mappings = {}
-            self.red_flags_lex = {}
-            self.red_flags_set = set()
+            return BaseConhecimento.vazia()
+
+        self.fonte = como_fonte(base, caminho_base, _base_vazia)
+        self.limite_resumo = limite_resumo
+        self.cache = cache
+
+    @property
+    def base(self) -> BaseConhecimento:
+        # versão em uso agora; cada texto é processado inteiro com uma única versão
+        return self.fonte.atual
+
+    @property
+    def mappings(self):
+        # termo (lower) -> sintoma_normalizado
+        return self.base.mappings
+
+    @property
+    def red_flags_lex(self):
+        # termo -> red_flag_normalizado
+        return self.base.red_flags_lex
+
+    @property
+    def red_flags_set(self):
+        return self.base.red_flags.keys()
+
+    @property
+    def casador(self):
+        # trie única com todos os termos: uma passada por texto, independente do vocabulário
+        return self.base.casador
 
     def normalizar_texto(self, texto: str) -> str:
         t = texto.lower()
         # mantém acentos; remove pontuação que não seja útil
-        t = re.sub(r"[^\w\sáéíóúâêôãõç-]", " ", t)
-        t = re.sub(r"\s+", " ", t).strip()
+        t = _RE_PONTUACAO.sub(" ", t)
+        t = _RE_ESPACOS.sub(" ", t).strip()
         return t
 
     def extrair_sintomas(self, texto_normalizado: str) -> dict:
         """
-        Retorna dicionário sintoma -> contagem/peso bruto.
+        Retorna dicionário sintoma -> contagem/peso bruto. Termos negados, no passado
+        ou atribuídos a outra pessoa ("não estou triste") não contam.
         """
-        encontrados = defaultdict(float)
+        base = self.base
+        afirmados, _ = base.casador.termos_em_contexto(texto_normalizado)
+        return self._sintomas_de(base, afirmados)
 
-        # verifica mapeamentos (termos curtos e compostos)
-        for termo, sint in self.mappings.items():
-            # busca por palavra inteira para evitar falsos positivos
-            padrao = r'\b' + re.escape(termo) + r'\b'
-            if re.search(padrao, texto_normalizado):
-                encontrados[sint] += 1.0
+    def extrair_red_flags(self, texto_normalizado: str) -> list:
+        base = self.base
+        afirmados, _ = base.casador.termos_em_contexto(texto_normalizado)
+        return self._red_flags_de(base, afirmados)
 
+    @staticmethod
+    def _sintomas_de(base: BaseConhecimento, termos: Iterable[str]) -> dict:
+        # cada termo distinto encontrado conta 1.0 para o seu sintoma
+        encontrados = defaultdict(float)
+        mappings = base.mappings
+        for termo in termos:
+            sint = mappings.get(termo)
+            if sint is not None:
+                encontrados[sint] += 1.0
         return dict(encontrados)
 
-    def extrair_red_flags(self, texto_normalizado: str) -> list:
-        encontrados = []
-        for termo, flag in self.red_flags_lex.items():
-            # busca por palavra inteira
-            padrao = r'\b' + re.escape(termo) + r'\b'
-            if re.search(padrao, texto_normalizado):
-                encontrados.append(flag)
+    @staticmethod
+    def _red_flags_de(base: BaseConhecimento, termos: Iterable[str]) -> list:
+        lex = base.red_flags_lex
+        encontrados = [lex[t] for t in termos if t in lex]
         return list(set(encontrados))
 
-    def gerar_resumo(self, texto_original: str, sintomas: dict) -> str:
+    @staticmethod
+    def _contexto_de(base: BaseConhecimento, contexto_termos: Dict[str, int],
+                     sintomas: Dict[str, float], red_flags: List[str]) -> Dict[str, List[str]]:
+        # fatos citados só em contexto (negados, passados, de terceiros) -> nomes dos
+        # flags; um fato afirmado por outro termo não entra
+        if not contexto_termos:
+            return {}
+        flags: Dict[str, int] = {}
+        for termo, f in contexto_termos.items():
+            for fato in (base.mappings.get(termo), base.red_flags_lex.get(termo)):
+                if fato is not None and fato not in sintomas and fato not in red_flags:
+                    flags[fato] = flags.get(fato, 0) | f
+        return {fato: descrever_contexto(f) for fato, f in flags.items()}
+
+    def gerar_resumo(self, texto_original: str, sintomas: dict,
+                     base: Optional[BaseConhecimento] = None, limite: Optional[int] = None) -> str:
         """
-        Tenta extrair frases relevantes contendo termos dos sintomas.
+        Escolhe as frases mais relevantes: as de maior peso somado dos termos de
+        sintomas (dentre `sintomas`) e red flags que contêm, até `limite` frases
+        (padrão: self.limite_resumo), na ordem em que aparecem no texto.
         """
-        frases = re.split(r"[.!?]\s*", texto_original.strip())
-        frases = [f.strip() for f in frases if f and len(f.strip()) > 3]
-        resumo = []
-
-        # cada sintoma: procurar palavras que o representem na frase
-        termos_sintomas = list(self.mappings.keys())
-        for t in termos_sintomas:
-            for fr in frases:
-                if t in fr.lower() and fr not in resumo:
-                    resumo.append(fr)
-                    if len(resumo) >= 2:  # limite de 2 frases no resumo
-                        return " ".join(resumo)
-                    break
-
-        if not resumo and frases:
-            resumo = frases[:1]
-
-        return " ".join(resumo) if resumo else texto_original[:100] + "..."
-
-    def processar_texto(self, texto_usuario: str) -> dict:
+        base = base or self.base
+        tn, originais, inicios, limites = self._segmentar(texto_original)
+        _, _, por_frase = self._casar_frases(base, tn, inicios, limites)
+        mappings = base.mappings
+        lex = base.red_flags_lex
+        frases = [
+            (frase, [t for t in termos if t in lex or mappings.get(t) in sintomas])
+            for frase, termos in zip(originais, por_frase)
+        ]
+        return self._resumo_de(base, frases, texto_original,
+                               self.limite_resumo if limite is None else limite)
+
+    @staticmethod
+    def _resumo_de(base: BaseConhecimento, frases: List[Tuple[str, List[str]]],
+                   texto_original: str, limite: int) -> str:
+        # frases: (frase original, termos distintos casados nela), na ordem do texto
+        peso = base.peso_termos
+        candidatas = []
+        vistas = set()
+        primeira = None
+        for i, (frase, termos) in enumerate(frases):
+            if len(frase) <= 3 or frase in vistas:
+                continue
+            vistas.add(frase)
+            if primeira is None:
+                primeira = frase
+            if termos:
+                candidatas.append((-sum(peso.get(t, 0.0) for t in termos), -len(termos), i))
+
+        if candidatas:
+            escolhidas = sorted(heapq.nsmallest(limite, candidatas), key=lambda c: c[2])
+            return " ".join(frases[i][0] for _, _, i in escolhidas)
+        if primeira is not None:
+            return primeira
+        return texto_original[:100] + "..."
+
+    def processar_texto(self, texto_usuario: str, cache_frases: Optional[CacheFrases] = None,
+                        base: Optional[BaseConhecimento] = None) -> dict:
         """
-        Pipeline NLU completo.
+        Pipeline NLU completo. Com cache_frases, o casamento é feito frase a frase e
+        reaproveita as frases já processadas na chamada anterior. base: versão da base
+        a usar (padrão: a atual da fonte), para casar com a inferência da mesma triagem.
         """
         if not texto_usuario or not texto_usuario.strip():
             return {
@@ -100,22 +186,215 @@ class NLUProcessor:
                 "texto_normalizado": "",
                 "sintomas": {},
                 "red_flags": [],
+                "contexto": {},
                 "resumo": "",
                 "pontuacao_total": 0.0
             }
 
-        tn = self.normalizar_texto(texto_usuario)
-        sintomas = self.extrair_sintomas(tn)
-        red_flags = self.extrair_red_flags(tn)
-        resumo = self.gerar_resumo(texto_usuario, sintomas)
-        pontuacao_total = sum(sintomas.values()) if sintomas else 0.0
+        base = base or self.base
+        cache = self.cache
+        if cache is None or cache_frases is not None:
+            return self._processar(base, texto_usuario, cache_frases)[0]
+
+        # textos com a mesma normalização compartilham a entrada (saída e termos de
+        # cada frase). A chave guarda os fins de frase e de oração, que limitam o
+        # escopo da negação; caixa e pontuação podem diferir, então o texto original e
+        # o resumo (frases como escritas) são refeitos para cada texto. Cada chamada
+        # recebe as suas cópias: quem alterar a saída não altera o cache
+        cache.validar_versao(base.versao)
+        chave = _RE_ESPACOS.sub(" ", _RE_PONTUACAO_FRASES.sub(" ", texto_usuario.lower())).strip(" .!?")
+        entrada = cache.obter(chave)
+        if entrada is None:
+            saida, termos_frases = self._processar(base, texto_usuario, None)
+            cache.guardar(chave, (saida, tuple(termos_frases)))
+        else:
+            saida, termos_frases = entrada
+            if saida["texto_original"] != texto_usuario:
+                originais = [f.strip() for f in _RE_FRASES.split(texto_usuario)]
+                if len(originais) != len(termos_frases):
+                    # fins de frase só nas pontas ("Estou triste." x "Estou triste")
+                    return self._processar(base, texto_usuario, None)[0]
+                resumo = self._resumo_de(base, list(zip(originais, termos_frases)), texto_usuario,
+                                         self.limite_resumo)
+                saida = dict(saida, texto_original=texto_usuario, resumo=resumo)
+        return dict(saida, sintomas=dict(saida["sintomas"]), red_flags=list(saida["red_flags"]),
+                    contexto={fato: list(nomes) for fato, nomes in saida["contexto"].items()})
+
+    def _processar(self, base: BaseConhecimento, texto_usuario: str,
+                   cache_frases: Optional[CacheFrases]) -> Tuple[dict, List[List[str]]]:
+        # saída do NLU e termos distintos de cada frase (para refazer o resumo)
+        p = perfilador.perfil_ativo()
+        etapas = metricas.etapas("nlu", p is not None)
+        if cache_frases is not None:
+            # frase a frase, normalização e casamento se intercalam: uma etapa só
+            tn, termos, contexto, frases = self._termos_por_frase(base, texto_usuario, cache_frases)
+        else:
+            tn, originais, inicios, limites = self._segmentar(texto_usuario)
+            etapas.marcar("normalizacao")
+            # uma única passada sobre o texto alimenta sintomas, red flags, contexto e resumo
+            termos, contexto, por_frase = self._casar_frases(base, tn, inicios, limites,
+                                                             etapas.estatisticas)
+            frases = list(zip(originais, por_frase))
+        etapas.marcar("casamento")
+        em_contexto = contexto
+        sintomas = self._sintomas_de(base, termos)
+        red_flags = self._red_flags_de(base, termos)
+        contexto = self._contexto_de(base, contexto, sintomas, red_flags)
+        etapas.marcar("extracao")
+        resumo = self._resumo_de(base, frases, texto_usuario, self.limite_resumo)
+        etapas.marcar("resumo")
+        if etapas is not metricas.NULO:
+            self._registrar_etapas(etapas, base, texto_usuario, termos, em_contexto, p)
+        return (self._saida(texto_usuario, tn, sintomas, red_flags, contexto, resumo),
+                [termos for _, termos in frases])
 
+    @staticmethod
+    def _registrar_etapas(etapas: "metricas.Etapas", base: BaseConhecimento, texto_usuario: str,
+                          termos: List[str], em_contexto: Dict[str, int],
+                          p: Optional["perfilador.Perfil"]) -> None:
+        estatisticas = etapas.estatisticas
+        m = metricas.registro_ativo()
+        if m is not None:
+            etapas.contar("textos")
+            etapas.contar("termos_casados", len(termos))
+            etapas.contar("termos_em_contexto", len(em_contexto))
+            if estatisticas:
+                etapas.contar("tokens_analisados", estatisticas["tokens"])
+                etapas.contar("passos_trie", estatisticas["passos_trie"])
+                etapas.contar("tokens_corrigidos", estatisticas["correcoes"])
+            etapas.registrar(m, base.versao)
+        if p is None:
+            return
+
+        # modo de perfil: o casamento é dividido, depois da chamada, em proporção aos
+        # passos dados na trie (um por token de cada termo casado) e aos tokens do
+        # texto; as parcelas são estimativas (quadro perfilador.ESTIMADO)
+        trechos = etapas.trechos()
+        pilhas = {("nlu", etapa): fim - ini for etapa, ini, fim in trechos if etapa != "casamento"}
+        casamento = next(fim - ini for etapa, ini, fim in trechos if etapa == "casamento")
+        por_termo: Dict[str, float] = {}
+        if estatisticas and estatisticas["tokens"]:
+            passos = {t: t.count(" ") + 1 for t in itertools.chain(termos, em_contexto)}
+            unidades = estatisticas["tokens"] + max(estatisticas["passos_trie"], sum(passos.values()))
+            parcela = casamento / unidades
+            estimado = ("nlu", "casamento", perfilador.ESTIMADO)
+            for termo, n in passos.items():
+                por_termo[termo] = n * parcela
+                if termo in base.mappings:
+                    pilha = estimado + ("mappings", termo)
+                elif termo in base.red_flags_lex:
+                    pilha = estimado + ("red_flags", termo)
+                else:
+                    pilha = estimado + (termo,)
+                pilhas[pilha] = n * parcela
+            pilhas[estimado + ("(tokens)",)] = estatisticas["tokens"] * parcela
+            # caminhadas sem termo: gatilhos de contexto e prefixos que não casaram
+            casamento -= (estatisticas["tokens"] + sum(passos.values())) * parcela
+        pilhas[("nlu", "casamento")] = casamento
+        p.acumular(pilhas)
+
+        mais_caros = sorted(((s, t) for t, s in por_termo.items()), reverse=True)[:5]
+        args = {"casamento": {"termos_estimado_us": {t: round(s * 1e6, 1) for s, t in mais_caros}}}
+        p.trechos([("nlu", etapas.inicio, trechos[-1][2],
+                    {"caracteres": len(texto_usuario), "termos": len(termos)})] +
+                  [("nlu." + etapa, ini, fim, args.get(etapa)) for etapa, ini, fim in trechos])
+
+    @staticmethod
+    def _saida(texto_usuario: str, tn: str, sintomas: Dict[str, float], red_flags: List[str],
+               contexto: Dict[str, List[str]], resumo: str) -> dict:
+        pontuacao_total = sum(sintomas.values()) if sintomas else 0.0
         return {
             "texto_original": texto_usuario,
             "texto_normalizado": tn,
             "sintomas": sintomas,
             "red_flags": red_flags,
+            "contexto": contexto,
             "resumo": resumo,
             "pontuacao_total": pontuacao_total
         }
 
+    @staticmethod
+    def _segmentar(texto: str) -> Tuple[str, List[str], List[int], List[int]]:
+        """
+        Divide o texto em frases e normaliza tudo de uma vez. Retorna o texto
+        normalizado (igual a normalizar_texto(texto)), as frases originais, a posição
+        de início de cada uma no texto normalizado (-1 se ficou vazia) e as posições
+        de início das orações (frases e trechos separados por vírgula, ";" ou ":").
+        """
+        # a pontuação de fim de frase sobrevive à limpeza, então as duas divisões
+        # produzem as mesmas frases, na mesma ordem
+        t = _RE_ESPACOS.sub(" ", _RE_PONTUACAO_FRASES.sub(" ", texto.lower()))
+        partes = []
+        originais = []
+        inicios = []
+        limites = []
+        pos = 0
+        for frase, fn in zip(_RE_FRASES.split(texto), _RE_FRASES.split(t)):
+            originais.append(frase.strip())
+            inicio = pos
+            for oracao in _RE_ORACOES.split(fn):
+                oracao = oracao.strip()
+                if oracao:
+                    limites.append(pos)
+                    partes.append(oracao)
+                    pos += len(oracao) + 1
+            inicios.append(inicio if pos > inicio else -1)
+        return " ".join(partes), originais, inicios, limites
+
+    @staticmethod
+    def _casar_frases(base: BaseConhecimento, tn: str, inicios: List[int], limites: List[int],
+                      estatisticas: Optional[Dict[str, int]] = None
+                      ) -> Tuple[List[str], Dict[str, int], List[List[str]]]:
+        """
+        Casa o texto normalizado inteiro numa passada e distribui as ocorrências pelas
+        frases (pela posição de início). Retorna os termos afirmados do texto, os
+        citados só em contexto (termo -> flags) e os termos de cada frase, na ordem da
+        primeira ocorrência.
+        """
+        ocorrencias = base.casador.buscar(tn, estatisticas, limites)
+        por_frase = [{} for _ in inicios]
+        if ocorrencias:
+            validos = [(ini, i) for i, ini in enumerate(inicios) if ini >= 0]
+            posicoes = [ini for ini, _ in validos]
+            for o in ocorrencias:
+                k = bisect.bisect_right(posicoes, o.inicio) - 1
+                por_frase[validos[k][1]][o.termo] = None
+        termos, contexto = separar_contexto(ocorrencias)
+        return termos, contexto, [list(d) for d in por_frase]
+
+    def _termos_por_frase(self, base: BaseConhecimento, texto: str, cache: CacheFrases
+                          ) -> Tuple[str, List[str], Dict[str, int], List[Tuple[str, List[str]]]]:
+        if cache.versao != base.versao:
+            cache.versao = base.versao
+            cache.frases = {}
+
+        atuais = {}
+        partes = []
+        termos = {}
+        contexto: Dict[str, int] = {}
+        frases = []
+        for frase in _RE_FRASES.split(texto):
+            item = atuais.get(frase) or cache.frases.get(frase)
+            if item is None:
+                fn, _, _, limites = self._segmentar(frase)
+                ocorrencias = base.casador.buscar(fn, None, limites)
+                distintos = list(dict.fromkeys(o.termo for o in ocorrencias))
+                item = (fn, distintos) + separar_contexto(ocorrencias)
+            atuais[frase] = item
+            frases.append((frase.strip(), item[1]))
+            if item[0]:
+                partes.append(item[0])
+                termos.update(dict.fromkeys(item[2]))
+                for t, f in item[3].items():
+                    contexto[t] = contexto.get(t, 0) | f
+        cache.frases = atuais
+        return " ".join(partes), list(termos), {t: f for t, f in contexto.items() if t not in termos}, frases
+
+    def processar_lote(self, textos: Iterable[str]) -> Iterator[dict]:
+        """
+        Processa um iterável de queixas, devolvendo os resultados um a um (gerador),
+        na mesma estrutura de processar_texto. A trie e os mappings são compartilhados
+        por todo o lote; a memória não cresce com o tamanho da entrada.
+        """
+        for texto in textos:
+            yield self.processar_texto(texto)
@@ -0,0 +1,251 @@
+# Modo de perfil do pipeline de triagem: atribui o tempo do NLU e do motor às
+# etapas, a cada termo dos mappings, a cada condição e às seções da base (mappings,
+# red_flags, condicoes, regras), para ver no tráfego real quais entradas do
+# vocabulário ou condições dominam o custo.
+#
+# Exporta pilhas colapsadas ("nlu;casamento;(estimado);mappings;triste 42", em µs:
+# flamegraph.pl, inferno, speedscope) e trace do Chrome (chrome://tracing, Perfetto),
+# um trecho por etapa de cada chamada rastreada.
+#
+# Ativação: variável de ambiente TRIAGEM_PERFIL=<prefixo dos arquivos> (1 = "perfil"),
+# --perfil nos CLIs ou perfilador.ativar(). TRIAGEM_PERFIL_AMOSTRA=0.05 rastreia só 5%
+# das chamadas. Ao fim de cada processo grava <prefixo>.<pid>.folded e
+# <prefixo>.<pid>.trace.json. NLU e motor cronometram as etapas como nas métricas
+# (metricas.Etapas); o tempo de cada termo e condição não é medido, e sim estimado
+# depois da chamada, dividindo o da etapa em proporção ao trabalho (passos na trie,
+# pares fato x condição). Essas parcelas ficam sob o quadro ESTIMADO
+# ("nlu;casamento;(estimado);mappings;triste") e nos campos *_estimado_us do trace.
+# Desligado, o perfil só custa um teste `if` por chamada.
+#
+# Resumo dos arquivos: python perfilador.py perfil.*.folded [--top 15]
+
+import argparse
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SECOES_BASE = ("mappings", "red_flags", "condicoes", "regras")
+# quadro acima das parcelas estimadas (termos, condições), abaixo da etapa medida
+ESTIMADO = "(estimado)"
+
+
+class Perfil:
+    def __init__(self, amostragem: float = 1.0, max_eventos: int = 200000):
+        """
+        amostragem: fração das chamadas rastreadas; max_eventos: teto de trechos do
+        trace do Chrome (as pilhas colapsadas não têm teto: são somadas).
+        """
+        self.amostragem = amostragem
+        self.max_eventos = max_eventos
+        self.pilhas: Dict[Tuple[str, ...], float] = {}   # pilha -> segundos (tempo próprio)
+        self.eventos: List[Dict] = []
+        self.descartados = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._origem = time.perf_counter()
+
+    def amostrar(self) -> bool:
+        return self.amostragem >= 1.0 or self._rng.random() < self.amostragem
+
+    def acumular(self, tempos: Dict[Tuple[str, ...], float]) -> None:
+        """Soma o tempo próprio de cada pilha (da raiz à folha)."""
+        with self._lock:
+            pilhas = self.pilhas
+            for pilha, segundos in tempos.items():
+                pilhas[pilha] = pilhas.get(pilha, 0.0) + segundos
+
+    def trechos(self, trechos: Iterable[Tuple[str, float, float, Optional[Dict]]]) -> None:
+        """Registra trechos (nome, início, fim em perf_counter, args) no trace do Chrome."""
+        pid, tid = os.getpid(), threading.get_ident()
+        with self._lock:
+            for nome, inicio, fim, args in trechos:
+                if len(self.eventos) >= self.max_eventos:
+                    self.descartados += 1
+                    continue
+                evento = {"name": nome, "cat": nome.split(".", 1)[0], "ph": "X", "pid": pid, "tid": tid,
+                          "ts": (inicio - self._origem) * 1e6, "dur": (fim - inicio) * 1e6}
+                if args:
+                    evento["args"] = args
+                self.eventos.append(evento)
+
+    def zerar(self) -> None:
+        with self._lock:
+            self.pilhas.clear()
+            self.eventos.clear()
+            self.descartados = 0
+
+    def exportar_pilhas(self) -> str:
+        with self._lock:
+            itens = sorted(self.pilhas.items())
+        linhas = []
+        for pilha, segundos in itens:
+            micros = round(segundos * 1e6)
+            if micros > 0:
+                linhas.append(";".join(_quadro(q) for q in pilha) + f" {micros}")
+        return "\n".join(linhas) + ("\n" if linhas else "")
+
+    def exportar_chrome(self) -> Dict:
+        with self._lock:
+            return {
+                "traceEvents": list(self.eventos),
+                "displayTimeUnit": "ms",
+                "otherData": {"pid": os.getpid(), "amostragem": self.amostragem,
+                              "eventos_descartados": self.descartados}
+            }
+
+    def gravar(self, prefixo: str) -> Tuple[str, str]:
+        """Grava <prefixo>.<pid>.folded e <prefixo>.<pid>.trace.json; devolve os caminhos."""
+        base = f"{prefixo}.{os.getpid()}"
+        pilhas, trace = base + ".folded", base + ".trace.json"
+        with open(pilhas, "w", encoding="utf-8") as f:
+            f.write(self.exportar_pilhas())
+        with open(trace, "w", encoding="utf-8") as f:
+            json.dump(self.exportar_chrome(), f, ensure_ascii=False)
+        return pilhas, trace
+
+
+def _quadro(nome: str) -> str:
+    # ";" separa quadros e o último espaço separa o valor: nomes de termos ficam legíveis
+    return nome.replace(";", ",")
+
+
+PERFIL: Optional[Perfil] = None
+_prefixo: Optional[str] = None
+_gravado = False
+_registrado_em: Optional[int] = None   # pid em que a gravação ao sair foi registrada
+
+
+def ativar(prefixo: Optional[str] = None, amostragem: float = 1.0) -> Perfil:
+    """
+    Liga o modo de perfil no processo. Com prefixo, os arquivos são gravados ao fim
+    do processo (inclusive nos workers de um pool de processos).
+    """
+    global PERFIL, _prefixo, _gravado, _registrado_em
+    if PERFIL is None:
+        PERFIL = Perfil(amostragem)
+    PERFIL.amostragem = amostragem
+    if prefixo:
+        _prefixo = prefixo
+        if _registrado_em != os.getpid():
+            # processo novo (inclusive filho por fork): perfil e registro próprios
+            if _registrado_em is not None:
+                PERFIL.zerar()
+            _registrado_em, _gravado = os.getpid(), False
+            atexit.register(_gravar_ao_sair)
+            # workers de multiprocessing saem por os._exit: atexit não roda, os finalizadores sim
+            from multiprocessing import util
+            util.Finalize(None, _gravar_ao_sair, exitpriority=10)
+    return PERFIL
+
+
+def desativar() -> None:
+    global PERFIL
+    PERFIL = None
+
+
+def ativar_do_ambiente() -> Optional[Perfil]:
+    """Liga o perfil se TRIAGEM_PERFIL estiver definida (use no inicializador dos workers)."""
+    valor = os.environ.get("TRIAGEM_PERFIL", "")
+    if valor in ("", "0"):
+        return None
+    return ativar("perfil" if valor == "1" else valor,
+                  float(os.environ.get("TRIAGEM_PERFIL_AMOSTRA", "1") or 1))
+
+
+def configurar_ambiente(prefixo: str, amostragem: float = 1.0) -> Perfil:
+    """Liga o perfil aqui e nos processos filhos criados depois (CLIs com --perfil)."""
+    os.environ["TRIAGEM_PERFIL"] = prefixo
+    os.environ["TRIAGEM_PERFIL_AMOSTRA"] = repr(amostragem)
+    return ativar(prefixo, amostragem)
+
+
+def perfil_ativo() -> Optional[Perfil]:
+    """O perfil do processo se o modo de perfil estiver ligado e a chamada for sorteada; senão None."""
+    p = PERFIL
+    if p is None or not p.amostrar():
+        return None
+    return p
+
+
+def _gravar_ao_sair() -> None:
+    global _gravado
+    if _gravado or PERFIL is None or _prefixo is None:
+        return
+    _gravado = True
+    if not PERFIL.pilhas and not PERFIL.eventos:
+        return
+    try:
+        pilhas, trace = PERFIL.gravar(_prefixo)
+    except OSError as e:
+        print(f"Aviso: perfil não gravado: {e}", file=sys.stderr)
+        return
+    print(f"Perfil gravado em {pilhas} e {trace}", file=sys.stderr)
+
+
+ativar_do_ambiente()
+
+
+def ler_pilhas(caminhos: Iterable[str]) -> Dict[Tuple[str, ...], int]:
+    pilhas: Dict[Tuple[str, ...], int] = {}
+    for caminho in caminhos:
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.rstrip("\n")
+                if not linha:
+                    continue
+                pilha, _, valor = linha.rpartition(" ")
+                chave = tuple(pilha.split(";"))
+                pilhas[chave] = pilhas.get(chave, 0) + int(valor)
+    return pilhas
+
+
+def resumir(pilhas: Dict[Tuple[str, ...], int]) -> Dict[str, Dict[str, int]]:
+    """Totais (us) por etapa, seção da base, termo e condição."""
+    grupos: Dict[str, Dict[str, int]] = {"etapas": {}, "secoes": {}, "termos": {}, "condicoes": {}}
+
+    def somar(grupo: str, chave: str, valor: int) -> None:
+        grupos[grupo][chave] = grupos[grupo].get(chave, 0) + valor
+
+    for pilha, valor in pilhas.items():
+        somar("etapas", ";".join(pilha[:2]), valor)
+        for i, quadro in enumerate(pilha):
+            if quadro in SECOES_BASE:
+                somar("secoes", quadro, valor)
+                if i + 1 < len(pilha):
+                    folha = pilha[i + 1]
+                    if quadro == "condicoes":
+                        somar("condicoes", folha, valor)
+                    elif quadro in ("mappings", "red_flags") and pilha[0] == "nlu":
+                        somar("termos", folha, valor)
+                break
+    return grupos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumo de perfis (.folded) do pipeline de triagem")
+    parser.add_argument("arquivos", nargs="+", help="arquivos .folded gravados no modo de perfil")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+    try:
+        grupos = resumir(ler_pilhas(args.arquivos))
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    total = sum(grupos["etapas"].values()) or 1
+    for titulo, grupo in (("Etapas", "etapas"), ("Seções da base (regras medida, demais estimadas)", "secoes"),
+                          ("Termos (estimado)", "termos"), ("Condições (estimado)", "condicoes")):
+        itens = sorted(grupos[grupo].items(), key=lambda x: -x[1])[:args.top]
+        if not itens:
+            continue
+        print(f"\n{titulo}:")
+        for nome, micros in itens:
+            print(f"  {micros / 1000:10.2f} ms  {micros / total * 100:5.1f}%  {nome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# Regras de risco declarativas da base (seção "regras"), compiladas numa tabela de
+# predicados avaliada uma vez por inferência.
+#
+# Cada regra tem um bloco "se" (todas as cláusulas precisam valer) e produz um nível
+# mínimo de risco e/ou recomendações:
+#
+#   {"nome": "crise_suicida",
+#    "se": {"condicao_principal": ["crise_suicida"]},
+#    "recomendacoes": ["INTERVENÇÃO IMEDIATA: Risco suicida ativo detectado"]}
+#
+# Cláusulas de "se":
+#   todos / algum / nenhum   fatos afirmados: todos presentes, ao menos um, nenhum
+#   algum_citado             ao menos um dos fatos citado só como negado ou passado
+#                            (escalada para revisão: "nunca tentei", "anos atrás")
+#   red_flag                 true: alguma red flag afirmada; false: nenhuma
+#   condicao_principal       condição de maior score entre as listadas
+#   score_minimo             {condição: score mínimo}
+#   risco_minimo             risco global mínimo
+#   sem_condicoes            true: nenhuma condição pontuou; false: alguma pontuou
+#   nivel                    nível de risco final entre os listados
+#
+# Os fatos viram bits de um inteiro; cada regra guarda as máscaras de todos/algum/
+# nenhum e entra no índice do fato, da condição ou do nível que a torna candidata.
+# Por inferência só as regras candidatas são conferidas. As regras com "nivel" são
+# conferidas depois que as demais fixaram o nível e não podem alterá-lo; as
+# recomendações saem na ordem das regras na base.
+
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+NIVEIS_RISCO = ("Mínimo", "Baixo", "Médio", "Alto")
+
+_CLAUSULAS = ("todos", "algum", "nenhum", "algum_citado", "red_flag", "condicao_principal", "score_minimo",
+              "risco_minimo", "sem_condicoes", "nivel")
+_CAMPOS_REGRA = ("nome", "se", "nivel", "recomendacoes")
+# prefixo dos bits de fatos citados (negados ou passados), separados dos afirmados
+_CITADO = "~"
+
+
+def _lista(valor, onde: str) -> List[str]:
+    if isinstance(valor, str) or not isinstance(valor, (list, tuple)):
+        raise ValueError(f"{onde}: esperada uma lista")
+    return [str(v).lower() for v in valor]
+
+
+def normalizar_regras(regras) -> List[Dict]:
+    """
+    Confere a estrutura da seção "regras" e a devolve com nomes de fatos e condições
+    em minúsculas. Lança ValueError para cláusulas, campos ou níveis desconhecidos.
+    """
+    if not isinstance(regras, (list, tuple)):
+        raise ValueError("'regras' deve ser uma lista")
+    normalizadas = []
+    for i, regra in enumerate(regras):
+        if not isinstance(regra, dict):
+            raise ValueError(f"regra {i}: esperado um objeto")
+        nome = str(regra.get("nome", f"regra_{i}"))
+        onde = f"regra {nome}"
+        extras = set(regra) - set(_CAMPOS_REGRA)
+        if extras:
+            raise ValueError(f"{onde}: campos desconhecidos {sorted(extras)}")
+        se = regra.get("se", {})
+        if not isinstance(se, dict):
+            raise ValueError(f"{onde}: 'se' deve ser um objeto")
+        extras = set(se) - set(_CLAUSULAS)
+        if extras:
+            raise ValueError(f"{onde}: cláusulas desconhecidas {sorted(extras)}")
+
+        cond = {}
+        for chave in ("todos", "algum", "nenhum", "algum_citado", "condicao_principal"):
+            if chave in se:
+                cond[chave] = _lista(se[chave], f"{onde}.se.{chave}")
+        if "nivel" in se:
+            niveis = [str(n) for n in (se["nivel"] if isinstance(se["nivel"], (list, tuple)) else [se["nivel"]])]
+            for n in niveis:
+                if n not in NIVEIS_RISCO:
+                    raise ValueError(f"{onde}: nível desconhecido {n!r}")
+            cond["nivel"] = niveis
+        for chave in ("red_flag", "sem_condicoes"):
+            if chave in se:
+                cond[chave] = bool(se[chave])
+        if "risco_minimo" in se:
+            cond["risco_minimo"] = float(se["risco_minimo"])
+        if "score_minimo" in se:
+            if not isinstance(se["score_minimo"], dict):
+                raise ValueError(f"{onde}.se.score_minimo: esperado {{condição: score}}")
+            cond["score_minimo"] = {str(c).lower(): float(v) for c, v in se["score_minimo"].items()}
+
+        nivel = regra.get("nivel")
+        if nivel is not None and nivel not in NIVEIS_RISCO:
+            raise ValueError(f"{onde}: nível desconhecido {nivel!r}")
+        if nivel is not None and "nivel" in cond:
+            raise ValueError(f"{onde}: uma regra condicionada ao nível não pode alterá-lo")
+        recomendacoes = [str(r) for r in regra.get("recomendacoes", ())]
+        if nivel is None and not recomendacoes:
+            raise ValueError(f"{onde}: sem 'nivel' nem 'recomendacoes'")
+
+        normalizada = {"nome": nome, "se": cond, "recomendacoes": recomendacoes}
+        if nivel is not None:
+            normalizada["nivel"] = nivel
+        normalizadas.append(normalizada)
+    return normalizadas
+
+
+class RegrasRisco:
+    """
+    Tabela compilada das regras. avaliar() devolve o nível final e os índices das
+    regras disparadas; recomendacoes() monta o texto só quando pedido.
+    """
+
+    def __init__(self, regras: Sequence[Dict], red_flags: Sequence[str]):
+        self.nomes: Tuple[str, ...] = tuple(r["nome"] for r in regras)
+        self._recomendacoes: Tuple[Tuple[str, ...], ...] = tuple(tuple(r["recomendacoes"]) for r in regras)
+
+        self._bits: Dict[str, int] = {}
+
+        def mascara(fatos: Iterable[str], prefixo: str = "") -> int:
+            m = 0
+            for f in fatos:
+                m |= self._bits.setdefault(prefixo + f, 1 << len(self._bits))
+            return m
+
+        mascara_red_flags = mascara(red_flags)
+        # índices: fato / condição principal / nível -> máscara das regras candidatas
+        self._por_fato: Dict[str, int] = {}
+        self._por_condicao: Dict[str, int] = {}
+        self._por_nivel: Dict[str, int] = {}
+        self._sempre = 0        # regras sem cláusula indexável
+        self._finais = 0        # regras condicionadas ao nível (segunda etapa)
+        tabela = []
+        for i, regra in enumerate(regras):
+            se = regra["se"]
+            bit = 1 << i
+            todos = mascara(se.get("todos", ()))
+            algum = []
+            if se.get("algum"):
+                algum.append(mascara(se["algum"]))
+            if se.get("red_flag") is True:
+                algum.append(mascara_red_flags)
+            if se.get("algum_citado"):
+                algum.append(mascara(se["algum_citado"], _CITADO))
+            nenhum = mascara(se.get("nenhum", ()))
+            if se.get("red_flag") is False:
+                nenhum |= mascara_red_flags
+            condicoes = frozenset(se["condicao_principal"]) if "condicao_principal" in se else None
+            niveis = frozenset(se["nivel"]) if "nivel" in se else None
+            tabela.append((
+                todos, tuple(algum), nenhum, condicoes,
+                tuple(se.get("score_minimo", {}).items()),
+                se.get("risco_minimo"), se.get("sem_condicoes"), niveis,
+                NIVEIS_RISCO.index(regra["nivel"]) if "nivel" in regra else -1
+            ))
+            if niveis is not None:
+                self._finais |= bit
+
+            # a regra só é conferida quando o fato, a condição ou o nível de que
+            # depende aparece; a cláusula mais seletiva decide o índice
+            if todos:
+                chaves, indice = se["todos"][:1], self._por_fato
+            elif algum:
+                chaves = (se.get("algum") or (red_flags if se.get("red_flag") is True else
+                                              [_CITADO + f for f in se["algum_citado"]]))
+                indice = self._por_fato
+            elif condicoes is not None:
+                chaves, indice = condicoes, self._por_condicao
+            elif niveis is not None:
+                chaves, indice = niveis, self._por_nivel
+            else:
+                self._sempre |= bit
+                continue
+            for chave in chaves:
+                indice[chave] = indice.get(chave, 0) | bit
+        self._tabela = tuple(tabela)
+        self._usa_scores = any(linha[4] for linha in tabela)
+
+    def __len__(self):
+        return len(self._tabela)
+
+    def cita(self, citados: Iterable[str]) -> bool:
+        """Se algum dos fatos citados aparece numa cláusula algum_citado."""
+        por_fato = self._por_fato
+        return any(_CITADO + f in por_fato for f in citados)
+
+    def avaliar(self, fatos: Iterable[str], nivel: str, risco_global: float,
+                resultados: Sequence, citados: Iterable[str] = ()) -> Tuple[str, Tuple[int, ...]]:
+        """
+        fatos: fatos afirmados; nivel: nível dado pelos thresholds; resultados: condições
+        pontuadas em ordem de score (objetos com .condicao e .score); citados: fatos
+        só negados ou no passado.
+        """
+        bits = self._bits
+        por_fato = self._por_fato
+        presentes = 0
+        candidatas = self._sempre
+        for f in fatos:
+            b = bits.get(f)
+            if b is not None:
+                presentes |= b
+                candidatas |= por_fato.get(f, 0)
+        for f in citados:
+            b = bits.get(_CITADO + f)
+            if b is not None:
+                presentes |= b
+                candidatas |= por_fato.get(_CITADO + f, 0)
+        principal = resultados[0].condicao if resultados else None
+        if principal is not None:
+            candidatas |= self._por_condicao.get(principal, 0)
+        scores = None
+        if self._usa_scores:
+            scores = {r.condicao: r.score for r in resultados}
+
+        indice_nivel = NIVEIS_RISCO.index(nivel)
+        disparadas = []
+        finais = self._finais
+        etapa = candidatas & ~finais
+        for segunda in (False, True):
+            if segunda:
+                nivel = NIVEIS_RISCO[indice_nivel]
+                etapa = (candidatas | self._por_nivel.get(nivel, 0)) & finais
+            while etapa:
+                menor = etapa & -etapa
+                i = menor.bit_length() - 1
+                etapa ^= menor
+                (todos, algum, nenhum, condicoes, minimos, risco_minimo,
+                 sem_condicoes, niveis, nivel_regra) = self._tabela[i]
+                if presentes & todos != todos or presentes & nenhum:
+                    continue
+                if any(not presentes & m for m in algum):
+                    continue
+                if condicoes is not None and principal not in condicoes:
+                    continue
+                if minimos and any(scores.get(c, 0.0) < v for c, v in minimos):
+                    continue
+                if risco_minimo is not None and risco_global < risco_minimo:
+                    continue
+                if sem_condicoes is not None and sem_condicoes != (not resultados):
+                    continue
+                if niveis is not None and nivel not in niveis:
+                    continue
+                disparadas.append(i)
+                if nivel_regra > indice_nivel:
+                    indice_nivel = nivel_regra
+        disparadas.sort()
+        return nivel, tuple(disparadas)
+
+    def recomendacoes(self, disparadas: Iterable[int]) -> List[str]:
+        recs = []
+        for i in disparadas:
+            recs.extend(self._recomendacoes[i])
+        return recs
+
+
+def referencias(regras: Sequence[Dict]) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """({fato: [regras]}, {condição: [regras]}) citados pelas regras, para a validação."""
+    fatos: Dict[str, List[str]] = {}
+    condicoes: Dict[str, List[str]] = {}
+    for regra in regras:
+        se = regra["se"]
+        for chave in ("todos", "algum", "nenhum", "algum_citado"):
+            for f in se.get(chave, ()):
+                fatos.setdefault(f, []).append(regra["nome"])
+        for c in list(se.get("condicao_principal", ())) + list(se.get("score_minimo", {})):
+            condicoes.setdefault(c, []).append(regra["nome"])
+    return fatos, condicoes
@@ -0,0 +1,253 @@
+# Servidor HTTP headless de triagem (asyncio, só biblioteca padrão).
+#
+# POST /triagem  {"texto": "..."}  -> {"nlu": ..., "fatos": [...], "inferencia": ...}
+# GET  /saude                      -> {"status": "ok"}
+#
+# O trabalho de CPU (NLU + inferência) roda num pool de processos; cada processo
+# mantém um PipelineTriagem pré-carregado (com recarga a quente da base). Sob carga,
+# as requisições que chegam enquanto os workers estão ocupados são agrupadas em lotes.
+# Com --auditoria, cada worker grava suas triagens no registro de auditoria (SQLite em
+# WAL, um lote por transação); com a gravação atrasada o worker espera, a fila de
+# requisições enche e as novas recebem 503.
+#
+# Uso: python servidor.py --porta 8080 --workers 4
+
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+TAMANHO_MAX_CORPO = 1 << 20  # 1 MiB por requisição
+
+_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+# pipeline do processo worker (um por processo do pool)
+_PIPELINE = None
+
+
+def _iniciar_worker(caminho_base: str, tamanho_cache: int = 0,
+                    caminho_auditoria: Optional[str] = None) -> None:
+    global _PIPELINE
+    import perfilador
+    from auditoria import abrir_no_worker
+    from base_conhecimento import FonteBase
+    from triagem import PipelineTriagem
+
+    perfilador.ativar_do_ambiente()
+    fonte = FonteBase.de_arquivo(caminho_base)
+    fonte.iniciar_observacao()
+    auditoria = abrir_no_worker(caminho_auditoria) if caminho_auditoria else None
+    _PIPELINE = PipelineTriagem(base=fonte, tamanho_cache=tamanho_cache, auditoria=auditoria,
+                                origem="servidor")
+
+
+def _triar_lote(textos: List[str]) -> List[Dict]:
+    # o resultado do motor vira dict aqui, no worker, pronto para o JSON da resposta
+    return [dict(saida, inferencia=saida["inferencia"].to_dict())
+            for saida in _PIPELINE.processar_lote(textos)]
+
+
+class ColetorLotes:
+    """
+    Agrupa requisições concorrentes: cada lote vai para um worker do pool; enquanto
+    todos os workers estão ocupados, novas requisições se acumulam no próximo lote.
+    """
+
+    def __init__(self, pool: ProcessPoolExecutor, workers: int, lote_max: int = 64,
+                 espera: float = 0.0, fila_max: int = 10000):
+        self.pool = pool
+        self.lote_max = lote_max
+        self.espera = espera
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=fila_max)
+        self._vagas = asyncio.Semaphore(workers)
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def iniciar(self) -> None:
+        self._tarefa = asyncio.get_running_loop().create_task(self._despachar())
+
+    async def parar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+
+    async def triar(self, texto: str) -> Dict:
+        futuro = asyncio.get_running_loop().create_future()
+        self.fila.put_nowait((texto, futuro))  # asyncio.QueueFull -> 503
+        return await futuro
+
+    async def _despachar(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # só monta o próximo lote quando há worker livre: sob carga, a fila cresce
+            # enquanto os workers trabalham e o lote seguinte sai maior
+            await self._vagas.acquire()
+            lote = [await self.fila.get()]
+            prazo = loop.time() + self.espera
+            while len(lote) < self.lote_max:
+                if not self.fila.empty():
+                    lote.append(self.fila.get_nowait())
+                    continue
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self.fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self._executar(lote))
+
+    async def _executar(self, lote: List[Tuple[str, asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            resultados = await loop.run_in_executor(self.pool, _triar_lote, [t for t, _ in lote])
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+        else:
+            for (_, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+        finally:
+            self._vagas.release()
+
+
+class ServidorTriagem:
+    def __init__(self, coletor: ColetorLotes):
+        self.coletor = coletor
+
+    async def atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    cabecalho = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                linhas = cabecalho.decode("latin-1").split("\r\n")
+                try:
+                    metodo, caminho, versao = linhas[0].split(" ", 2)
+                except ValueError:
+                    await self._responder(writer, 400, {"erro": "requisição inválida"}, False)
+                    break
+                headers = {}
+                for linha in linhas[1:]:
+                    if ":" in linha:
+                        k, v = linha.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+
+                manter = headers.get("connection", "").lower() != "close" and versao == "HTTP/1.1"
+                try:
+                    tamanho = int(headers.get("content-length", "0") or 0)
+                    if tamanho < 0:
+                        raise ValueError
+                except ValueError:
+                    await self._responder(writer, 400, {"erro": "Content-Length inválido"}, False)
+                    break
+                if tamanho > TAMANHO_MAX_CORPO:
+                    await self._responder(writer, 413, {"erro": "corpo muito grande"}, False)
+                    break
+                corpo = await reader.readexactly(tamanho) if tamanho else b""
+
+                status, resposta = await self._rotear(metodo, caminho, corpo)
+                await self._responder(writer, status, resposta, manter)
+                if not manter:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _rotear(self, metodo: str, caminho: str, corpo: bytes) -> Tuple[int, Dict]:
+        caminho = caminho.split("?", 1)[0]
+        if caminho == "/saude":
+            return 200, {"status": "ok"}
+        if caminho != "/triagem":
+            return 404, {"erro": "rota não encontrada"}
+        if metodo != "POST":
+            return 405, {"erro": "use POST"}
+        try:
+            dados = json.loads(corpo.decode("utf-8"))
+            texto = dados["texto"]
+            if not isinstance(texto, str):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return 400, {"erro": 'corpo deve ser JSON {"texto": "..."}'}
+        try:
+            return 200, await self.coletor.triar(texto)
+        except asyncio.QueueFull:
+            return 503, {"erro": "servidor sobrecarregado"}
+        except Exception as e:
+            return 500, {"erro": str(e)}
+
+    @staticmethod
+    async def _responder(writer: asyncio.StreamWriter, status: int, corpo: Dict, manter: bool) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        cabecalho = (
+            f"HTTP/1.1 {status} {_STATUS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n"
+        )
+        writer.write(cabecalho.encode("latin-1") + dados)
+        await writer.drain()
+
+
+async def servir(host: str, porta: int, workers: int, caminho_base: str,
+                 lote_max: int = 64, espera: float = 0.0, tamanho_cache: int = 0,
+                 caminho_auditoria: Optional[str] = None) -> None:
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                             initargs=(caminho_base, tamanho_cache, caminho_auditoria)) as pool:
+        coletor = ColetorLotes(pool, workers, lote_max=lote_max, espera=espera)
+        coletor.iniciar()
+        servidor = await asyncio.start_server(ServidorTriagem(coletor).atender, host, porta)
+        print(f"Servidor de triagem em http://{host}:{porta}/triagem ({workers} workers)")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            await coletor.parar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP de triagem")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base", default="base_conhecimento.json")
+    parser.add_argument("--lote-max", type=int, default=64, help="máximo de textos por lote enviado a um worker")
+    parser.add_argument("--espera-ms", type=float, default=0.0,
+                        help="janela extra para agrupar requisições em lote (0 = só o que já está na fila)")
+    parser.add_argument("--cache", type=int, default=0,
+                        help="entradas do cache LRU de resultados por worker (0 = desligado)")
+    parser.add_argument("--auditoria", metavar="ARQUIVO",
+                        help="registra cada triagem no banco SQLite de auditoria (ver auditoria.py)")
+    parser.add_argument("--perfil", metavar="PREFIXO",
+                        help="modo de perfil nos workers: PREFIXO.<pid>.folded e .trace.json ao encerrar")
+    parser.add_argument("--perfil-amostra", type=float, default=0.01, help="fração das requisições rastreadas")
+    args = parser.parse_args(argv)
+    if args.perfil:
+        import perfilador
+        perfilador.configurar_ambiente(args.perfil, args.perfil_amostra)
+    try:
+        asyncio.run(servir(args.host, args.porta, args.workers, args.base,
+                           lote_max=args.lote_max, espera=args.espera_ms / 1000,
+                           tamanho_cache=args.cache, caminho_auditoria=args.auditoria))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
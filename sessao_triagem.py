@@ -0,0 +1,176 @@
+# Triagem incremental para teleatendimento: o texto chega em trechos (mensagens de
+# chat ou segmentos de transcrição) e cada trecho atualiza sintomas, red flags e a
+# inferência sem reprocessar a conversa inteira.
+
+import bisect
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from base_conhecimento import BaseConhecimento
+from motor_inferencia import PontuacaoSessao, ResultadoInferencia
+from triagem import PipelineTriagem
+
+_RE_PALAVRA = re.compile(r"\w+")
+
+
+class SessaoTriagem:
+    """
+    Uma conversa em andamento. Só o trecho novo é normalizado e casado, junto com a
+    cauda do texto anterior (as últimas palavras, o bastante para o termo mais longo
+    da base e para o alcance dos gatilhos de negação/passado/terceiros), de modo que
+    termos divididos entre dois trechos também são encontrados. O custo de cada
+    trecho é proporcional ao seu tamanho, não ao da conversa, e a inferência só
+    repontua as condições ligadas aos fatos novos (MotorInferencia.inferir_sessao).
+
+    As ocorrências da cauda guardam os seus flags de contexto: um gatilho posposto
+    que só chega no trecho seguinte ("tentei me matar" + "anos atrás") os completa e,
+    se era a única afirmação do termo, o retira dos afirmados, como no texto inteiro.
+    """
+
+    def __init__(self, pipeline: Optional[PipelineTriagem] = None,
+                 caminho_base: str = "base_conhecimento.json"):
+        self.pipeline = pipeline or PipelineTriagem(caminho_base)
+        self.nlu = self.pipeline.nlu
+        self.motor = self.pipeline.motor
+        self.trechos: List[str] = []
+        self.termos: Dict[str, int] = {}       # termo afirmado -> ocorrências afirmadas
+        self.sintomas: Dict[str, float] = {}
+        self.red_flags: Dict[str, None] = {}
+        self.contexto: Dict[str, List[str]] = {}  # fatos citados só sem afirmação -> flags
+        self._termos_contexto: Dict[str, int] = {}  # termo -> flags das ocorrências em contexto
+        self._recentes: Dict[Tuple[str, int], int] = {}  # (termo, palavra na cauda) -> flags
+        self.resultado: ResultadoInferencia = self.motor.inferir(set())
+        self._pontuacao = PontuacaoSessao()
+        self._cauda = ""
+        self._vistos = 0      # tamanho da cauda normalizada
+        self._versao: Optional[str] = None
+        self._ouvintes: List[Callable[["SessaoTriagem", ResultadoInferencia], None]] = []
+
+    @property
+    def nivel_risco(self) -> str:
+        return self.resultado.nivel_risco
+
+    @property
+    def fatos(self) -> set:
+        return set(self.sintomas) | set(self.red_flags)
+
+    @property
+    def texto(self) -> str:
+        return "".join(self.trechos)
+
+    def ao_escalar(self, ouvinte: Callable[["SessaoTriagem", ResultadoInferencia], None]) -> None:
+        """Registra uma função chamada quando o risco passa a "Alto"."""
+        self._ouvintes.append(ouvinte)
+
+    def adicionar(self, trecho: str, separador: str = " ") -> ResultadoInferencia:
+        """
+        Acrescenta um trecho à conversa e devolve a inferência atualizada. O separador
+        é inserido antes do trecho (use "" para continuar a mesma frase; os trechos
+        devem terminar em fim de palavra).
+        """
+        if self.trechos and separador:
+            trecho = separador + trecho
+        self.trechos.append(trecho)
+
+        base = self.nlu.base
+        reiniciar = base.versao != self._versao
+        if reiniciar:
+            # base nova (ou primeiro trecho): termos e pesos podem ter mudado, então
+            # a conversa acumulada é casada de novo, uma vez
+            self._versao = base.versao
+            self.termos, self.sintomas, self.red_flags = {}, {}, {}
+            self.contexto, self._termos_contexto, self._recentes = {}, {}, {}
+            janela = self.texto
+            ja_vistos = 0
+        else:
+            janela = self._cauda + trecho
+            ja_vistos = self._vistos
+
+        casador = base.casador
+        tn, _, _, limites = self.nlu._segmentar(janela)
+        # o gatilho precisa caber na cauda junto com o início do termo
+        self._cauda = self._calcular_cauda(janela, 2 * casador.max_tokens - 1 + casador.janela)
+        cauda_normalizada = self.nlu.normalizar_texto(self._cauda)
+        self._vistos = len(cauda_normalizada)
+        palavras = [m.start() for m in _RE_PALAVRA.finditer(tn)]
+        desde = len(palavras) - len(_RE_PALAVRA.findall(cauda_normalizada))
+
+        recentes = {}
+        mudou = reiniciar
+        for o in casador.buscar(tn, None, limites):
+            palavra = bisect.bisect_left(palavras, o.inicio)
+            if o.fim <= ja_vistos:
+                # já contada no trecho anterior: só um gatilho posposto do trecho
+                # novo acrescenta flags
+                antes = self._recentes.get((o.termo, palavra))
+                if antes is None:
+                    continue
+                flags = antes | o.contexto
+                if flags != antes:
+                    mudou = True
+                    self._termos_contexto[o.termo] = self._termos_contexto.get(o.termo, 0) | flags
+                    if not antes:
+                        self._retirar(base, o.termo)
+            else:
+                flags = o.contexto
+                if flags:
+                    anterior = self._termos_contexto.get(o.termo, 0)
+                    if anterior | flags != anterior:
+                        self._termos_contexto[o.termo] = anterior | flags
+                        mudou = True
+                else:
+                    mudou = self._afirmar(base, o.termo) or mudou
+            if palavra >= desde:
+                recentes[(o.termo, palavra - desde)] = flags
+        self._recentes = recentes
+        if not mudou:
+            return self.resultado
+
+        self.contexto = self.nlu._contexto_de(base, self._termos_contexto, self.sintomas,
+                                              list(self.red_flags))
+        anterior = self.resultado.nivel_risco
+        self.resultado = self.motor.inferir_sessao(self._pontuacao, self.fatos, self.contexto)
+        if self.resultado.nivel_risco == "Alto" and anterior != "Alto":
+            for ouvinte in list(self._ouvintes):
+                ouvinte(self, self.resultado)
+        return self.resultado
+
+    def _afirmar(self, base: BaseConhecimento, termo: str) -> bool:
+        # mais uma ocorrência afirmada; True se o termo passou a contar
+        n = self.termos.get(termo, 0)
+        self.termos[termo] = n + 1
+        if n:
+            return False
+        sintoma = base.mappings.get(termo)
+        if sintoma is not None:
+            self.sintomas[sintoma] = self.sintomas.get(sintoma, 0.0) + 1.0
+        rf = base.red_flags_lex.get(termo)
+        if rf is not None:
+            self.red_flags[rf] = None
+        return True
+
+    def _retirar(self, base: BaseConhecimento, termo: str) -> None:
+        # uma ocorrência afirmada passou a ter contexto
+        n = self.termos[termo] - 1
+        if n:
+            self.termos[termo] = n
+            return
+        del self.termos[termo]
+        sintoma = base.mappings.get(termo)
+        if sintoma is not None:
+            restante = self.sintomas.pop(sintoma) - 1.0
+            if restante > 0:
+                self.sintomas[sintoma] = restante
+        rf = base.red_flags_lex.get(termo)
+        if rf is not None and not any(base.red_flags_lex.get(t) == rf for t in self.termos):
+            del self.red_flags[rf]
+
+    @staticmethod
+    def _calcular_cauda(janela: str, palavras: int) -> str:
+        # texto bruto a partir do início das últimas `palavras` palavras da janela
+        if palavras <= 0:
+            return ""
+        inicios = [m.start() for m in _RE_PALAVRA.finditer(janela)]
+        if not inicios:
+            return ""
+        return janela[inicios[max(0, len(inicios) - palavras)]:]
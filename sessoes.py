@@ -0,0 +1,184 @@
+# Sessões de triagem com várias rodadas (perguntas de seguimento do atendente).
+#
+# Cada sessão acumula os fatos afirmados e o contexto (citados sem afirmação) de
+# todas as rodadas e guarda a pontuação da anterior: uma rodada nova só repontua as
+# condições ligadas aos fatos novos (MotorInferencia.inferir_sessao). A memória é
+# limitada: além de `capacidade` sessões a menos usada recentemente sai da memória,
+# e as ociosas há mais de `ocioso` segundos são encerradas. Com SQLite as sessões
+# também ficam em disco: uma sessão que saiu da memória volta de lá (repontuada uma
+# vez) e sobrevive a um reinício do processo.
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from motor_inferencia import MotorInferencia, PontuacaoSessao, ResultadoInferencia
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sessoes (
+    id TEXT PRIMARY KEY,
+    fatos TEXT NOT NULL,
+    contexto TEXT NOT NULL,
+    rodadas INTEGER NOT NULL,
+    atualizada_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessoes_atualizada_em ON sessoes (atualizada_em);
+"""
+
+
+class Sessao:
+    """Estado de uma sessão: fatos afirmados, contexto, pontuação e último resultado."""
+    __slots__ = ("id", "fatos", "contexto", "rodadas", "atualizada_em", "pontuacao", "resultado")
+
+    def __init__(self, id_sessao: str, fatos: Iterable[str] = (),
+                 contexto: Optional[Dict[str, List[str]]] = None, rodadas: int = 0,
+                 atualizada_em: float = 0.0):
+        self.id = id_sessao
+        self.fatos: Dict[str, None] = dict.fromkeys(fatos)   # na ordem em que apareceram
+        self.contexto: Dict[str, List[str]] = dict(contexto or {})
+        self.rodadas = rodadas
+        self.atualizada_em = atualizada_em
+        self.pontuacao = PontuacaoSessao()
+        self.resultado: Optional[ResultadoInferencia] = None
+
+    def acumular(self, fatos: Iterable[str], contexto: Optional[Dict[str, List[str]]]) -> None:
+        # um fato afirmado continua afirmado; rótulos de contexto se somam
+        for f in fatos:
+            self.fatos[f.lower()] = None
+        for f, rotulos in (contexto or {}).items():
+            f = f.lower()
+            atuais = self.contexto.setdefault(f, [])
+            atuais.extend(r for r in rotulos if r not in atuais)
+        for f in self.fatos.keys() & self.contexto.keys():
+            del self.contexto[f]
+
+
+class ArmazemSessoes:
+    def __init__(self, motor: MotorInferencia, capacidade: int = 10000, ocioso: float = 1800.0,
+                 caminho_sqlite: Optional[str] = None):
+        """
+        capacidade: máximo de sessões em memória; ocioso: segundos sem rodada até a
+        sessão ser encerrada (também no SQLite); caminho_sqlite: arquivo do banco
+        (None = só memória, e as sessões que saem da memória se perdem).
+        """
+        if capacidade <= 0:
+            raise ValueError("capacidade do armazém de sessões deve ser positiva")
+        self.motor = motor
+        self.capacidade = capacidade
+        self.ocioso = ocioso
+        self._sessoes: "OrderedDict[str, Sessao]" = OrderedDict()   # da menos para a mais recente
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._proxima_limpeza = 0.0
+        if caminho_sqlite is not None:
+            self._db = sqlite3.connect(caminho_sqlite, check_same_thread=False)
+            # WAL + synchronous=NORMAL: uma gravação por rodada sem fsync a cada commit
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_ESQUEMA)
+
+    def __len__(self):
+        return len(self._sessoes)
+
+    def atualizar(self, id_sessao: str, fatos: Iterable[str],
+                  contexto: Optional[Dict[str, List[str]]] = None) -> ResultadoInferencia:
+        """
+        Acrescenta à sessão os fatos e o contexto de uma rodada (como os do NLU) e
+        devolve a inferência sobre tudo o que foi acumulado. Cria a sessão se preciso.
+        """
+        agora = time.time()
+        with self._lock:
+            self._expirar(agora)
+            sessao = self._buscar(id_sessao)
+            if sessao is None:
+                sessao = Sessao(id_sessao)
+                self._sessoes[id_sessao] = sessao
+            sessao.acumular(fatos, contexto)
+            sessao.rodadas += 1
+            sessao.atualizada_em = agora
+            sessao.resultado = self.motor.inferir_sessao(sessao.pontuacao, set(sessao.fatos),
+                                                         sessao.contexto or None)
+            self._gravar(sessao)
+            while len(self._sessoes) > self.capacidade:
+                self._sessoes.popitem(last=False)
+            return sessao.resultado
+
+    def obter(self, id_sessao: str) -> Optional[Sessao]:
+        with self._lock:
+            sessao = self._buscar(id_sessao, guardar=False)
+            if sessao is not None and time.time() - sessao.atualizada_em > self.ocioso:
+                self._remover(id_sessao)
+                return None
+            return sessao
+
+    def encerrar(self, id_sessao: str) -> None:
+        with self._lock:
+            self._remover(id_sessao)
+
+    def expirar(self) -> int:
+        """Encerra as sessões ociosas; devolve quantas saíram da memória."""
+        with self._lock:
+            self._proxima_limpeza = 0.0
+            return self._expirar(time.time())
+
+    def fechar(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _buscar(self, id_sessao: str, guardar: bool = True) -> Optional[Sessao]:
+        # guardar=False só consulta: não mexe na ordem de ociosidade nem traz do disco
+        # para a memória
+        sessao = self._sessoes.get(id_sessao)
+        if sessao is not None:
+            if guardar:
+                self._sessoes.move_to_end(id_sessao)
+            return sessao
+        if self._db is None:
+            return None
+        linha = self._db.execute("SELECT fatos, contexto, rodadas, atualizada_em FROM sessoes WHERE id = ?",
+                                 (id_sessao,)).fetchone()
+        if linha is None or linha[3] <= time.time() - self.ocioso:
+            return None   # ociosa: sai do disco na próxima limpeza
+        # de volta do disco: a pontuação é refeita na próxima rodada
+        sessao = Sessao(id_sessao, json.loads(linha[0]), json.loads(linha[1]), linha[2], linha[3])
+        if guardar:
+            self._sessoes[id_sessao] = sessao
+        return sessao
+
+    def _gravar(self, sessao: Sessao) -> None:
+        if self._db is None:
+            return
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessoes (id, fatos, contexto, rodadas, atualizada_em) VALUES (?, ?, ?, ?, ?)",
+                (sessao.id, json.dumps(list(sessao.fatos), ensure_ascii=False),
+                 json.dumps(sessao.contexto, ensure_ascii=False), sessao.rodadas, sessao.atualizada_em)
+            )
+
+    def _remover(self, id_sessao: str) -> None:
+        self._sessoes.pop(id_sessao, None)
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM sessoes WHERE id = ?", (id_sessao,))
+
+    def _expirar(self, agora: float) -> int:
+        # a ordem do OrderedDict é a do último acesso: as ociosas estão no começo
+        limite = agora - self.ocioso
+        removidas = 0
+        while self._sessoes:
+            id_sessao, sessao = next(iter(self._sessoes.items()))
+            if sessao.atualizada_em > limite:
+                break
+            del self._sessoes[id_sessao]
+            removidas += 1
+        if self._db is not None and agora >= self._proxima_limpeza:
+            # no disco a limpeza é periódica: no máximo uma por décimo do tempo ocioso
+            with self._db:
+                self._db.execute("DELETE FROM sessoes WHERE atualizada_em <= ?", (limite,))
+            self._proxima_limpeza = agora + self.ocioso / 10
+        return removidas
@@ -0,0 +1,85 @@
+# Pipeline de triagem: NLU + MotorInferencia, para uma queixa ou para lotes.
+
+from typing import Dict, Iterable, Iterator, Optional, Set, Union
+
+from auditoria import AuditoriaTriagem, RegistroTriagem, registro_triagem
+from base_conhecimento import BaseConhecimento, FonteBase
+from cache_resultados import CacheLRU
+from nlu_processor import NLUProcessor
+from motor_inferencia import MotorInferencia
+
+
+def extrair_fatos(saida_nlu: Dict) -> Set[str]:
+    """
+    Converte a saída do NLU no conjunto de fatos do motor: sintomas + red flags.
+    """
+    fatos = set(k.lower() for k in saida_nlu.get("sintomas", {}).keys())
+    for rf in saida_nlu.get("red_flags", []):
+        fatos.add(rf.lower())
+    return fatos
+
+
+def registro_de_saida(saida: Dict, origem: str = "", ident: Optional[str] = None) -> RegistroTriagem:
+    """Registro de auditoria de uma saída do pipeline (pronto para AuditoriaTriagem.registrar)."""
+    nlu_out = saida["nlu"]
+    return registro_triagem(nlu_out.get("texto_original", ""), nlu_out, saida["inferencia"],
+                            saida.get("versao_base"), origem, ident)
+
+
+class PipelineTriagem:
+    def __init__(self, caminho_base: str = "base_conhecimento.json",
+                 base: Optional[Union[BaseConhecimento, FonteBase]] = None,
+                 tamanho_cache: int = 0, ttl_cache: Optional[float] = None,
+                 auditoria: Optional[AuditoriaTriagem] = None, origem: str = ""):
+        """
+        tamanho_cache > 0 liga os caches LRU do NLU (por texto normalizado) e do
+        motor (por conjunto de fatos), com validade opcional de ttl_cache segundos.
+        auditoria: cada triagem vai para o registro de auditoria, marcada com origem.
+        """
+        # uma única fonte de base para NLU e motor: uma recarga vale para os dois
+        if not isinstance(base, FonteBase):
+            base = FonteBase(base) if base is not None else FonteBase.de_arquivo(caminho_base)
+        self.fonte = base
+        cache_nlu = cache_motor = None
+        if tamanho_cache > 0:
+            cache_nlu = CacheLRU(tamanho_cache, ttl_cache)
+            cache_motor = CacheLRU(tamanho_cache, ttl_cache)
+        self.nlu = NLUProcessor(base=base, cache=cache_nlu)
+        self.motor = MotorInferencia(base=base, cache=cache_motor)
+        self.auditoria = auditoria
+        self.origem = origem
+
+    def estatisticas_cache(self) -> Dict:
+        return {
+            "nlu": self.nlu.cache.estatisticas() if self.nlu.cache else None,
+            "motor": self.motor.cache.estatisticas() if self.motor.cache else None
+        }
+
+    def processar(self, texto: str, ident: Optional[str] = None) -> Dict:
+        """ident: identificação da queixa no registro de auditoria."""
+        base = self.fonte.atual
+        return self._montar(base, self.nlu.processar_texto(texto, base=base), ident)
+
+    def processar_lote(self, textos: Iterable[str]) -> Iterator[Dict]:
+        """
+        Gerador: cada queixa passa pelo NLU e pelo motor assim que é lida, sem
+        materializar o lote inteiro em memória.
+        """
+        for texto in textos:
+            base = self.fonte.atual
+            yield self._montar(base, self.nlu.processar_texto(texto, base=base))
+
+    def _montar(self, base: BaseConhecimento, nlu_out: Dict, ident: Optional[str] = None) -> Dict:
+        # NLU e motor usam a mesma versão da base, lida uma vez por triagem: uma
+        # recarga no meio não mistura versões, e versao_base é a que foi usada
+        fatos = extrair_fatos(nlu_out)
+        saida = {
+            "nlu": nlu_out,
+            "fatos": sorted(fatos),
+            "inferencia": self.motor.inferir(fatos, nlu_out.get("contexto"), base),
+            "versao_base": base.versao
+        }
+        if self.auditoria is not None:
+            # com a fila da auditoria cheia, espera a gravação (contrapressão)
+            self.auditoria.registrar(registro_de_saida(saida, self.origem, ident))
+        return saida
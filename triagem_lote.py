@@ -0,0 +1,312 @@
+# Triagem em massa de arquivos (CSV ou JSONL), fora da interface gráfica.
+#
+# Os registros são lidos em fluxo, agrupados em blocos e distribuídos por um pool de
+# processos; cada processo mantém um PipelineTriagem (NLU + motor) pré-carregado.
+# Os resultados são gravados na ordem da entrada, à medida que ficam prontos, com
+# memória limitada (no máximo --pendentes blocos em andamento) e um checkpoint que
+# permite retomar a execução interrompida com --retomar. Com --auditoria, cada worker
+# também grava suas triagens no registro de auditoria (registros retriados após um
+# --retomar aparecem de novo, como novas triagens).
+#
+# Uso: python triagem_lote.py queixas.csv resultados.jsonl --workers 8
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# registro de entrada: (identificador, texto)
+Registro = Tuple[str, str]
+
+CAMPOS_CSV = ["id", "nivel_risco", "risco_global", "condicao_principal", "score_principal",
+              "condicoes", "red_flags", "fatos", "contexto", "resumo", "erro"]
+
+# pipeline do processo worker (um por processo do pool)
+_PIPELINE = None
+_COMPLETO = False
+
+
+def _iniciar_worker(caminho_base: str, completo: bool, caminho_auditoria: Optional[str] = None) -> None:
+    global _PIPELINE, _COMPLETO
+    import perfilador
+    from auditoria import abrir_no_worker
+    from triagem import PipelineTriagem
+
+    perfilador.ativar_do_ambiente()
+
+    auditoria = abrir_no_worker(caminho_auditoria) if caminho_auditoria else None
+    _PIPELINE = PipelineTriagem(caminho_base, auditoria=auditoria, origem="lote")
+    _COMPLETO = completo
+
+
+def _triar_bloco(bloco: List[Registro]) -> List[Dict]:
+    """Roda no worker: devolve registros já reduzidos, para diminuir o tráfego entre processos."""
+    saidas = []
+    for ident, texto in bloco:
+        if not isinstance(texto, str) or not texto.strip():
+            saidas.append({"id": ident, "erro": "texto ausente"})
+            continue
+        saida = _PIPELINE.processar(texto, ident)
+        if _COMPLETO:
+            saidas.append(dict(saida, inferencia=saida["inferencia"].to_dict(), id=ident))
+        else:
+            saidas.append(_compactar(ident, saida))
+    return saidas
+
+
+def _compactar(ident: str, saida: Dict) -> Dict:
+    inferencia = saida["inferencia"]
+    condicoes = [(r.condicao, round(r.score, 4)) for r in inferencia.resultados[:3]]
+    return {
+        "id": ident,
+        "nivel_risco": inferencia.nivel_risco,
+        "risco_global": round(inferencia.risco_global, 4),
+        "condicoes": condicoes,
+        "red_flags": sorted(saida["nlu"]["red_flags"]),
+        "fatos": saida["fatos"],
+        "contexto": saida["nlu"]["contexto"],
+        "resumo": saida["nlu"]["resumo"]
+    }
+
+
+def _formato(caminho: str, informado: Optional[str]) -> str:
+    if informado:
+        return informado
+    return "csv" if caminho.lower().endswith(".csv") else "jsonl"
+
+
+def ler_registros(caminho: str, formato: str, coluna_texto: str = "texto",
+                  coluna_id: Optional[str] = None) -> Iterator[Registro]:
+    """
+    Lê o arquivo em fluxo (memória constante). Sem coluna de id, usa o número do
+    registro (a partir de 1).
+    """
+    if formato == "csv":
+        csv.field_size_limit(sys.maxsize)
+        with open(caminho, "r", encoding="utf-8", newline="") as f:
+            leitor = csv.DictReader(f)
+            if coluna_texto not in (leitor.fieldnames or []):
+                raise ValueError(f"coluna '{coluna_texto}' não encontrada em {caminho}")
+            for n, linha in enumerate(leitor, 1):
+                yield (linha.get(coluna_id) if coluna_id else str(n)), linha[coluna_texto]
+    else:
+        with open(caminho, "r", encoding="utf-8") as f:
+            n = 0
+            for linha in f:
+                if not linha.strip():
+                    continue
+                n += 1
+                try:
+                    dados = json.loads(linha)
+                except ValueError:
+                    print(f"Aviso: linha {n} de {caminho} não é JSON válido.", file=sys.stderr)
+                    yield str(n), None
+                    continue
+                if not isinstance(dados, dict):
+                    print(f"Aviso: linha {n} de {caminho} não é um objeto JSON.", file=sys.stderr)
+                    yield str(n), None
+                    continue
+                ident = dados.get(coluna_id) if coluna_id else n
+                yield str(ident), dados.get(coluna_texto)
+
+
+def _blocos(registros: Iterator[Registro], tamanho: int) -> Iterator[List[Registro]]:
+    bloco = []
+    for registro in registros:
+        bloco.append(registro)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+class EscritorResultados:
+    """Grava JSONL ou CSV e sabe sua posição em bytes (para o checkpoint)."""
+
+    def __init__(self, caminho: str, formato: str, retomar_em: Optional[int] = None):
+        self.formato = formato
+        if retomar_em is not None:
+            # descarta o que foi escrito depois do último checkpoint
+            self.arquivo = open(caminho, "r+", encoding="utf-8", newline="")
+            self.arquivo.truncate(retomar_em)
+            self.arquivo.seek(retomar_em)
+        else:
+            self.arquivo = open(caminho, "w", encoding="utf-8", newline="")
+        self._csv = None
+        if formato == "csv":
+            self._csv = csv.DictWriter(self.arquivo, fieldnames=CAMPOS_CSV, extrasaction="ignore")
+            if retomar_em is None:
+                self._csv.writeheader()
+
+    def escrever(self, registros: List[Dict]) -> None:
+        if self._csv is None:
+            self.arquivo.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in registros)
+            return
+        for r in registros:
+            condicoes = r.get("condicoes") or []
+            self._csv.writerow({
+                "id": r.get("id"),
+                "nivel_risco": r.get("nivel_risco", ""),
+                "risco_global": r.get("risco_global", ""),
+                "condicao_principal": condicoes[0][0] if condicoes else "",
+                "score_principal": condicoes[0][1] if condicoes else "",
+                "condicoes": ";".join(c for c, _ in condicoes),
+                "red_flags": ";".join(r.get("red_flags", [])),
+                "fatos": ";".join(r.get("fatos", [])),
+                "contexto": ";".join(f"{f}:{'+'.join(v)}" for f, v in sorted(r.get("contexto", {}).items())),
+                "resumo": r.get("resumo", ""),
+                "erro": r.get("erro", "")
+            })
+
+    def posicao(self) -> int:
+        self.arquivo.flush()
+        return self.arquivo.tell()
+
+    def fechar(self) -> None:
+        self.arquivo.close()
+
+
+def ler_checkpoint(caminho: str) -> Optional[Dict]:
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def gravar_checkpoint(caminho: str, dados: Dict) -> None:
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f)
+    os.replace(temporario, caminho)
+
+
+class Progresso:
+    def __init__(self, inicial: int = 0, intervalo: float = 2.0):
+        self.feitos = inicial
+        self.inicial = inicial
+        self.intervalo = intervalo
+        self.inicio = time.perf_counter()
+        self._ultimo = self.inicio
+
+    def avancar(self, n: int, final: bool = False) -> None:
+        self.feitos += n
+        agora = time.perf_counter()
+        if final or agora - self._ultimo >= self.intervalo:
+            self._ultimo = agora
+            decorrido = agora - self.inicio
+            taxa = (self.feitos - self.inicial) / decorrido if decorrido > 0 else 0.0
+            print(f"{self.feitos:,} registros  {taxa:,.0f}/s  {decorrido:,.1f}s", file=sys.stderr)
+
+
+def executar(entrada: str, saida: str, workers: int = os.cpu_count() or 1,
+             caminho_base: str = "base_conhecimento.json", formato_entrada: Optional[str] = None,
+             formato_saida: Optional[str] = None, coluna_texto: str = "texto",
+             coluna_id: Optional[str] = None, tamanho_bloco: int = 256,
+             pendentes: Optional[int] = None, retomar: bool = False, completo: bool = False,
+             caminho_checkpoint: Optional[str] = None, caminho_auditoria: Optional[str] = None) -> int:
+    """Processa o arquivo inteiro; retorna o total de registros gravados na saída."""
+    formato_entrada = _formato(entrada, formato_entrada)
+    formato_saida = _formato(saida, formato_saida)
+    if completo and formato_saida == "csv":
+        raise ValueError("--completo só vale para saída JSONL (o CSV tem colunas fixas do resumo compacto)")
+    caminho_checkpoint = caminho_checkpoint or saida + ".checkpoint"
+    pendentes = pendentes or workers * 4
+
+    registros = ler_registros(entrada, formato_entrada, coluna_texto, coluna_id)
+    ja_feitos = 0
+    retomar_em = None
+    if retomar:
+        ckpt = ler_checkpoint(caminho_checkpoint)
+        if ckpt is not None and os.path.exists(saida):
+            ja_feitos, retomar_em = ckpt["registros"], ckpt["bytes_saida"]
+            for _ in range(ja_feitos):
+                next(registros, None)
+            print(f"Retomando após {ja_feitos:,} registros.", file=sys.stderr)
+
+    escritor = EscritorResultados(saida, formato_saida, retomar_em)
+    progresso = Progresso(ja_feitos)
+    feitos = ja_feitos
+
+    def concluir(resultado: List[Dict]) -> None:
+        nonlocal feitos
+        escritor.escrever(resultado)
+        feitos += len(resultado)
+        gravar_checkpoint(caminho_checkpoint, {"registros": feitos, "bytes_saida": escritor.posicao()})
+        progresso.avancar(len(resultado))
+
+    try:
+        if workers <= 1:
+            _iniciar_worker(caminho_base, completo, caminho_auditoria)
+            try:
+                for bloco in _blocos(registros, tamanho_bloco):
+                    concluir(_triar_bloco(bloco))
+            finally:
+                if _PIPELINE.auditoria is not None:
+                    _PIPELINE.auditoria.fechar()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                     initargs=(caminho_base, completo, caminho_auditoria)) as pool:
+                # fila limitada de blocos em andamento; a saída segue a ordem da entrada
+                em_andamento = deque()
+                for bloco in _blocos(registros, tamanho_bloco):
+                    if len(em_andamento) >= pendentes:
+                        concluir(em_andamento.popleft().result())
+                    em_andamento.append(pool.submit(_triar_bloco, bloco))
+                while em_andamento:
+                    concluir(em_andamento.popleft().result())
+    finally:
+        escritor.fechar()
+
+    progresso.avancar(0, final=True)
+    return feitos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triagem em massa de arquivos CSV/JSONL")
+    parser.add_argument("entrada", help="arquivo .csv ou .jsonl com as queixas")
+    parser.add_argument("saida", help="arquivo .jsonl ou .csv de resultados")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base", default="base_conhecimento.json")
+    parser.add_argument("--formato-entrada", choices=["csv", "jsonl"])
+    parser.add_argument("--formato-saida", choices=["csv", "jsonl"])
+    parser.add_argument("--coluna-texto", default="texto", help="coluna (CSV) ou chave (JSONL) com a queixa")
+    parser.add_argument("--coluna-id", help="coluna ou chave de identificação (padrão: nº do registro)")
+    parser.add_argument("--bloco", type=int, default=256, help="registros por tarefa enviada a um worker")
+    parser.add_argument("--pendentes", type=int, help="máximo de blocos em andamento (padrão: 4 x workers)")
+    parser.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: <saida>.checkpoint)")
+    parser.add_argument("--retomar", action="store_true", help="continua a partir do último checkpoint")
+    parser.add_argument("--completo", action="store_true",
+                        help="grava a saída completa do pipeline (só JSONL) em vez do resumo compacto")
+    parser.add_argument("--auditoria", metavar="ARQUIVO",
+                        help="registra cada triagem no banco SQLite de auditoria (ver auditoria.py)")
+    parser.add_argument("--perfil", metavar="PREFIXO",
+                        help="modo de perfil: grava PREFIXO.<pid>.folded e .trace.json por processo")
+    parser.add_argument("--perfil-amostra", type=float, default=1.0, help="fração dos textos rastreados no perfil")
+    args = parser.parse_args(argv)
+    if args.perfil:
+        import perfilador
+        perfilador.configurar_ambiente(args.perfil, args.perfil_amostra)
+    try:
+        executar(args.entrada, args.saida, workers=args.workers, caminho_base=args.base,
+                 formato_entrada=args.formato_entrada, formato_saida=args.formato_saida,
+                 coluna_texto=args.coluna_texto, coluna_id=args.coluna_id,
+                 tamanho_bloco=args.bloco, pendentes=args.pendentes, retomar=args.retomar,
+                 completo=args.completo, caminho_checkpoint=args.checkpoint,
+                 caminho_auditoria=args.auditoria)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("Interrompido; use --retomar para continuar do último checkpoint.", file=sys.stderr)
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# Validação e análise estática da base de conhecimento, feita na compilação.
+#
+# Aponta sintomas inalcançáveis (nenhum termo leva a eles), mappings mortos (o
+# sintoma não pesa em nenhuma condição nem é red flag), termos duplicados ou
+# sobrepostos, thresholds inconsistentes e regras de risco que citam fatos ou
+# condições que não existem. Mappings mortos e termos duplicados
+# (mesma grafia sem acentos, mesmo sintoma) saem da base compilada: o casador, o
+# índice e a matriz nunca os carregam.
+#
+# Uso: python validador_base.py [base_conhecimento.json] [--estrito]
+
+import argparse
+import json
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from casador_termos import CasadorTermos, dobrar_acentos
+from regras_risco import referencias
+
+NIVEIS = ("erro", "aviso", "info")
+
+
+class Diagnostico(NamedTuple):
+    nivel: str      # "erro" (validar_base recusa a base), "aviso" ou "info"
+    codigo: str
+    mensagem: str
+
+
+def analisar(mappings: Dict[str, str], red_flags: Dict[str, float], condicoes: Dict[str, Dict],
+             config: Dict, thresholds_raiz: Optional[Dict], dobrar: bool,
+             regras: Optional[List[Dict]] = None) -> Tuple[List[Diagnostico], Dict[str, str]]:
+    """
+    Recebe as tabelas já normalizadas (minúsculas) e devolve os diagnósticos e os
+    mappings efetivos, sem as entradas mortas e duplicadas. regras: a seção "regras"
+    normalizada, se a base declarar uma.
+    """
+    diagnosticos: List[Diagnostico] = []
+
+    def relatar(nivel: str, codigo: str, mensagem: str) -> None:
+        diagnosticos.append(Diagnostico(nivel, codigo, mensagem))
+
+    # thresholds: a base só lê config.thresholds; a chave da raiz é legado
+    if thresholds_raiz is not None:
+        em_config = config.get("thresholds")
+        if em_config is None:
+            relatar("aviso", "thresholds_na_raiz",
+                    "'thresholds' está na raiz; use config.thresholds (a da raiz é usada por ora)")
+        elif {k: float(v) for k, v in em_config.items()} != {k: float(v) for k, v in thresholds_raiz.items()}:
+            relatar("erro", "thresholds_inconsistentes",
+                    f"config.thresholds {dict(em_config)} difere de thresholds da raiz {dict(thresholds_raiz)}")
+        else:
+            relatar("info", "thresholds_duplicados", "'thresholds' repetido na raiz e em config; remova o da raiz")
+
+    pesados = {s for bloco in condicoes.values() for s in bloco["sintomas"]}
+    for nome, bloco in condicoes.items():
+        if not bloco["sintomas"]:
+            relatar("aviso", "condicao_vazia", f"condição {nome} não tem sintomas")
+        elif sum(bloco["sintomas"].values()) <= 0:
+            relatar("aviso", "condicao_sem_peso", f"condição {nome} tem peso total zero")
+
+    # mappings mortos: o sintoma não entra em nenhuma condição nem é red flag
+    efetivos: Dict[str, str] = {}
+    for termo, sintoma in mappings.items():
+        if sintoma in pesados or sintoma in red_flags:
+            efetivos[termo] = sintoma
+        else:
+            relatar("aviso", "mapping_morto",
+                    f"'{termo}' -> {sintoma}: sintoma fora de condições e red flags (removido)")
+
+    # mesma grafia depois de tirar os acentos: um termo basta se o sintoma é o mesmo
+    if dobrar:
+        por_forma: Dict[str, str] = {}
+        for termo in list(efetivos):
+            forma = dobrar_acentos(termo)
+            primeiro = por_forma.setdefault(forma, termo)
+            if primeiro == termo:
+                continue
+            if efetivos[primeiro] == efetivos[termo]:
+                relatar("aviso", "termo_duplicado",
+                        f"'{termo}' repete '{primeiro}' sem acentos (removido)")
+                del efetivos[termo]
+            else:
+                relatar("aviso", "termo_ambiguo",
+                        f"'{termo}' ({efetivos[termo]}) e '{primeiro}' ({efetivos[primeiro]}) "
+                        "só diferem nos acentos")
+
+    # termos contidos em termos mais longos: os dois casam juntos
+    casador = CasadorTermos(list(efetivos) + list(red_flags), dobrar=dobrar)
+    for termo in efetivos:
+        for o in casador.buscar(dobrar_acentos(termo) if dobrar else termo):
+            interno = o.termo
+            if interno == termo or interno not in efetivos:
+                continue
+            if efetivos[interno] == efetivos[termo]:
+                relatar("info", "termo_redundante",
+                        f"'{termo}' contém '{interno}', do mesmo sintoma {efetivos[termo]}")
+            else:
+                relatar("info", "termo_sobreposto",
+                        f"'{termo}' ({efetivos[termo]}) contém '{interno}' ({efetivos[interno]}): ambos casam")
+
+    # sintomas que nenhum termo produz (só chegam ao motor como fatos diretos)
+    alcancaveis = set(efetivos.values()) | set(red_flags)
+    for nome, bloco in condicoes.items():
+        inalcancaveis = sorted(s for s in bloco["sintomas"] if s not in alcancaveis)
+        if inalcancaveis and len(inalcancaveis) == len(bloco["sintomas"]):
+            relatar("aviso", "condicao_inalcancavel", f"nenhum sintoma de {nome} é produzido por termos")
+    for sintoma in sorted(pesados - alcancaveis):
+        relatar("aviso", "sintoma_inalcancavel", f"sintoma {sintoma} não tem termo nos mappings")
+    mapeadas = set(efetivos.values())
+    for rf in red_flags:
+        if rf not in mapeadas:
+            relatar("aviso", "red_flag_sem_termo",
+                    f"red flag {rf} só casa pelo próprio nome no texto; nenhum mapping leva a ela")
+
+    # regras que citam fatos ou condições inexistentes nunca disparam por eles
+    if regras:
+        fatos, citadas = referencias(regras)
+        conhecidos = pesados | set(red_flags) | set(mappings.values())
+        for fato in sorted(fatos.keys() - conhecidos):
+            relatar("aviso", "regra_fato_desconhecido",
+                    f"regra {', '.join(fatos[fato])} cita o fato {fato}, que a base não produz")
+        for nome in sorted(citadas.keys() - condicoes.keys()):
+            relatar("aviso", "regra_condicao_desconhecida",
+                    f"regra {', '.join(citadas[nome])} cita a condição {nome}, que não existe")
+
+    diagnosticos.sort(key=lambda d: NIVEIS.index(d.nivel))
+    return diagnosticos, efetivos
+
+
+def formatar(diagnosticos: List[Diagnostico], incluir_info: bool = True) -> str:
+    linhas = [f"{d.nivel.upper():<5} {d.codigo}: {d.mensagem}"
+              for d in diagnosticos if incluir_info or d.nivel != "info"]
+    return "\n".join(linhas)
+
+
+def resumo(diagnosticos: List[Diagnostico]) -> str:
+    contagem = {nivel: sum(1 for d in diagnosticos if d.nivel == nivel) for nivel in NIVEIS}
+    return ", ".join(f"{n} {nivel}(s)" for nivel, n in contagem.items() if n)
+
+
+def main(argv=None):
+    from base_conhecimento import BaseConhecimento
+
+    parser = argparse.ArgumentParser(description="Valida a base de conhecimento")
+    parser.add_argument("base", nargs="?", default="base_conhecimento.json")
+    parser.add_argument("--estrito", action="store_true", help="sai com código 1 também se houver avisos")
+    parser.add_argument("--sem-info", action="store_true", help="omite os diagnósticos informativos")
+    args = parser.parse_args(argv)
+    try:
+        with open(args.base, "r", encoding="utf-8") as f:
+            base = BaseConhecimento(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    diagnosticos = list(base.diagnosticos)
+    if diagnosticos:
+        print(formatar(diagnosticos, incluir_info=not args.sem_info))
+    print(f"{args.base}: {resumo(diagnosticos) or 'nenhum problema'}")
+    falhas = {"erro", "aviso"} if args.estrito else {"erro"}
+    if any(d.nivel in falhas for d in diagnosticos):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()